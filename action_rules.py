@@ -0,0 +1,108 @@
+# ------------------------------------------------------------
+# Action-log classification rules, compiled to one lookup table
+#
+#   rules = compile_rules([
+#       Rule(category="admin", verdict=EXCLUDE),
+#       Rule(category="info_link", action="get_data", verdict=NON_ANALYST),
+#       Rule(category="info_link", verdict=ANALYST),
+#   ])
+#   verdicts = rules.classify(df["log_category"], df["log_action"])   # int8 per row
+#   params, operators = rules.pushdown()                               # getData "!" filters
+#
+# The first matching rule wins (None = any category / action); rows no rule
+# matches get `default`. Compiling fills a (category x action) verdict table
+# over every name the rules mention plus one "anything else" slot, so each
+# event is classified with one gather on its category / action codes.
+#
+# No sibling imports.
+# ------------------------------------------------------------
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Verdict codes (int8)
+EXCLUDE = 0
+NON_ANALYST = 1
+ANALYST = 2
+VERDICT_NAMES = {EXCLUDE: "exclude", NON_ANALYST: "non_analyst", ANALYST: "analyst"}
+
+
+@dataclass(frozen=True)
+class Rule:
+    category: Optional[str] = None
+    action: Optional[str] = None
+    verdict: int = NON_ANALYST
+
+
+def _codes(values: pd.Series, vocab: pd.Index) -> np.ndarray:
+    """
+    Row positions in `vocab`, looked up once per distinct value; unknown and
+    missing values get -1 (the table's trailing "anything else" slot).
+    Categorical columns (e.g. dictionary-encoded Parquet reads) reuse their codes.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return np.append(vocab.get_indexer(uniques), -1)[codes]
+
+
+@dataclass
+class CompiledRules:
+    """
+    - categories / actions: every name the rules mention (table rows / columns)
+    - table: verdict per (category, action); the last row / column is "any other"
+    - rules: the source rules, in priority order
+    """
+
+    categories: pd.Index
+    actions: pd.Index
+    table: np.ndarray
+    rules: Tuple[Rule, ...]
+    default: int
+
+    def classify(self, category: pd.Series, action: pd.Series) -> np.ndarray:
+        """Verdict code per row (same order as the inputs)."""
+        return self.table[_codes(category, self.categories), _codes(action, self.actions)]
+
+    def verdict(self, category: Optional[str], action: Optional[str]) -> int:
+        return int(self.classify(pd.Series([category], dtype="object"), pd.Series([action], dtype="object"))[0])
+
+    def pushdown(self) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+        """
+        getData params + custom_operators excluding every category / action whose
+        events are always EXCLUDE (any action / any category). getData ANDs its
+        filters, so exclusions tied to one (category, action) pair stay local.
+        """
+        params: Dict[str, List[str]] = {}
+        operators: Dict[str, str] = {}
+        for column, by in (("log_category", "category"), ("log_action", "action")):
+            names = self.names(EXCLUDE, by=by)
+            if names:
+                params[column], operators[column] = names, "!"
+        return params, operators
+
+    def names(self, verdict: int, by: str = "category") -> List[str]:
+        """Categories (or actions) whose events get `verdict` whatever the other key is."""
+        if by == "category":
+            return [c for c, row in zip(self.categories, self.table[:-1]) if (row == verdict).all()]
+        return [a for a, col in zip(self.actions, self.table[:, :-1].T) if (col == verdict).all()]
+
+
+def compile_rules(rules: Sequence[Rule], default: int = NON_ANALYST) -> CompiledRules:
+    """Build the verdict table; later rules are written first so earlier ones win."""
+    categories = pd.Index(sorted({r.category for r in rules if r.category is not None}), dtype="object")
+    actions = pd.Index(sorted({r.action for r in rules if r.action is not None}), dtype="object")
+    table = np.full((len(categories) + 1, len(actions) + 1), default, dtype=np.int8)
+
+    for rule in reversed(rules):
+        if rule.verdict not in VERDICT_NAMES:
+            raise ValueError(f"Unknown verdict {rule.verdict!r} in {rule}")
+        rows = slice(None) if rule.category is None else categories.get_loc(rule.category)
+        cols = slice(None) if rule.action is None else actions.get_loc(rule.action)
+        table[rows, cols] = rule.verdict
+
+    return CompiledRules(categories, actions, table, tuple(rules), default)
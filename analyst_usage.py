@@ -0,0 +1,510 @@
+# ------------------------------------------------------------
+# Analyst utilization + platform usage stages (pure DataFrame transforms)
+#
+# spotfire.py pulls the source tables and calls these in order; the
+# benchmarks run the same functions on synthetic tables.
+# ------------------------------------------------------------
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import hll
+from action_rules import ANALYST, EXCLUDE, NON_ANALYST, Rule, compile_rules
+from identity import (
+    ORDER_COL,
+    PARALLEL_MIN_ROWS,
+    account_keys,
+    add_username_keys,
+    concat_ordered,
+    fork_available,
+    map_shards,
+    normalize_str,
+    system_account_mask,
+)
+from metric_windows import DEFAULT_WINDOW, METRIC_WINDOWS, window_col, windowed_columns
+from rollups import EVENTS_COL, event_weights
+
+TZ_CDT = pytz.timezone("America/Chicago")
+TZ_UTC = pytz.UTC
+
+# spotfire_if2sf_users.last_login text format (also the cutoff filter format)
+LAST_LOGIN_FORMAT = "%d-%b-%y %I.%M.%S.%f %p"
+
+# Cloud vs Local Desktop IP mapping for auth_pro logins
+CLOUD_IPS = {"192.12.345.123", "192.12.345.456", "192.12.345.789"}
+LOCAL_IPS = {"105.987.65.432"}
+
+# Categories that you want to treat as "analyst-only" for this analysis
+ANALYST_CATEGORIES = {
+    "analysis_pro",
+    "data_connector_pro",
+    "info_link",
+}
+
+# Categories to exclude entirely (noise/system OR “available regardless of license” AND not useful for determining analyst need)
+EXCLUDE_CATEGORIES = [
+    # Generic/system noise
+    "admin",
+    "analysis_as",
+    "auth", "auth_as", "auth_pro", "auth_wp",
+    "automation_job_as", "automation_task_as",
+    "codetrust",
+    "dblogging",
+    "ems",
+    "monitoring", "monitoring_wp", "monitoring_as",
+    "routing_rules",
+    "scheduled_updates",
+
+    # Categories within license structure that you want to EXCLUDE from analysis
+    # (your stated intent: actions possible in both web + desktop regardless of license, or not meaningful for determining Analyst need)
+    "file_pro", "file_wp", "file_as",
+    "find_pro", "find_wp", "find_as",
+    "data_connector_as", "data_connector_wp",
+    "datasource_pro", "datasource_wp", "datasource_as",
+    "datafunction_pro", "datafunction_wp", "datafunction_as",
+    "library", "library_as", "library_wp", "library_pro",
+]
+
+# Actions to exclude entirely (common consumer interactions that muddy the “license-needed” signal)
+EXCLUDE_ACTIONS = [
+    "apply_bookmark",
+    "create_comment",
+    "export",
+    "modify_filter",
+    "reset_all_visible_filters",
+    "reset_filter",
+    "set_page",
+    "load_connection",
+    "load_source",
+]
+
+# Info_link exceptions: these do NOT require Analyst even though info_link is in ANALYST_CATEGORIES
+INFO_LINK_NON_ANALYST_ACTIONS = {"get_data", "load_il"}
+
+# The lists above as one rule table (first match wins, anything else is non-analyst):
+# exclusions, then the info_link exceptions, then the analyst categories.
+# classify_actions and the getData pushdown (ACTION_RULES.pushdown()) both read it.
+ACTION_RULES = compile_rules(
+    [Rule(category=c, verdict=EXCLUDE) for c in EXCLUDE_CATEGORIES]
+    + [Rule(action=a, verdict=EXCLUDE) for a in EXCLUDE_ACTIONS]
+    + [Rule(category="info_link", action=a, verdict=NON_ANALYST) for a in sorted(INFO_LINK_NON_ANALYST_ACTIONS)]
+    + [Rule(category=c, verdict=ANALYST) for c in sorted(ANALYST_CATEGORIES)],
+    default=NON_ANALYST,
+)
+
+FINAL_COLUMNS = [
+    "USER_NAME",
+    "USER_EMAIL",
+    "LAST_ACTIVITY",
+    "ANALYST_FUNCTIONS",
+    "NON_ANALYST_FUNCTIONS",
+    "ANALYST_PCT",
+    "ANALYST_USER_FLAG",
+    "ANALYST_THRESHOLD",
+    "ANALYST_ACTIONS_PER_DAY",
+    "ANALYST_ACTIONS_PER_ACTIVE_DAYS",
+    "ACTIVE_DAYS",
+    "cost_center_name",
+    "dept_name",
+    "title",
+    "TITLE_CATEGORY",
+]
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+def utc_to_cdt(series: pd.Series) -> pd.Series:
+    """Convert UTC datetimes to America/Chicago and format as string."""
+    if series.dt.tz is None:
+        series = series.dt.tz_localize(TZ_UTC)
+    else:
+        series = series.dt.tz_convert(TZ_UTC)
+
+    return series.dt.tz_convert(TZ_CDT).dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def categorize_title(title_val: str) -> str:
+    """
+    Map raw job titles into buckets:
+    - Leadership
+    - Engineer
+    - Tech
+    - Other
+    """
+    if not isinstance(title_val, str) or not title_val.strip():
+        return "Other"
+
+    t = title_val.lower()
+
+    leadership_keywords = ["manager", "vp", "director", "supervisor", "lead", "head"]
+    engineer_keywords = ["engineer", "eng", "developer", "devops", "architect", "scientist"]
+    tech_keywords = ["technician", "tech", "operator", "specialist", "associate", "maintenance"]
+
+    if any(k in t for k in leadership_keywords):
+        return "Leadership"
+    if any(k in t for k in engineer_keywords):
+        return "Engineer"
+    if any(k in t for k in tech_keywords):
+        return "Tech"
+    return "Other"
+
+
+def classify_pro_platform(ip: str) -> str:
+    """Classify auth_pro login machine IP as Cloud vs Local Desktop vs Other."""
+    if ip in CLOUD_IPS:
+        return "Cloud"
+    if ip in LOCAL_IPS:
+        return "Local Desktop"
+    return "Other"
+
+
+def window_metrics(daily: pd.DataFrame, as_of: pd.Timestamp) -> pd.DataFrame:
+    """
+    Per-user metrics for every METRIC_WINDOWS window from the (user, day) rollup,
+    in one groupby: each rollup row contributes its counts to every window it
+    falls in. Returns user_name + windowed_columns().
+    """
+    parts = {"user_name": daily["user_name"]}
+    for w in METRIC_WINDOWS:
+        in_w = (daily["action_day"] >= as_of - pd.Timedelta(days=w)).astype(int)
+        parts[window_col("ANALYST_FUNCTIONS", w)] = daily["analyst_cnt"] * in_w
+        parts[window_col("NON_ANALYST_FUNCTIONS", w)] = daily["non_analyst_cnt"] * in_w
+        parts[window_col("ACTIVE_DAYS", w)] = in_w  # one rollup row per user-day
+    sums = pd.DataFrame(parts).groupby("user_name").sum()
+
+    for w in METRIC_WINDOWS:
+        a = sums[window_col("ANALYST_FUNCTIONS", w)]
+        n = sums[window_col("NON_ANALYST_FUNCTIONS", w)]
+        d = sums[window_col("ACTIVE_DAYS", w)]
+        sums[window_col("ANALYST_PCT", w)] = np.where(a + n == 0, 0, np.round(a / (a + n) * 100, 2))
+        sums[window_col("ANALYST_ACTIONS_PER_DAY", w)] = np.where(d == 0, 0, np.round(a / d.where(d > 0, 1), 4))
+
+    return sums[windowed_columns()].reset_index()
+
+
+# ------------------------------------------------------------
+# 2. USERS
+# ------------------------------------------------------------
+def prepare_users(users_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    spotfire_if2sf_users rows -> user_id, user_name, last_login (UTC), email,
+    plus user_domain / user_account (identity.split_usernames, parsed once here
+    for the HR nt_id merge). System accounts are dropped.
+    """
+    users_df = users_df.loc[~system_account_mask(users_df["user_name"])].copy()
+    users_df["last_login"] = pd.to_datetime(users_df["last_login"], format=LAST_LOGIN_FORMAT, utc=True)
+    return add_username_keys(users_df[["user_id", "user_name", "last_login", "email"]].copy())
+
+
+# ------------------------------------------------------------
+# 3. ACTION LOG (ANALYST VS NON-ANALYST)
+# ------------------------------------------------------------
+def classify_actions(df_actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Classify each event with ACTION_RULES (one lookup per row), drop the
+    excluded ones getData did not already filter, parse logged_time (UTC)
+    and bucket each row to its action_day.
+    """
+    verdicts = ACTION_RULES.classify(df_actions["log_category"], df_actions["log_action"])
+    keep = verdicts != EXCLUDE
+    if not keep.all():
+        df_actions, verdicts = df_actions.loc[keep].copy(), verdicts[keep]
+    df_actions["is_analyst"] = verdicts == ANALYST
+
+    # If your actionlog uses a different format, update the format string accordingly.
+    df_actions["logged_time"] = pd.to_datetime(df_actions["logged_time"], utc=True, errors="coerce")
+    df_actions["action_day"] = df_actions["logged_time"].dt.floor("D")
+    return df_actions
+
+
+def daily_action_rollup(df_actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    The ONLY pass over action rows -> one row per (user, day). Rows may be raw
+    events or pushed-down groups (EVENTS_COL events each).
+    """
+    events = event_weights(df_actions)
+    daily = (
+        pd.DataFrame(
+            {
+                "user_name": df_actions["user_name"],
+                "action_day": df_actions["action_day"],
+                "analyst_cnt": events.where(df_actions["is_analyst"], 0),
+                "total_cnt": events,
+            }
+        )
+        .groupby(["user_name", "action_day"])[["analyst_cnt", "total_cnt"]]
+        .sum()
+        .reset_index()
+    )
+    daily["non_analyst_cnt"] = daily["total_cnt"] - daily["analyst_cnt"]
+    return daily
+
+
+def add_window_metrics(users: pd.DataFrame, daily: pd.DataFrame, as_of: pd.Timestamp) -> pd.DataFrame:
+    """
+    Per-window counts, ANALYST_PCT and analyst actions per day (director request).
+
+    ANALYST_ACTIONS_PER_DAY = analyst actions / active days in the window;
+    active days = distinct days user had ANY included (post-exclusion) action rows.
+    """
+    metrics = window_metrics(daily, as_of)
+    users = users.merge(metrics, on="user_name", how="left")
+    users[windowed_columns()] = users[windowed_columns()].fillna(0)
+
+    # Unsuffixed columns keep the DEFAULT_WINDOW values (what dashboards + API read today)
+    users["analyst_cnt"] = users[window_col("ANALYST_FUNCTIONS", DEFAULT_WINDOW)]
+    users["non_analyst_cnt"] = users[window_col("NON_ANALYST_FUNCTIONS", DEFAULT_WINDOW)]
+    users["ACTIVE_DAYS"] = users[window_col("ACTIVE_DAYS", DEFAULT_WINDOW)]
+    users["ANALYST_ACTIONS_PER_DAY"] = users[window_col("ANALYST_ACTIONS_PER_DAY", DEFAULT_WINDOW)]
+    # Same metric under the name the API's analyst_functions_users query selects
+    users["ANALYST_ACTIONS_PER_ACTIVE_DAYS"] = users["ANALYST_ACTIONS_PER_DAY"]
+    return users
+
+
+# ------------------------------------------------------------
+# 4. MERGE HR DATA (EMAIL FIRST, THEN NT_ID FALLBACK, DROP NON-MATCHES)
+# ------------------------------------------------------------
+def merge_hr(
+    users: pd.DataFrame, user_data: pd.DataFrame, workers: int = 1
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Attach cost_center_name / dept_name / title from pageradm_employee_ghr:
+    email -> smtp first, then the remaining users on username -> nt_id.
+    Users with no HR match are dropped. Returns the matched users + match counts.
+
+    workers > 1: users are sharded by identity key over forked processes
+    (identity.map_shards, PARALLEL_MIN_ROWS and up); same rows, same order.
+    """
+    user_data = _prepare_hr(user_data)
+    if workers > 1 and len(users) >= PARALLEL_MIN_ROWS and fork_available():
+        keys = normalize_str(users["email"], lower=True)
+        parts = map_shards(_merge_hr_shard, users, keys, workers, user_data=user_data)
+        counts = {k: sum(c[k] for _, c in parts) for k in ("email", "nt_id", "dropped")}
+        # Serial order: every email match (in user order), then every nt_id match
+        return concat_ordered([df for df, _ in parts], by=["_HR_PHASE", ORDER_COL]), counts
+    return _merge_hr_prepared(users, user_data)
+
+
+def _merge_hr_shard(users: pd.DataFrame, user_data: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    out, counts = _merge_hr_prepared(users, user_data)
+    out["_HR_PHASE"] = np.repeat([0, 1], [counts["email"], counts["nt_id"]])
+    return out, counts
+
+
+def _prepare_hr(user_data: pd.DataFrame) -> pd.DataFrame:
+    user_data = user_data.copy()
+
+    # Normalize HR keys (missing -> None, never the strings "nan" / "none")
+    user_data["smtp"] = normalize_str(user_data["smtp"], lower=True)
+    user_data["nt_id"] = normalize_str(user_data["nt_id"], lower=True)
+
+    # Ensure unique nt_id to avoid multi-match explosions (rows without an
+    # nt_id count as one key: only the last of them is kept)
+    return user_data.sort_values("nt_id").drop_duplicates(subset=["nt_id"], keep="last")
+
+
+def _merge_hr_prepared(users: pd.DataFrame, user_data: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    # Normalize users keys
+    users = users.copy()
+    users["email_norm"] = normalize_str(users["email"], lower=True)
+    users["user_name_norm"] = account_keys(users["user_account"] if "user_account" in users else users["user_name"])
+
+    # 4a. Merge on email (missing keys never match each other)
+    merge_email = users.merge(
+        user_data[user_data["smtp"].notna()],
+        left_on="email_norm",
+        right_on="smtp",
+        how="left",
+        indicator=True,
+    )
+
+    matched_email = merge_email[merge_email["_merge"] == "both"].copy()
+    unmatched_email = merge_email[merge_email["_merge"] == "left_only"].copy()
+
+    # Clean unmatched to remove HR columns before second merge
+    cols_to_remove = ["cost_center_name", "dept_name", "title", "smtp", "nt_id", "_merge"]
+    unmatched_email.drop(columns=[c for c in cols_to_remove if c in unmatched_email.columns], inplace=True)
+
+    # 4b. Merge remaining on nt_id
+    merge_ntid = unmatched_email.merge(
+        user_data[user_data["nt_id"].notna()],
+        left_on="user_name_norm",
+        right_on="nt_id",
+        how="left",
+        indicator=True,
+    )
+
+    matched_ntid = merge_ntid[merge_ntid["_merge"] == "both"].copy()
+    unmatched_final = merge_ntid[merge_ntid["_merge"] == "left_only"].copy()
+
+    # Keep only matches; drop non-matches
+    users = pd.concat(
+        [matched_email.drop(columns=["_merge"]), matched_ntid.drop(columns=["_merge"])],
+        ignore_index=True
+    )
+
+    # Cleanup helper columns
+    users.drop(columns=["email_norm", "user_name_norm"], inplace=True, errors="ignore")
+
+    counts = {"email": len(matched_email), "nt_id": len(matched_ntid), "dropped": len(unmatched_final)}
+    return users, counts
+
+
+# ------------------------------------------------------------
+# 5. FINAL USER-LEVEL DATAFRAME
+# ------------------------------------------------------------
+def add_user_fields(users: pd.DataFrame, analyst_threshold: float) -> pd.DataFrame:
+    """LAST_ACTIVITY (CDT text), ANALYST_PCT, ANALYST_USER_FLAG / _THRESHOLD and TITLE_CATEGORY."""
+    users = users.copy()
+    users["LAST_ACTIVITY"] = utc_to_cdt(users["last_login"])
+
+    total = users["analyst_cnt"] + users["non_analyst_cnt"]
+    users["ANALYST_PCT"] = np.where(
+        total == 0, 0, np.round((users["analyst_cnt"] / total) * 100, 2)
+    )
+
+    users["ANALYST_USER_FLAG"] = users["ANALYST_PCT"] >= analyst_threshold
+    users["ANALYST_THRESHOLD"] = analyst_threshold
+
+    users["TITLE_CATEGORY"] = users["title"].apply(categorize_title)
+    return users
+
+
+def build_final_df(users: pd.DataFrame) -> pd.DataFrame:
+    """analyst_functions_users rows (FINAL_COLUMNS + windowed columns), newest activity first."""
+    return users.rename(
+        columns={
+            "user_name": "USER_NAME",
+            "email": "USER_EMAIL",
+            "analyst_cnt": "ANALYST_FUNCTIONS",
+            "non_analyst_cnt": "NON_ANALYST_FUNCTIONS",
+        }
+    )[FINAL_COLUMNS + windowed_columns()].sort_values("LAST_ACTIVITY", ascending=False)
+
+
+# ------------------------------------------------------------
+# 6. TOP ANALYST FUNCTIONS (ACTION-LEVEL AGGREGATE)
+# ------------------------------------------------------------
+def top_analyst_actions(
+    df_actions: pd.DataFrame, distinct_mode: str = "exact", precision: int = hll.DEFAULT_PRECISION
+) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    TOTAL_USES + UNIQUE_USERS per analyst (log_action, log_category).
+
+    distinct_mode="hll" also returns the per-(action, day) user sketches
+    (analyst_action_daily_user_sketches rows), else None.
+    """
+    df_analyst_actions = df_actions[df_actions["is_analyst"]].copy()
+    df_analyst_actions[EVENTS_COL] = event_weights(df_analyst_actions)
+    action_day_sketches_df = None
+
+    if distinct_mode == "hll":
+        # One user sketch per (action, day); the window's reach is their union, so any
+        # window can be re-answered later from the stored day sketches alone
+        day_keys, day_sketches = hll.sketch_groups(
+            df_analyst_actions.dropna(subset=["action_day"]),
+            ["log_action", "log_category", "action_day"],
+            "user_name",
+            precision,
+        )
+        action_keys, action_sketches = hll.rollup_sketches(day_keys, day_sketches, ["log_action", "log_category"])
+        unique_users = action_keys.assign(UNIQUE_USERS=hll.estimate(action_sketches).astype(int))
+
+        action_day_sketches_df = day_keys.rename(
+            columns={"log_action": "LOG_ACTION", "log_category": "LOG_CATEGORY", "action_day": "ACTION_DAY"}
+        ).assign(USER_SKETCH=[hll.encode(r) for r in day_sketches], SKETCH_PRECISION=precision)
+
+        top_actions_df = (
+            df_analyst_actions.groupby(["log_action", "log_category"])
+            .agg(TOTAL_USES=(EVENTS_COL, "sum"))
+            .reset_index()
+            .merge(unique_users, on=["log_action", "log_category"], how="left")
+        )
+    else:
+        top_actions_df = (
+            df_analyst_actions.groupby(["log_action", "log_category"])
+            .agg(
+                TOTAL_USES=(EVENTS_COL, "sum"),
+                UNIQUE_USERS=("user_name", "nunique"),
+            )
+            .reset_index()
+        )
+
+    top_actions_df = (
+        top_actions_df.fillna({"UNIQUE_USERS": 0})
+        .sort_values("TOTAL_USES", ascending=False)
+        .rename(columns={"log_action": "LOG_ACTION", "log_category": "LOG_CATEGORY"})
+    )
+    return top_actions_df, action_day_sketches_df
+
+
+# ------------------------------------------------------------
+# 7. MOST VIEWED REPORTS
+# ------------------------------------------------------------
+def most_viewed_reports(df_reports: pd.DataFrame) -> pd.DataFrame:
+    """report_path + total_loads, most loaded first (raw load events or pushed-down groups)."""
+    return (
+        df_reports.assign(**{EVENTS_COL: event_weights(df_reports)})
+        .groupby("id2", as_index=False)
+        .agg(total_loads=(EVENTS_COL, "sum"))
+        .sort_values("total_loads", ascending=False)
+        .rename(columns={"id2": "report_path"})
+        .reset_index(drop=True)
+    )
+
+
+# ------------------------------------------------------------
+# 8. PLATFORM USAGE: WEB PLAYER vs CLOUD vs LOCAL DESKTOP
+# ------------------------------------------------------------
+def platform_usage(
+    df_wp_logins: pd.DataFrame, df_pro_logins: pd.DataFrame, users: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Logins of the HR-matched users per platform.
+
+    Returns (all classified login rows, LOGIN_COUNT per platform,
+    LOGIN_COUNT per user + platform with HR fields).
+    """
+    active_usernames = set(users["user_name"].unique())
+
+    # 8a. Web Player logins (auth_wp)
+    df_wp_logins = df_wp_logins[df_wp_logins["user_name"].isin(active_usernames)].copy()
+    df_wp_logins["platform"] = "Web Player"
+
+    # 8b. Desktop/Cloud logins (auth_pro)
+    df_pro_logins = df_pro_logins[df_pro_logins["user_name"].isin(active_usernames)].copy()
+    df_pro_logins["platform"] = df_pro_logins["machine"].astype(str).apply(classify_pro_platform)
+
+    # 8c. Combine + count logins per platform (for chart: count of logins per platform)
+    df_logins_all = pd.concat([df_wp_logins, df_pro_logins], ignore_index=True)
+    df_logins_all["logged_time"] = pd.to_datetime(df_logins_all["logged_time"], utc=True, errors="coerce")
+
+    platform_summary_df = (
+        df_logins_all.groupby("platform")
+        .size()
+        .reset_index(name="LOGIN_COUNT")
+        .sort_values("LOGIN_COUNT", ascending=False)
+    )
+
+    # Optional detail: per user, per platform
+    user_platform_logins = (
+        df_logins_all.groupby(["user_name", "platform"])
+        .size()
+        .reset_index(name="LOGIN_COUNT")
+    )
+
+    # Join HR fields to per-user platform logins
+    user_platform_logins = user_platform_logins.merge(
+        users[["user_name", "email", "cost_center_name", "dept_name", "title", "TITLE_CATEGORY"]],
+        on="user_name",
+        how="left",
+    )
+
+    platform_usage_df = user_platform_logins.rename(
+        columns={"user_name": "USER_NAME", "email": "USER_EMAIL"}
+    )
+    return df_logins_all, platform_summary_df, platform_usage_df
@@ -0,0 +1,244 @@
+# ------------------------------------------------------------
+# Local analytical cache: the batch job's normalized frames as Parquet,
+# queried with SQL on the admin's machine (no Trino round trip)
+#
+# Layout under SPOTFIRE_ANALYTICS_DIR (written by spotfire.py when set):
+#   actions/day=YYYY-MM-DD/*.parquet   classified action events (or pushed-down
+#                                      groups, see `events`), one partition per UTC day
+#   logins/day=YYYY-MM-DD/*.parquet    platform logins of the HR-matched users
+#   users/users.parquet                latest user snapshot (HR fields + window metrics)
+#
+# Each run rewrites the complete days it pulled ([start, end)), so older days
+# are kept and re-pulled days are replaced, like the Postgres rollups.
+#
+#   python analytics_cache.py tables
+#   python analytics_cache.py query "SELECT u.dept_name, SUM(a.events) AS analyst_actions
+#       FROM actions a JOIN users u USING (user_name) WHERE a.is_analyst
+#       GROUP BY 1 ORDER BY 2 DESC"
+#   python analytics_cache.py query --format csv --out weekly.csv \
+#       "SELECT platform, date_trunc('week', logged_time) AS week, COUNT(*) AS logins
+#        FROM logins GROUP BY 1, 2 ORDER BY 2, 1"
+#
+# Engine: DuckDB when installed (reads only the columns / day partitions a
+# query touches). Without it, SQLite over just the columns named in the query
+# (SQLite SQL: no date_trunc, timestamps are ISO text).
+#
+# Needs pyarrow. No sibling imports.
+# ------------------------------------------------------------
+
+import argparse
+import importlib.util
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import textwrap
+import uuid
+from contextlib import closing
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+ANALYTICS_DIR = os.environ.get("SPOTFIRE_ANALYTICS_DIR", "")
+
+PARTITION_COL = "day"
+PARTITIONED_TABLES = ("actions", "logins")
+SNAPSHOT_TABLES = ("users",)
+TABLES = PARTITIONED_TABLES + SNAPSHOT_TABLES
+
+ENGINES = ("auto", "duckdb", "sqlite")
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def duckdb_available() -> bool:
+    return importlib.util.find_spec("duckdb") is not None
+
+
+# ------------------------------------------------------------
+# Writing (batch job)
+# ------------------------------------------------------------
+
+
+def _utc_day(ts: pd.Series) -> pd.Series:
+    ts = pd.to_datetime(ts, errors="coerce", utc=True)
+    return ts.dt.strftime("%Y-%m-%d").where(ts.notna(), None)
+
+
+def _parquet_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns with mixed values (e.g. str + float NaN) become nullable strings."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def write_days(
+    df: pd.DataFrame, root: str, table: str, time_col: str, start_day: str, end_day: str
+) -> Dict[str, int]:
+    """
+    Replace the day partitions [start_day, end_day) of `table` with df's rows
+    in that range (by the UTC day of time_col). Returns rows written per day.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = os.path.join(root, table)
+    days = _utc_day(df[time_col])
+    keep = days.notna() & (days >= start_day) & (days < end_day)
+    out = _parquet_ready(df.loc[keep]).assign(**{PARTITION_COL: days[keep]})
+
+    # Clear the whole range first: a day with no rows this run must not keep old ones
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            day = name.split("=", 1)[-1]
+            if name.startswith(f"{PARTITION_COL}=") and start_day <= day < end_day:
+                shutil.rmtree(os.path.join(path, name))
+
+    if not out.empty:
+        pq.write_to_dataset(
+            pa.Table.from_pandas(out, preserve_index=False),
+            path,
+            partition_cols=[PARTITION_COL],
+            basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+        )
+    return out.groupby(PARTITION_COL).size().to_dict()
+
+
+def write_snapshot(df: pd.DataFrame, root: str, table: str) -> str:
+    """Replace `table` with df (temp file + rename)."""
+    path = os.path.join(root, table)
+    os.makedirs(path, exist_ok=True)
+    target = os.path.join(path, f"{table}.parquet")
+    tmp = f"{target}.tmp"
+    _parquet_ready(df).to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    return target
+
+
+# ------------------------------------------------------------
+# Querying (admins)
+# ------------------------------------------------------------
+
+
+def _table_glob(root: str, table: str) -> str:
+    return os.path.join(root, table, "**", "*.parquet")
+
+
+def present_tables(root: str) -> List[str]:
+    return [t for t in TABLES if os.path.isdir(os.path.join(root, t))]
+
+
+def _dataset(root: str, table: str):
+    import pyarrow.dataset as ds
+
+    partitioning = "hive" if table in PARTITIONED_TABLES else None
+    return ds.dataset(os.path.join(root, table), format="parquet", partitioning=partitioning)
+
+
+def describe(root: str) -> pd.DataFrame:
+    """table, columns, partitions (days), rows."""
+    rows = []
+    for table in present_tables(root):
+        dataset = _dataset(root, table)
+        days = sorted(
+            n.split("=", 1)[1] for n in os.listdir(os.path.join(root, table)) if n.startswith(f"{PARTITION_COL}=")
+        )
+        rows.append(
+            {
+                "table": table,
+                "columns": ", ".join(dataset.schema.names),
+                "days": f"{days[0]}..{days[-1]} ({len(days)})" if days else "",
+                "rows": dataset.count_rows(),
+            }
+        )
+    return pd.DataFrame(rows, columns=["table", "columns", "days", "rows"])
+
+
+def _duckdb_query(sql: str, root: str) -> pd.DataFrame:
+    import duckdb
+
+    with closing(duckdb.connect()) as con:
+        for table in present_tables(root):
+            source = _table_glob(root, table).replace("'", "''")
+            hive = "true" if table in PARTITIONED_TABLES else "false"
+            con.execute(
+                f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{source}', hive_partitioning = {hive})"
+            )
+        return con.execute(sql).df()
+
+
+def _sqlite_query(sql: str, root: str) -> pd.DataFrame:
+    """Load only the tables / columns the SQL names (word match) into in-memory SQLite."""
+    words = {w.lower() for w in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", sql)}
+    with closing(sqlite3.connect(":memory:")) as con:
+        for table in present_tables(root):
+            if table not in words:
+                continue
+            dataset = _dataset(root, table)
+            columns = [c for c in dataset.schema.names if c.lower() in words] or dataset.schema.names[:1]
+            frame = dataset.to_table(columns=columns).to_pandas()
+            for col in frame.columns:
+                if isinstance(frame[col].dtype, pd.DatetimeTZDtype):
+                    frame[col] = frame[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+            frame.to_sql(table, con, index=False)
+        return pd.read_sql_query(sql, con)
+
+
+def query(sql: str, root: Optional[str] = None, engine: str = "auto") -> pd.DataFrame:
+    """Run SQL over the cached tables (actions, logins, users) in `root`."""
+    root = root or ANALYTICS_DIR
+    if not root or not present_tables(root):
+        raise FileNotFoundError(f"No analytics tables under {root!r} (set SPOTFIRE_ANALYTICS_DIR / --root)")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+    if engine == "duckdb" or (engine == "auto" and duckdb_available()):
+        return _duckdb_query(sql, root)
+    return _sqlite_query(sql, root)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="SQL over the spotfire.py analytics cache (Parquet)")
+    ap.add_argument("--root", default=ANALYTICS_DIR, help="Cache directory (default: SPOTFIRE_ANALYTICS_DIR)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("tables", help="List tables, columns, day partitions and row counts")
+    q = sub.add_parser("query", help="Run one SQL statement")
+    q.add_argument("sql", help="SQL text, or @file.sql")
+    q.add_argument("--engine", choices=ENGINES, default="auto")
+    q.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    q.add_argument("--out", help="Write the result here instead of stdout")
+    args = ap.parse_args()
+
+    if not parquet_available():
+        sys.exit("pyarrow is required for the analytics cache")
+
+    if args.command == "tables":
+        tables = describe(args.root)
+        print(tables.drop(columns="columns").to_string(index=False))
+        for row in tables.itertuples():
+            print(f"\n{row.table}:")
+            print(textwrap.fill(row.columns, width=100, initial_indent="  ", subsequent_indent="  "))
+        return
+
+    sql = open(args.sql[1:]).read() if args.sql.startswith("@") else args.sql
+    result = query(sql, args.root, args.engine)
+    if args.format == "csv":
+        text = result.to_csv(index=False)
+    elif args.format == "json":
+        text = result.to_json(orient="records", date_format="iso", indent=2)
+    else:
+        text = result.to_string(index=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"{len(result)} rows -> {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
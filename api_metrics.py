@@ -0,0 +1,299 @@
+# ------------------------------------------------------------
+# API metrics: request / stage histograms, cache counters, sampling profiler
+#
+# Served by the router as GET /metrics (Prometheus text format 0.0.4).
+# Per process: with several uvicorn workers each one reports its own series.
+# ------------------------------------------------------------
+
+import collections
+import contextvars
+import dataclasses
+import functools
+import importlib.util
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "license_api"
+
+# Seconds; covers sub-ms cache hits up to multi-minute cold builds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Opt-in sampling profiler (pyinstrument): fraction of requests profiled, 0 = off
+PROFILE_SAMPLE_RATE = float(os.environ.get("LICENSE_API_PROFILE_RATE", "0"))
+PROFILE_KEEP = int(os.environ.get("LICENSE_API_PROFILE_KEEP", "20"))
+
+# Keys remembered per cache to tell first fills from refills after expiry/eviction
+MAX_TRACKED_KEYS = 10_000
+
+_HELP = {
+    "request_seconds": "Request handling time per route (streamed bodies excluded).",
+    "stage_seconds": "Time spent per stage (getdata, license build steps, serialization).",
+    "cache_requests_total": "Calls through a cached function.",
+    "cache_hits_total": "Calls answered from the cache.",
+    "cache_misses_total": "Calls that ran the cached function.",
+    "cache_evictions_total": "Misses for a key that had been cached before (TTL expiry or eviction).",
+    "cache_fill_seconds": "Time to build a cache entry on a miss.",
+    "cache_entry_bytes": "Approximate in-memory size of the last entry built per cache.",
+    "cache_removals_total": "Entries removed or refused by a byte-budgeted cache, by reason.",
+    "cache_bytes": "Bytes held by a byte-budgeted cache.",
+    "cache_entries": "Entries held by a byte-budgeted cache.",
+    "identity_events_total": "Identity resolution events (see /license-reduction/unresolved-metrics).",
+    "profiles_captured_total": "Requests captured by the sampling profiler.",
+    "license_snapshot_rows": "Rows in the current license snapshot.",
+    "license_snapshot_age_seconds": "Seconds since the license snapshot was built.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Metrics:
+    """Thread-safe counters, gauges and fixed-bucket histograms keyed by (name, labels)."""
+
+    def __init__(self, prefix: str = METRIC_PREFIX, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = collections.defaultdict(dict)
+        self._gauges: Dict[str, Dict[LabelKey, float]] = collections.defaultdict(dict)
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = collections.defaultdict(dict)
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._gauges[name][_labels(labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            hist = self._histograms[name].get(key)
+            if hist is None:
+                # [per-bucket counts..., +Inf count, sum]
+                hist = self._histograms[name][key] = [0.0] * (len(self.buckets) + 2)
+            hist[int(np.searchsorted(self.buckets, seconds, side="left"))] += 1
+            hist[-1] += seconds
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def render(self) -> str:
+        """Prometheus text exposition of every series."""
+        p = self.prefix
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines += [f"# HELP {p}_{name} {_HELP.get(name, name)}", f"# TYPE {p}_{name} counter"]
+                lines += [f"{p}_{name}{_fmt_labels(k)} {v:g}" for k, v in sorted(series.items())]
+            for name, series in sorted(self._gauges.items()):
+                lines += [f"# HELP {p}_{name} {_HELP.get(name, name)}", f"# TYPE {p}_{name} gauge"]
+                lines += [f"{p}_{name}{_fmt_labels(k)} {v:g}" for k, v in sorted(series.items())]
+            for name, series in sorted(self._histograms.items()):
+                lines += [f"# HELP {p}_{name} {_HELP.get(name, name)}", f"# TYPE {p}_{name} histogram"]
+                for key, hist in sorted(series.items()):
+                    cumulative = np.cumsum(hist[:-1])
+                    for le, count in zip(self.buckets, cumulative):
+                        lines.append(f"{p}_{name}_bucket{_fmt_labels(key, ('le', f'{le:g}'))} {count:g}")
+                    lines.append(f"{p}_{name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {cumulative[-1]:g}")
+                    lines.append(f"{p}_{name}_sum{_fmt_labels(key)} {hist[-1]:.6f}")
+                    lines.append(f"{p}_{name}_count{_fmt_labels(key)} {cumulative[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+# ---------------------------------------------------------------------------
+# Cached-function instrumentation
+# ---------------------------------------------------------------------------
+
+
+def approx_bytes(obj: Any, _depth: int = 0) -> int:
+    """
+    Rough in-memory size: pandas/numpy buffers (object columns deep), dataclass
+    fields and containers summed. Shared buffers are counted once per reference.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if _depth > 4:
+        return sys.getsizeof(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sum(approx_bytes(getattr(obj, f.name), _depth + 1) for f in dataclasses.fields(obj))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            approx_bytes(k, _depth + 1) + approx_bytes(v, _depth + 1) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(approx_bytes(v, _depth + 1) for v in obj)
+    return sys.getsizeof(obj)
+
+
+# Set per call by metered_cache's outer wrapper, flipped by the inner one on a miss
+_MISSED: contextvars.ContextVar = contextvars.ContextVar("cache_missed")
+
+
+def metered_cache(name: str, cache_decorator: Callable, registry: Metrics = METRICS) -> Callable:
+    """
+    Wrap an aiocache decorator with hit / miss / eviction counters, fill time and
+    entry size (label cache=name):
+
+        @metered_cache("sf_users", cached(ttl=..., serializer=PickleSerializer()))
+        async def get_cached_sf_users(): ...
+
+    The function body only runs on a miss, so the inner wrapper flags the call;
+    a miss for a key built before means the entry expired or was evicted.
+    """
+
+    def decorate(fn: Callable) -> Callable:
+        seen: "collections.OrderedDict[str, None]" = collections.OrderedDict()
+
+        @functools.wraps(fn)
+        async def fill(*args, **kwargs):
+            flag = _MISSED.get(None)
+            if flag is not None:
+                flag[0] = True
+            registry.inc("cache_misses_total", cache=name)
+
+            key = repr((args, sorted(kwargs.items())))
+            if key in seen:
+                registry.inc("cache_evictions_total", cache=name)
+                seen.move_to_end(key)
+            else:
+                seen[key] = None
+                if len(seen) > MAX_TRACKED_KEYS:
+                    seen.popitem(last=False)
+
+            with registry.timer("cache_fill_seconds", cache=name):
+                result = await fn(*args, **kwargs)
+            registry.set("cache_entry_bytes", approx_bytes(result), cache=name)
+            return result
+
+        cached_fn = cache_decorator(fill)
+
+        @functools.wraps(cached_fn)
+        async def call(*args, **kwargs):
+            flag = [False]
+            token = _MISSED.set(flag)
+            try:
+                return await cached_fn(*args, **kwargs)
+            finally:
+                _MISSED.reset(token)
+                registry.inc("cache_requests_total", cache=name)
+                if not flag[0]:
+                    registry.inc("cache_hits_total", cache=name)
+
+        return call
+
+    return decorate
+
+
+# ---------------------------------------------------------------------------
+# Per-route timing + sampling profiler
+# ---------------------------------------------------------------------------
+
+
+def profiler_available() -> bool:
+    return importlib.util.find_spec("pyinstrument") is not None
+
+
+PROFILES: Deque[Dict[str, Any]] = collections.deque(maxlen=max(PROFILE_KEEP, 1))
+_PROFILER_STATE: Dict[str, Any] = {"warned": False}
+
+
+def _sampled() -> bool:
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return False
+    if profiler_available():
+        return True
+    if not _PROFILER_STATE["warned"]:
+        logger.warning("LICENSE_API_PROFILE_RATE is set but pyinstrument is not installed; profiling disabled")
+        _PROFILER_STATE["warned"] = True
+    return False
+
+
+class MeteredRoute(APIRoute):
+    """
+    APIRoute that records request_seconds{route, method, status} and, for a
+    sampled fraction of requests (PROFILE_SAMPLE_RATE), a pyinstrument profile
+    kept in PROFILES (newest last).
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def metered_handler(request):
+            profiler = None
+            if not route.startswith("/metrics") and _sampled():
+                from pyinstrument import Profiler
+
+                profiler = Profiler(async_mode="enabled")
+                profiler.start()
+
+            status = "500"
+            started = time.time()
+            t0 = time.perf_counter()
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            except HTTPException as e:
+                status = str(e.status_code)
+                raise
+            finally:
+                elapsed = time.perf_counter() - t0
+                METRICS.observe("request_seconds", elapsed, route=route, method=request.method, status=status)
+                if profiler is not None:
+                    profiler.stop()
+                    METRICS.inc("profiles_captured_total", route=route)
+                    PROFILES.append(
+                        {
+                            "route": route,
+                            "method": request.method,
+                            "query": str(request.url.query),
+                            "status": status,
+                            "started": started,
+                            "seconds": round(elapsed, 4),
+                            "text": profiler.output_text(unicode=False, color=False),
+                        }
+                    )
+
+        return metered_handler
@@ -0,0 +1,111 @@
+# ------------------------------------------------------------
+# Benchmark: license-user dedupe engine (identity.dedupe_accounts)
+#
+#   python benchmarks/bench_dedupe.py [--max-rows 1000000] [--strategy email]
+#
+# Runs the dedupe on synthetic account sets of doubling size and reports
+# seconds + ns/row. For --strategy email it also times the sort-based dedupe
+# it replaced (sort_dedupe, the old total_views exact-email version) on the
+# same frame, and checks both keep the same accounts.
+# ------------------------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from identity import DEDUPE_STRATEGIES, dedupe_accounts, normalize_str  # noqa: E402
+
+
+def synthetic_accounts(n: int, seed: int = 7) -> pd.DataFrame:
+    """
+    n Spotfire accounts for ~0.8n people: duplicate accounts, partner emails,
+    mixed-case addresses and some missing emails.
+    """
+    rng = np.random.default_rng(seed)
+    people = rng.integers(0, int(n * 0.8), size=n)
+    domain = np.where(rng.random(n) < 0.15, "partner.samsung.com", "samsung.com")
+    emails = pd.Series([f"user{p}@{d}" for p, d in zip(people, domain)], dtype="object")
+    emails[rng.random(n) < 0.05] = None
+    upper = rng.random(n) < 0.05
+    emails[upper] = emails[upper].str.upper()
+
+    base = np.datetime64("2026-01-01T00:00:00")
+    activity = base + rng.integers(0, 90 * 86400, size=n).astype("timedelta64[s]")
+    apd = np.round(rng.exponential(0.8, size=n), 4)
+
+    return pd.DataFrame(
+        {
+            "USER_NAME": [f"acct{i}" for i in range(n)],
+            "USER_EMAIL": emails,
+            "LAST_ACTIVITY": pd.Series(activity).dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "ANALYST_ACTIONS_PER_DAY": apd,
+            "recommendedAction": np.where(apd >= 1, "Analyst", "Consumer"),
+        }
+    )
+
+
+def sort_dedupe(df_in: pd.DataFrame) -> pd.DataFrame:
+    """Baseline: full sort by the preference order, first row per normalized email."""
+    df = df_in.copy()
+    df["USER_EMAIL"] = normalize_str(df["USER_EMAIL"], lower=True)
+    has_email = df["USER_EMAIL"].notna()
+    df["ANALYST_ACTIONS_PER_DAY"] = pd.to_numeric(df["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0)
+    df["_LAST_ACTIVITY_DT"] = pd.to_datetime(df["LAST_ACTIVITY"], errors="coerce", utc=True)
+    df["_IS_ANALYST"] = (df["recommendedAction"].astype(str).str.strip().str.lower() == "analyst").astype(int)
+    df_sorted = df.sort_values(
+        by=["_IS_ANALYST", "_LAST_ACTIVITY_DT", "ANALYST_ACTIONS_PER_DAY", "USER_NAME"],
+        ascending=[False, False, False, True],
+        na_position="last",
+    )
+    kept = df_sorted.loc[has_email].drop_duplicates(subset=["USER_EMAIL"], keep="first")
+    out = pd.concat([kept, df_sorted.loc[~has_email]], ignore_index=True)
+    return out.drop(columns=["_LAST_ACTIVITY_DT", "_IS_ANALYST"])
+
+
+def best_of(fn, df: pd.DataFrame, repeat: int) -> Tuple[float, pd.DataFrame]:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-rows", type=int, default=1_000_000)
+    ap.add_argument("--strategy", choices=DEDUPE_STRATEGIES, default="email")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    sizes = []
+    n = args.max_rows
+    while n >= 50_000 and len(sizes) < 4:
+        sizes.append(n)
+        n //= 2
+    sizes.reverse()
+
+    baseline = args.strategy == "email"
+    print(f"strategy={args.strategy}")
+    header = f"{'rows':>10} {'kept':>10} {'seconds':>9} {'ns/row':>8}"
+    print(header + (f" {'sort s':>9} {'speedup':>8} {'same':>5}" if baseline else ""))
+    for n in sizes:
+        df = synthetic_accounts(n)
+        secs, out = best_of(lambda d: dedupe_accounts(d, strategy=args.strategy), df, args.repeat)
+        line = f"{n:>10} {len(out):>10} {secs:>9.3f} {secs / n * 1e9:>8.0f}"
+        if baseline:
+            base_secs, base_out = best_of(sort_dedupe, df, args.repeat)
+            same = set(out["USER_NAME"]) == set(base_out["USER_NAME"])
+            line += f" {base_secs:>9.3f} {base_secs / secs:>7.2f}x {str(same):>5}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
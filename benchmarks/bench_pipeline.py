@@ -0,0 +1,252 @@
+# ------------------------------------------------------------
+# Benchmark: spotfire.py batch stages + API enrichment/dedupe on synthetic data
+#
+#   python benchmarks/bench_pipeline.py [--scale small|medium|large]
+#                                       [--users N] [--actions N] [--seed 7]
+#                                       [--workers N]
+#                                       [--json out.json] [--baseline old.json]
+#
+# Stages (same functions the job / API run, no getData / S3 / PostgreSQL):
+#   load       read the synthetic CSV pulls + apply the getData filters
+#   classify   users last_login parse, action analyst flags + action_day
+#   aggregate  (user, day) rollup, window metrics, top actions, report loads
+#   hr_merge   email -> nt_id HR merge, final user frame, platform usage
+#   enrich     employee enrichment of the license rows (API build path)
+#   dedupe     license-user dedupe (identity.dedupe_accounts)
+#   serialize  COPY CSV payloads of every output table
+#
+# Seconds are the best of --repeat untraced runs; peak MiB comes from one
+# extra tracemalloc pass (numpy/pandas buffers included). With --baseline,
+# stages slower than --tolerance exit non-zero (regression gate).
+# ------------------------------------------------------------
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyst_usage as au  # noqa: E402
+from action_rules import EXCLUDE  # noqa: E402
+from identity import dedupe_accounts, enrich_with_employee_data, system_account_mask  # noqa: E402
+from pg_loader import to_copy_csv  # noqa: E402
+from synthetic import SCALES, Scale, generate, write_tables  # noqa: E402
+
+AS_OF = "2026-10-19"
+ANALYST_THRESHOLD = 50
+ANALYST_ACTIONS_THRESHOLD = 1.0
+
+
+# ------------------------------------------------------------
+# Stages (each reads + extends the running state dict)
+# ------------------------------------------------------------
+def stage_load(state: Dict[str, Any]) -> None:
+    """Read the pulls back and apply the same filters getData applies server-side."""
+    raw = {name: pd.read_csv(path, dtype=str) for name, path in state["paths"].items()}
+    log = raw["spotfire_if2sf_actionlog"]
+    system = system_account_mask(log["user_name"])
+    ok = log["success"].eq("1") & ~system
+
+    state["users_df"] = raw["spotfire_if2sf_users"]
+    state["df_actions"] = log.loc[
+        ok & (au.ACTION_RULES.classify(log["log_category"], log["log_action"]) != EXCLUDE),
+        ["log_action", "log_category", "user_name", "logged_time"],
+    ].copy()
+    state["df_reports"] = log.loc[
+        ~system
+        & log["log_category"].str.startswith("library")
+        & log["log_action"].isin(["load_content", "load"]),
+        ["id2", "log_action", "log_category", "logged_time"],
+    ].copy()
+    logins = ok & log["log_action"].eq("login")
+    cols = ["user_name", "machine", "success", "logged_time"]
+    state["df_wp_logins"] = log.loc[logins & log["log_category"].eq("auth_wp"), cols].copy()
+    state["df_pro_logins"] = log.loc[logins & log["log_category"].eq("auth_pro"), cols].copy()
+
+    primary = raw["pageradm_employee_ghr"]
+    state["user_data"] = primary.loc[
+        primary["smtp"].notna(), ["cost_center_name", "dept_name", "smtp", "title", "nt_id"]
+    ].copy()
+    state["primary_emp"] = primary
+    state["fallback_emp"] = raw["dss_employee_ghr"]
+
+
+def stage_classify(state: Dict[str, Any]) -> None:
+    state["users"] = au.prepare_users(state["users_df"])
+    state["df_actions"] = au.classify_actions(state["df_actions"])
+
+
+def stage_aggregate(state: Dict[str, Any]) -> None:
+    daily = au.daily_action_rollup(state["df_actions"])
+    state["users"] = au.add_window_metrics(state["users"], daily, pd.Timestamp(AS_OF, tz="UTC"))
+    state["top_actions_df"], _ = au.top_analyst_actions(state["df_actions"])
+    state["df_report"] = au.most_viewed_reports(state["df_reports"])
+
+
+def stage_hr_merge(state: Dict[str, Any]) -> None:
+    users, state["hr_matches"] = au.merge_hr(state["users"], state["user_data"], workers=state["workers"])
+    users = au.add_user_fields(users, ANALYST_THRESHOLD)
+    state["final_df"] = au.build_final_df(users)
+    _, state["platform_summary_df"], state["platform_usage_df"] = au.platform_usage(
+        state["df_wp_logins"], state["df_pro_logins"], users
+    )
+
+
+def stage_enrich(state: Dict[str, Any]) -> None:
+    rows = state["final_df"][["USER_NAME", "USER_EMAIL", "LAST_ACTIVITY", "ANALYST_ACTIONS_PER_DAY"]].copy()
+    rows["recommendedAction"] = np.where(
+        rows["ANALYST_ACTIONS_PER_DAY"] >= ANALYST_ACTIONS_THRESHOLD, "Analyst", "Consumer"
+    )
+    state["enriched"] = enrich_with_employee_data(
+        rows.reset_index(drop=True),
+        email_col="USER_EMAIL",
+        username_col="USER_NAME",
+        primary_emp=state["primary_emp"],
+        fallback_emp=state["fallback_emp"],
+        workers=state["workers"],
+    )
+
+
+def stage_dedupe(state: Dict[str, Any]) -> None:
+    state["license_df"] = dedupe_accounts(state["enriched"], strategy="email")
+
+
+def stage_serialize(state: Dict[str, Any]) -> None:
+    outputs = ["final_df", "top_actions_df", "df_report", "platform_usage_df", "platform_summary_df", "license_df"]
+    state["payload_bytes"] = sum(len(to_copy_csv(state[name]).getbuffer()) for name in outputs)
+
+
+STAGES: List[Tuple[str, Callable[[Dict[str, Any]], None]]] = [
+    ("load", stage_load),
+    ("classify", stage_classify),
+    ("aggregate", stage_aggregate),
+    ("hr_merge", stage_hr_merge),
+    ("enrich", stage_enrich),
+    ("dedupe", stage_dedupe),
+    ("serialize", stage_serialize),
+]
+
+
+# ------------------------------------------------------------
+# Runner
+# ------------------------------------------------------------
+def run_once(
+    paths: Dict[str, str], trace: bool, workers: int = 1
+) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, Any]]:
+    """One pass over every stage: seconds per stage, peak MiB per stage (trace only), final state."""
+    state: Dict[str, Any] = {"paths": paths, "workers": workers}
+    seconds: Dict[str, float] = {}
+    peaks: Dict[str, float] = {}
+    for name, fn in STAGES:
+        if trace:
+            tracemalloc.start()
+            base, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        fn(state)
+        seconds[name] = time.perf_counter() - t0
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks[name] = (peak - base) / 2**20
+    return seconds, peaks, state
+
+
+def compare(report: Dict[str, Any], baseline_path: str, tolerance: float) -> List[str]:
+    """Stages whose time grew by more than `tolerance` (fraction) vs a previous --json report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("scale") != report["scale"]:
+        print(f"warning: baseline scale {baseline.get('scale')} differs from {report['scale']}")
+    regressions = []
+    for name, cur in report["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or old["seconds"] <= 0:
+            continue
+        ratio = cur["seconds"] / old["seconds"]
+        cur["baseline_ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {old['seconds']:.3f}s -> {cur['seconds']:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", choices=sorted(SCALES), default="small")
+    ap.add_argument("--users", type=int, help="Override the scale's Spotfire account count")
+    ap.add_argument("--actions", type=int, help="Override the scale's action log rows")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=1, help="hr_merge / enrich processes (identity.map_shards)")
+    ap.add_argument("--data-dir", help="Where the synthetic CSVs go (default: a temp dir)")
+    ap.add_argument("--json", help="Write the report here (for regression tracking)")
+    ap.add_argument("--baseline", help="Previous --json report to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs --baseline (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    base = SCALES[args.scale]
+    scale = Scale(users=args.users or base.users, actions=args.actions or base.actions)
+
+    t0 = time.perf_counter()
+    tables = generate(scale, seed=args.seed, as_of=AS_OF)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="spotfire-bench-")
+    paths = write_tables(tables, data_dir)
+    rows = {name: len(df) for name, df in tables.items()}
+    del tables
+    print(f"generated {scale} seed={args.seed} in {time.perf_counter() - t0:.1f}s -> {data_dir}")
+
+    best = {name: float("inf") for name, _ in STAGES}
+    for _ in range(args.repeat):
+        seconds, _, state = run_once(paths, trace=False, workers=args.workers)
+        best = {name: min(best[name], seconds[name]) for name in best}
+    _, peaks, _ = run_once(paths, trace=True, workers=args.workers)
+
+    report: Dict[str, Any] = {
+        "scale": {"name": args.scale, "users": scale.users, "actions": scale.actions, "seed": args.seed},
+        "workers": args.workers,
+        "rows": rows,
+        "outputs": {
+            "final_users": len(state["final_df"]),
+            "license_rows": len(state["license_df"]),
+            "hr_matches": state["hr_matches"],
+            "payload_bytes": state["payload_bytes"],
+        },
+        "stages": {name: {"seconds": round(best[name], 4), "peak_mib": round(peaks[name], 1)} for name, _ in STAGES},
+        "total_seconds": round(sum(best.values()), 4),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    regressions = compare(report, args.baseline, args.tolerance) if args.baseline else []
+
+    print(f"{'stage':<10} {'seconds':>9} {'peak MiB':>9} {'vs base':>8}")
+    for name, stats in report["stages"].items():
+        ratio = f"{stats['baseline_ratio']:.2f}x" if "baseline_ratio" in stats else ""
+        print(f"{name:<10} {stats['seconds']:>9.3f} {stats['peak_mib']:>9.1f} {ratio:>8}")
+    print(f"{'total':<10} {report['total_seconds']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print("report:", args.json)
+
+    if regressions:
+        print("REGRESSIONS (> {:.0%} slower):".format(args.tolerance))
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# ------------------------------------------------------------
+# Seeded synthetic Spotfire + HR tables for the benchmarks
+#
+# Shapes match the getData pulls (same column names and text formats):
+# - spotfire_if2sf_users   email, last_login, user_id, user_name
+# - spotfire_if2sf_actionlog   user_name, log_category, log_action, logged_time,
+#                              id2, arg1, session_id, machine, success
+# - pageradm_employee_ghr  full_name, smtp, status_name, bname, nt_id, gad_id,
+#                          cost_center_name, dept_name, title
+# - dss_employee_ghr       full_name, smtp, status_name, cost_center_name,
+#                          dept_name, title
+#
+# Realism knobs: several accounts per person, DOMAIN\user and bname logins,
+# partner / mixed-case / missing emails, people only in the fallback HR table,
+# duplicate and null-nt_id HR rows, Zipf-skewed user and report activity.
+#
+# Offline fixtures for spotfire.py / the API (datasources, backend "offline"):
+#   python benchmarks/synthetic.py --scale small --out fixtures
+# ------------------------------------------------------------
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyst_usage import CLOUD_IPS, LAST_LOGIN_FORMAT, LOCAL_IPS  # noqa: E402
+from identity import SYSTEM_ACCOUNTS  # noqa: E402
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int  # Spotfire accounts
+    actions: int  # action log rows over the 90-day pull
+
+
+SCALES = {
+    "small": Scale(users=2_000, actions=200_000),
+    "medium": Scale(users=20_000, actions=2_000_000),
+    "large": Scale(users=100_000, actions=10_000_000),
+}
+
+# Action log mix (category, action, weight); library + auth rows feed the report and login stages
+ACTION_MIX = [
+    ("analysis_pro", "create_visualization", 10),
+    ("analysis_pro", "modify_data_table", 6),
+    ("analysis_pro", "insert_calculated_column", 4),
+    ("data_connector_pro", "create_connection", 2),
+    ("info_link", "get_data", 5),
+    ("info_link", "load_il", 3),
+    ("info_link", "create_information_link", 1),
+    ("analysis_wp", "set_page", 12),
+    ("analysis_wp", "modify_filter", 14),
+    ("analysis_wp", "mark", 10),
+    ("analysis_web", "open_analysis", 8),
+    ("library", "load_content", 9),
+    ("library_wp", "load", 6),
+    ("auth_wp", "login", 6),
+    ("auth_pro", "login", 4),
+]
+
+TITLES = [
+    "Staff Engineer I", "Senior Engineer", "Process Technician", "Equipment Technician II",
+    "Manager, Yield", "Director of Operations", "Data Scientist", "Specialist", "Operator",
+    "Associate", "Team Lead", "VP Manufacturing", "Developer", "Maintenance Tech", "",
+]
+
+def _pick(rng: np.random.Generator, values, size: int, weights=None) -> np.ndarray:
+    values = np.asarray(values, dtype=object)
+    p = None if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    return values[rng.choice(len(values), size=size, p=p)]
+
+
+def _zipf_codes(rng: np.random.Generator, n: int, size: int, a: float = 1.2) -> np.ndarray:
+    """Skewed draws over 0..n-1 (a few heavy users / reports, a long tail)."""
+    weights = 1.0 / np.arange(1, n + 1) ** a
+    return rng.permutation(n)[rng.choice(n, size=size, p=weights / weights.sum())]
+
+
+def _people(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    ids = np.arange(n)
+    return pd.DataFrame(
+        {
+            "nt_id": np.char.add("nt", np.char.zfill(ids.astype(str), 6)).astype(object),
+            "bname": np.char.add("b", np.char.zfill(ids.astype(str), 6)).astype(object),
+            "gad_id": np.char.add("gad", ids.astype(str)).astype(object),
+            "local": np.char.add("first", np.char.add(ids.astype(str), ".last")).astype(object),
+            "full_name": np.char.add("Person ", ids.astype(str)).astype(object),
+            "status_name": _pick(rng, ["Active", "Terminated", "Leave"], n, [94, 4, 2]),
+            "cost_center_name": _pick(rng, [f"CC{i:03d}" for i in range(max(n // 100, 5))], n),
+            "dept_name": _pick(rng, [f"Dept {i}" for i in range(max(n // 400, 3))], n),
+            "title": _pick(rng, TITLES, n),
+        }
+    )
+
+
+def generate(scale: Scale, seed: int = 7, as_of: str = "2026-10-19") -> Dict[str, pd.DataFrame]:
+    """All four source tables for `scale` (deterministic for a given seed)."""
+    rng = np.random.default_rng(seed)
+    n_people = max(int(scale.users * 0.85), 1)
+    people = _people(n_people, rng)
+
+    # --- Spotfire accounts: ~15% are second accounts of an existing person
+    owner = np.concatenate([np.arange(n_people), rng.integers(0, n_people, scale.users - n_people)])
+    owner = rng.permutation(owner)[: scale.users]
+    p = people.iloc[owner].reset_index(drop=True)
+
+    name_style = rng.choice(4, size=scale.users, p=[0.5, 0.25, 0.15, 0.1])
+    user_name = np.select(
+        [name_style == 0, name_style == 1, name_style == 2],
+        [p["nt_id"], "SAMSUNG\\" + p["nt_id"].str.upper(), p["bname"]],
+        default=p["local"],
+    ).astype(object)
+    user_name = pd.Series(user_name).where(~pd.Series(user_name).duplicated(), user_name + "_2").to_numpy()
+
+    email_style = rng.choice(4, size=scale.users, p=[0.70, 0.12, 0.08, 0.10])
+    email = np.select(
+        [email_style == 0, email_style == 1, email_style == 2],
+        [p["local"] + "@samsung.com", p["local"] + "@partner.samsung.com", " " + p["local"].str.upper() + "@Samsung.com "],
+        default=None,
+    )
+
+    as_of_ts = np.datetime64(as_of + "T00:00:00")
+    login_secs = rng.integers(0, 90 * 86400, size=scale.users).astype("timedelta64[s]")
+    last_login = pd.Series(as_of_ts - login_secs).dt.strftime(LAST_LOGIN_FORMAT).str.upper()
+
+    users = pd.DataFrame(
+        {
+            "email": email,
+            "last_login": last_login,
+            "user_id": [f"{i:08x}-synthetic" for i in range(scale.users)],
+            "user_name": user_name,
+        }
+    )
+
+    # --- Action log: skewed per-account activity + a sprinkle of system accounts
+    acct = _zipf_codes(rng, scale.users, scale.actions, a=0.9)
+    actor = users["user_name"].to_numpy()[acct]
+    system = rng.random(scale.actions) < 0.01
+    actor[system] = _pick(rng, SYSTEM_ACCOUNTS, int(system.sum()))
+
+    mix = rng.choice(len(ACTION_MIX), size=scale.actions, p=np.array([w for *_, w in ACTION_MIX]) / sum(w for *_, w in ACTION_MIX))
+    categories = np.array([c for c, _, _ in ACTION_MIX], dtype=object)[mix]
+    actions = np.array([a for _, a, _ in ACTION_MIX], dtype=object)[mix]
+
+    secs = rng.integers(0, 90 * 86400, size=scale.actions).astype("timedelta64[s]")
+    logged = np.datetime_as_string(as_of_ts - secs, unit="s")
+
+    n_reports = max(scale.users // 4, 10)
+    report_paths = np.char.add("/Reports/Area", np.char.add((np.arange(n_reports) % 40).astype(str),
+                               np.char.add("/Report", np.arange(n_reports).astype(str)))).astype(object)
+    is_library = np.char.startswith(categories.astype(str), "library")
+    id2 = np.where(is_library, report_paths[_zipf_codes(rng, n_reports, scale.actions)], None)
+
+    ips = list(CLOUD_IPS) + list(LOCAL_IPS) + ["10.1.2.3", "10.4.5.6"]
+    machine = np.where(categories == "auth_pro", _pick(rng, ips, scale.actions, [3, 3, 3, 4, 1, 1]), "wp-node-1")
+
+    actionlog = pd.DataFrame(
+        {
+            "user_name": actor,
+            "log_category": categories,
+            "log_action": actions,
+            "logged_time": logged,
+            "id2": id2,
+            "arg1": np.where(is_library, "dxp", None),
+            "session_id": np.char.add("s", (acct * 7 + secs.astype(np.int64) // 3600).astype(str)).astype(object),
+            "machine": machine,
+            "success": np.where(rng.random(scale.actions) < 0.97, "1", "0"),
+        }
+    )
+
+    # --- HR: 95% of people in the primary table (with dupes + null nt_id), the rest in the fallback
+    in_primary = rng.random(n_people) < 0.95
+    primary = people.loc[in_primary].assign(smtp=lambda d: d["local"] + "@samsung.com")
+    primary.loc[rng.random(len(primary)) < 0.03, "nt_id"] = None
+    primary = pd.concat([primary, primary.sample(frac=0.02, random_state=seed)], ignore_index=True)
+    primary = primary[
+        ["full_name", "smtp", "status_name", "bname", "nt_id", "gad_id", "cost_center_name", "dept_name", "title"]
+    ]
+
+    fallback = people.loc[~in_primary].assign(smtp=lambda d: d["local"] + "@samsung.com")
+    fallback = fallback[["full_name", "smtp", "status_name", "cost_center_name", "dept_name", "title"]]
+
+    return {
+        "spotfire_if2sf_users": users,
+        "spotfire_if2sf_actionlog": actionlog,
+        "pageradm_employee_ghr": primary.reset_index(drop=True),
+        "dss_employee_ghr": fallback.reset_index(drop=True),
+    }
+
+
+def write_tables(tables: Dict[str, pd.DataFrame], data_dir: str) -> Dict[str, str]:
+    """One CSV per table (what the load stage reads back); returns table -> path."""
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {}
+    for name, df in tables.items():
+        paths[name] = os.path.join(data_dir, f"{name}.csv")
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Write synthetic tables as offline getData fixtures")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="small")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--as-of", default=pd.Timestamp.now("UTC").strftime("%Y-%m-%d"))
+    ap.add_argument("--out", default="fixtures")
+    args = ap.parse_args()
+    for name, path in write_tables(generate(SCALES[args.scale], args.seed, args.as_of), args.out).items():
+        print(name, "->", path)
@@ -0,0 +1,179 @@
+# ------------------------------------------------------------
+# Byte-budgeted in-process cache (LRU eviction + frequency-based admission)
+#
+# For results that are many, large and unevenly popular (per-report views):
+# - every entry is sized once on insert; the total never exceeds max_bytes
+# - eviction is least-recently-used; expired entries go first
+# - admission (TinyLFU-style): when inserting would evict, the candidate only
+#   gets in if it has been requested more often than every entry it would
+#   push out, so a crawler's one-off lookups can't flush the hot reports
+# - concurrent misses for one key share a single build
+#
+# Values are returned as-is (no pickle round trip): callers must not mutate them.
+# No sibling imports.
+# ------------------------------------------------------------
+
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+@dataclass
+class _Entry:
+    value: Any
+    nbytes: int
+    expires: float
+
+
+class ByteBudgetCache:
+    """
+    - max_bytes: budget for the sum of entry sizes (sizeof(value))
+    - ttl: seconds an entry stays valid
+    - max_entry_fraction: values bigger than this share of the budget are never stored
+    - frequency_window: accesses after which every frequency count is halved
+      (recent popularity wins over all-time popularity)
+    - on_event(event, n): optional hook for metrics; events are "evicted",
+      "expired", "rejected" (lost admission) and "oversize" (never stored)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[Any], int],
+        max_entry_fraction: float = 0.25,
+        frequency_window: int = 10_000,
+        on_event: Optional[Callable[[str, int], None]] = None,
+    ):
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self.frequency_window = frequency_window
+        self.on_event = on_event
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._freq: Dict[Hashable, int] = {}
+        self._accesses = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _event(self, event: str, n: int = 1) -> None:
+        if self.on_event is not None and n:
+            self.on_event(event, n)
+
+    def _touch(self, key: Hashable) -> int:
+        self._freq[key] = self._freq.get(key, 0) + 1
+        self._accesses += 1
+        if self._accesses >= self.frequency_window:
+            self._freq = {k: c // 2 for k, c in self._freq.items() if c > 1}
+            self._accesses = 0
+        return self._freq.get(key, 0)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.nbytes
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if e.expires <= now]
+        for key in expired:
+            self._drop(key)
+        self._event("expired", len(expired))
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(found, value); counts the access toward the key's admission frequency."""
+        self._touch(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.expires <= time.monotonic():
+            self._drop(key)
+            self._event("expired")
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry.value
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """Store `value` if it fits the budget and wins admission; False if rejected."""
+        nbytes = int(self.sizeof(value))
+        if nbytes > self.max_entry_bytes:
+            self._event("oversize")
+            return False
+
+        now = time.monotonic()
+        if key in self._entries:
+            self._drop(key)
+        if self.nbytes + nbytes > self.max_bytes:
+            self._purge_expired(now)
+
+        # LRU victims needed to make room; admit only if hotter than all of them
+        victims: List[Hashable] = []
+        freed = 0
+        for victim, entry in self._entries.items():
+            if self.nbytes - freed + nbytes <= self.max_bytes:
+                break
+            victims.append(victim)
+            freed += entry.nbytes
+        if victims:
+            candidate = self._freq.get(key, 0)
+            if any(self._freq.get(v, 0) >= candidate for v in victims):
+                self._event("rejected")
+                return False
+            for victim in victims:
+                self._drop(victim)
+            self._event("evicted", len(victims))
+
+        self._entries[key] = _Entry(value, nbytes, now + self.ttl)
+        self.nbytes += nbytes
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+    def cached(self, key_builder: Callable[..., Hashable]) -> Callable:
+        """
+        Decorator for an async function (key_builder(func, *args, **kwargs) like
+        aiocache's). Concurrent misses for the same key await one build.
+        """
+
+        def decorate(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                key = key_builder(fn, *args, **kwargs)
+                found, value = self.get(key)
+                if found:
+                    return value
+
+                pending = self._inflight.get(key)
+                if pending is not None:
+                    return await asyncio.shield(pending)
+
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                try:
+                    value = await fn(*args, **kwargs)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+                    future.exception()  # waiters re-raise it; don't log "never retrieved"
+                    raise
+                finally:
+                    self._inflight.pop(key, None)
+                self.put(key, value)
+                future.set_result(value)
+                return value
+
+            return wrapper
+
+        return decorate
@@ -0,0 +1,562 @@
+# ------------------------------------------------------------
+# Data sources: Trino (getData), S3 and PostgreSQL, or offline stand-ins
+#
+# SPOTFIRE_DATA_BACKEND:
+# - live     bigdataloader2.getData, s2cloudapi S3, databases.psql engine (default)
+# - offline  fixture tables + a local directory "bucket" + SQLite, all under
+#            SPOTFIRE_FIXTURES_DIR (no network, runs on a laptop)
+# - record   live, and every getData result is also saved as a fixture so
+#            the same run can be replayed offline
+#
+# Shared by spotfire.py and the API router: no sibling imports here.
+# ------------------------------------------------------------
+
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DATA_BACKENDS = ("live", "offline", "record")
+DATA_BACKEND = os.environ.get("SPOTFIRE_DATA_BACKEND", "live")
+FIXTURES_DIR = os.environ.get(
+    "SPOTFIRE_FIXTURES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+)
+
+# Text format of the time filters the pipelines pass to getData (cutoff_str)
+GETDATA_TIME_FORMAT = "%d-%b-%y %I.%M.%S.%f %p"
+
+# Offline SQLite database (stands in for the PostgreSQL schema)
+OFFLINE_DB_FILE = "spotfire.sqlite3"
+OFFLINE_SCHEMA = "main"
+
+# Trino SQL endpoint for aggregation pushdown. getData has no GROUP BY and keeps
+# its connection + credentials inside bigdataloader2, so pushdown is a separate
+# DB-API connection with its own credentials; without SPOTFIRE_TRINO_HOST the
+# live backend has no pushdown (callers check tables.can_aggregate())
+TRINO_HOST = os.environ.get("SPOTFIRE_TRINO_HOST", "")
+TRINO_PORT = int(os.environ.get("SPOTFIRE_TRINO_PORT", "443"))
+TRINO_USER = os.environ.get("SPOTFIRE_TRINO_USER", os.environ.get("USER", "spotfire"))
+TRINO_PASSWORD = os.environ.get("SPOTFIRE_TRINO_PASSWORD", "")  # basic auth over https when set
+TRINO_CATALOG = os.environ.get("SPOTFIRE_TRINO_CATALOG", "")
+TRINO_SCHEMA = os.environ.get("SPOTFIRE_TRINO_SCHEMA", "")
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def trino_available() -> bool:
+    return bool(TRINO_HOST) and importlib.util.find_spec("trino") is not None
+
+
+# ------------------------------------------------------------
+# Aggregation pushdown (GROUP BY in the engine, only the groups come back)
+# ------------------------------------------------------------
+
+AGG_FUNCTIONS = ("count", "count_distinct", "sum", "min", "max")
+SQL_DIALECTS = ("sqlite", "trino")
+
+_TIME_OPERATORS = (">=", ">", "<=", "<")
+
+
+@dataclass(frozen=True)
+class Agg:
+    """Output column `name` = fn(column); "count" counts rows and takes no column."""
+
+    name: str
+    fn: str
+    column: Optional[str] = None
+
+
+@dataclass
+class AggregateQuery:
+    """
+    A getData pull reduced in the engine:
+
+        SELECT group_by, day(time col) AS out, aggs FROM data_type
+        WHERE params/operators GROUP BY group_by, days
+
+    - params / operators: getData filters, same meaning as get_data
+    - group_by: plain columns
+    - days: output column -> time column, bucketed to its UTC day (naming the
+      output after the time column keeps the shape of a raw pull)
+    - aggs: Agg outputs; min / max of a time column come back as UTC datetimes
+
+    Time columns are the ones filtered with >=, >, <=, < or bucketed by day.
+    Groups with a missing key are returned, like SQL (pandas groupby drops them).
+    """
+
+    params: Dict[str, Any]
+    group_by: Tuple[str, ...]
+    aggs: Tuple[Agg, ...]
+    operators: Dict[str, str] = field(default_factory=dict)
+    days: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def data_type(self) -> str:
+        return self.params["data_type"]
+
+    def filters(self) -> List[Tuple[str, str, Any]]:
+        """(column, operator, value) per getData filter (operator-only notnull included)."""
+        out = [
+            (key, self.operators.get(key, "="), value)
+            for key, value in self.params.items()
+            if key not in ("data_type", "MLR")
+        ]
+        out += [(key, op, None) for key, op in self.operators.items() if op == "notnull" and key not in self.params]
+        return out
+
+    def time_columns(self) -> List[str]:
+        cols = [key for key, op, value in self.filters() if op in _TIME_OPERATORS and _time_value(value) is not None]
+        return list(dict.fromkeys(cols + list(self.days.values())))
+
+    def columns(self) -> List[str]:
+        """Every source column the query reads."""
+        cols = [key for key, _, _ in self.filters()] + list(self.group_by) + list(self.days.values())
+        cols += [a.column for a in self.aggs if a.column is not None]
+        return list(dict.fromkeys(cols))
+
+    def finish(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Engine result -> typed frame (counts int64, days / time min-max as UTC datetimes)."""
+        time_cols = set(self.time_columns())
+        for out in self.days:
+            df[out] = pd.to_datetime(df[out], utc=True, errors="coerce")
+        for a in self.aggs:
+            if a.fn in ("count", "count_distinct"):
+                df[a.name] = pd.to_numeric(df[a.name]).fillna(0).astype("int64")
+            elif a.fn in ("min", "max") and a.column in time_cols:
+                df[a.name] = _to_time(df[a.name])
+        return df.reset_index(drop=True)
+
+
+def aggregate_key(query: AggregateQuery) -> str:
+    """Stable name of one aggregate query (recorded / replayed like fixture_key)."""
+    request = json.dumps(
+        {
+            "params": query.params,
+            "operators": query.operators,
+            "group_by": list(query.group_by),
+            "days": query.days,
+            "aggs": [[a.name, a.fn, a.column] for a in query.aggs],
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return f"{query.data_type}__agg__{hashlib.sha1(request.encode()).hexdigest()[:12]}"
+
+
+def _time_value(value: Any) -> Optional[str]:
+    """getData time text -> ISO 'YYYY-MM-DD HH:MM:SS.ffffff' (UTC); None if not a time."""
+    ts = _to_time(pd.Series([value])).iloc[0]
+    return None if pd.isna(ts) else ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def aggregate_sql(query: AggregateQuery, table: str, dialect: str = "sqlite") -> Tuple[str, List[Any]]:
+    """
+    (SQL, qmark args) for `query` against `table` (already quoted / qualified).
+
+    Filters keep getData's semantics as FixtureSource applies them: "!" keeps
+    NULLs, "like" is case-sensitive, notnull also drops blanks. Filter values
+    are bound with their own types, as get_data matches them. Trino time
+    columns are assumed to be timestamps; SQLite compares ISO text.
+    """
+    if dialect not in SQL_DIALECTS:
+        raise ValueError(f"Unknown SQL dialect {dialect!r}; expected one of {SQL_DIALECTS}")
+    for a in query.aggs:
+        if a.fn not in AGG_FUNCTIONS:
+            raise ValueError(f"Unsupported aggregate {a.fn!r} for {a.name!r}")
+
+    args: List[Any] = []
+    time_cols = set(query.time_columns())
+
+    def time_expr(col: str) -> str:
+        return f"CAST({_quote(col)} AS TIMESTAMP)" if dialect == "trino" else _quote(col)
+
+    def day_expr(col: str) -> str:
+        return f"CAST({time_expr(col)} AS DATE)" if dialect == "trino" else f"substr({_quote(col)}, 1, 10)"
+
+    def bind(values: Iterable[Any]) -> str:
+        values = list(values)
+        args.extend(values)
+        return ", ".join("?" * len(values))
+
+    where: List[str] = []
+    for col, op, value in query.filters():
+        c = _quote(col)
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        if op == "=":
+            where.append(f"{c} IN ({bind(values)})")
+        elif op == "!":
+            where.append(f"({c} IS NULL OR {c} NOT IN ({bind(values)}))")
+        elif op == "like":
+            where.append("(" + " OR ".join(f"{c} LIKE {bind([v])}" for v in values) + ")")
+        elif op == "notnull":
+            where.append(f"({c} IS NOT NULL AND TRIM({c}) <> '')")
+        elif op in _TIME_OPERATORS:
+            bound = _time_value(value)
+            if bound is None:
+                number = "DOUBLE" if dialect == "trino" else "REAL"
+                where.append(f"CAST({c} AS {number}) {op} {bind([float(value)])}")
+            elif dialect == "trino":
+                where.append(f"{time_expr(col)} {op} CAST({bind([bound])} AS TIMESTAMP)")
+            else:
+                where.append(f"{c} {op} {bind([bound])}")
+        else:
+            raise ValueError(f"Unsupported getData operator {op!r}")
+
+    keys = [_quote(col) for col in query.group_by] + [day_expr(col) for col in query.days.values()]
+    select = [_quote(col) for col in query.group_by]
+    select += [f"{day_expr(col)} AS {_quote(out)}" for out, col in query.days.items()]
+    for a in query.aggs:
+        if a.fn == "count":
+            expr = "COUNT(*)"
+        elif a.fn == "count_distinct":
+            expr = f"COUNT(DISTINCT {_quote(a.column)})"
+        elif a.column in time_cols:
+            expr = f"{a.fn.upper()}({time_expr(a.column)})"
+        else:
+            expr = f"{a.fn.upper()}({_quote(a.column)})"
+        select.append(f"{expr} AS {_quote(a.name)}")
+
+    sql = f"SELECT {', '.join(select)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if keys:
+        sql += " GROUP BY " + ", ".join(keys)
+    return sql, args
+
+
+def sqlite_aggregate(df: pd.DataFrame, query: AggregateQuery) -> pd.DataFrame:
+    """Run `query` over an in-memory SQLite copy of df (the engine stand-in)."""
+    missing = [c for c in query.columns() if c not in df.columns]
+    if missing:
+        raise KeyError(f"{query.data_type!r} has no column(s) {missing}")
+
+    frame = df[query.columns()].copy()
+    for col in query.time_columns():
+        ts = _to_time(frame[col])
+        frame[col] = ts.dt.strftime("%Y-%m-%d %H:%M:%S.%f").where(ts.notna(), None)
+
+    with closing(sqlite3.connect(":memory:")) as con:
+        con.execute("PRAGMA case_sensitive_like = ON")
+        frame.to_sql("source", con, index=False)
+        sql, args = aggregate_sql(query, _quote("source"), "sqlite")
+        return query.finish(pd.read_sql_query(sql, con, params=args))
+
+
+# ------------------------------------------------------------
+# Table sources (getData signature)
+# ------------------------------------------------------------
+
+
+class TrinoSource:
+    """bigdataloader2.getData (Trino), imported on first use."""
+
+    def get_data(
+        self,
+        params: Dict[str, Any],
+        custom_columns: Optional[Iterable[str]] = None,
+        custom_operators: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        from bigdataloader2 import getData
+
+        kwargs: Dict[str, Any] = {"params": params}
+        if custom_columns is not None:
+            kwargs["custom_columns"] = list(custom_columns)
+        if custom_operators is not None:
+            kwargs["custom_operators"] = custom_operators
+        return getData(**kwargs)
+
+    def can_aggregate(self) -> bool:
+        return trino_available()
+
+    def aggregate(self, query: AggregateQuery) -> pd.DataFrame:
+        """GROUP BY on the Trino SQL endpoint (see TRINO_HOST); getData itself cannot aggregate."""
+        if not trino_available():
+            raise RuntimeError(
+                "Aggregation pushdown needs the Trino SQL endpoint (SPOTFIRE_TRINO_HOST and the trino package); "
+                "use get_data for a raw pull"
+            )
+
+        from trino.auth import BasicAuthentication
+        from trino.dbapi import connect
+
+        table = ".".join(_quote(p) for p in (TRINO_CATALOG, TRINO_SCHEMA, query.data_type) if p)
+        sql, args = aggregate_sql(query, table, "trino")
+        conn = connect(
+            host=TRINO_HOST,
+            port=TRINO_PORT,
+            user=TRINO_USER,
+            catalog=TRINO_CATALOG or None,
+            schema=TRINO_SCHEMA or None,
+            http_scheme="https" if TRINO_PORT == 443 else "http",
+            auth=BasicAuthentication(TRINO_USER, TRINO_PASSWORD) if TRINO_PASSWORD else None,
+        )
+        with closing(conn):
+            cur = conn.cursor()
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+            columns = [d[0] for d in cur.description]
+        return query.finish(pd.DataFrame(rows, columns=columns))
+
+
+def fixture_key(params: Dict[str, Any], custom_columns=None, custom_operators=None) -> str:
+    """Stable name of one getData call: {data_type}__{hash of the full request}."""
+    request = json.dumps(
+        {"params": params, "columns": list(custom_columns or []), "operators": custom_operators or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return f"{params.get('data_type', 'unknown')}__{hashlib.sha1(request.encode()).hexdigest()[:12]}"
+
+
+def _read_fixture(path_no_ext: str) -> Optional[pd.DataFrame]:
+    if os.path.exists(path_no_ext + ".parquet"):
+        return pd.read_parquet(path_no_ext + ".parquet")
+    if os.path.exists(path_no_ext + ".csv"):
+        return pd.read_csv(path_no_ext + ".csv", dtype=str, keep_default_na=False, na_values=[""])
+    return None
+
+
+def write_fixture(df: pd.DataFrame, path_no_ext: str) -> str:
+    """Parquet when pyarrow is installed, else CSV. Returns the written path."""
+    os.makedirs(os.path.dirname(path_no_ext) or ".", exist_ok=True)
+    if parquet_available():
+        df.to_parquet(path_no_ext + ".parquet", index=False)
+        return path_no_ext + ".parquet"
+    df.to_csv(path_no_ext + ".csv", index=False)
+    return path_no_ext + ".csv"
+
+
+def _to_time(values: pd.Series) -> pd.Series:
+    """getData time text (GETDATA_TIME_FORMAT) or any ISO-ish timestamp -> UTC datetimes."""
+    s = pd.Series(values, dtype="object")
+    out = pd.to_datetime(s, format=GETDATA_TIME_FORMAT, errors="coerce", utc=True)
+    rest = out.isna() & s.notna()
+    if rest.any():
+        out[rest] = pd.to_datetime(s[rest], errors="coerce", utc=True, format="mixed")
+    return out
+
+
+def _like_regex(pattern: str) -> str:
+    """SQL LIKE pattern -> anchored regex (% = any run, _ = one char)."""
+    return "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+
+
+def _condition(col: pd.Series, op: str, value: Any) -> pd.Series:
+    """One getData filter (params[key] with custom_operators[key], default '=') as a row mask."""
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    text = col.astype("object").where(col.notna(), None)
+
+    if op == "=":
+        return text.isin([str(v) for v in values]) | col.isin(values)
+    if op == "!":
+        return ~(text.isin([str(v) for v in values]) | col.isin(values))
+    if op == "like":
+        regex = "|".join(f"(?:{_like_regex(str(v))})" for v in values)
+        return text.astype(str).str.fullmatch(regex, flags=re.S) & text.notna()
+    if op == "notnull":
+        return text.notna() & text.astype(str).str.strip().ne("")
+    if op in (">=", ">", "<=", "<"):
+        left, right = _to_time(col), _to_time(pd.Series([value])).iloc[0]
+        if pd.isna(right):
+            left, right = pd.to_numeric(col, errors="coerce"), float(value)
+        return {">=": left >= right, ">": left > right, "<=": left <= right, "<": left < right}[op].fillna(False)
+    raise ValueError(f"Unsupported getData operator {op!r}")
+
+
+class FixtureSource:
+    """
+    getData over local fixtures in `root`:
+
+    1) an exact recording of the same request ({fixture_key}.parquet/.csv), else
+    2) the whole table ({data_type}.parquet/.csv) filtered here with getData's
+       operators (=, !, like, notnull, >=, >, <=, <); list values mean IN / NOT IN
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._tables: Dict[str, pd.DataFrame] = {}
+
+    def _table(self, data_type: str) -> pd.DataFrame:
+        if data_type not in self._tables:
+            df = _read_fixture(os.path.join(self.root, data_type))
+            if df is None:
+                raise FileNotFoundError(f"No fixture for {data_type!r} in {self.root} (.parquet or .csv)")
+            self._tables[data_type] = df
+        return self._tables[data_type]
+
+    def get_data(
+        self,
+        params: Dict[str, Any],
+        custom_columns: Optional[Iterable[str]] = None,
+        custom_operators: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        recorded = _read_fixture(os.path.join(self.root, fixture_key(params, custom_columns, custom_operators)))
+        if recorded is not None:
+            return recorded
+
+        df = self._table(params["data_type"])
+        operators = custom_operators or {}
+        mask = np.ones(len(df), dtype=bool)
+        for key, value in params.items():
+            if key in ("data_type", "MLR"):
+                continue
+            if key not in df.columns:
+                raise KeyError(f"Fixture {params['data_type']!r} has no column {key!r}")
+            mask &= _condition(df[key], operators.get(key, "="), value).to_numpy()
+        for key, op in operators.items():
+            if op == "notnull" and key not in params:
+                mask &= _condition(df[key], op, None).to_numpy()
+
+        out = df.loc[mask]
+        if custom_columns is not None:
+            out = out.reindex(columns=list(custom_columns))
+        return out.reset_index(drop=True)
+
+    def can_aggregate(self) -> bool:
+        return True
+
+    def aggregate(self, query: AggregateQuery) -> pd.DataFrame:
+        """A recorded result (aggregate_key) if any, else the SQL over the fixture table in SQLite."""
+        recorded = _read_fixture(os.path.join(self.root, aggregate_key(query)))
+        if recorded is not None:
+            return query.finish(recorded)
+        return sqlite_aggregate(self._table(query.data_type), query)
+
+
+class RecordingSource:
+    """Live getData that also saves each result under its fixture_key (replayed by FixtureSource)."""
+
+    def __init__(self, live: TrinoSource, root: str):
+        self.live = live
+        self.root = root
+
+    def get_data(self, params, custom_columns=None, custom_operators=None) -> pd.DataFrame:
+        df = self.live.get_data(params, custom_columns, custom_operators)
+        write_fixture(df, os.path.join(self.root, fixture_key(params, custom_columns, custom_operators)))
+        return df
+
+    def can_aggregate(self) -> bool:
+        return self.live.can_aggregate()
+
+    def aggregate(self, query: AggregateQuery) -> pd.DataFrame:
+        df = self.live.aggregate(query)
+        write_fixture(df, os.path.join(self.root, aggregate_key(query)))
+        return df
+
+
+# ------------------------------------------------------------
+# Object stores (CSV exports)
+# ------------------------------------------------------------
+
+
+class S3Store:
+    """s2cloudapi.s3api, imported on first use."""
+
+    def _api(self):
+        import s2cloudapi.s3api as s3
+
+        return s3
+
+    def exists(self, bucket: str, key: str) -> bool:
+        return bool(self._api().chk_file_exist(bucket, key))
+
+    def delete(self, bucket: str, key: str) -> None:
+        self._api().delete_file(bucket=bucket, key=key)
+
+    def upload_csv(self, bucket: str, key: str, df: pd.DataFrame) -> str:
+        path = f"s3://{bucket}/{key}"
+        self._api().upload_df_as_csv(bucket=bucket, dataframe=df, s3_path=path)
+        return path
+
+
+class LocalStore:
+    """Directory stand-in for S3: {root}/{bucket}/{key}."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def exists(self, bucket: str, key: str) -> bool:
+        return os.path.exists(self._path(bucket, key))
+
+    def delete(self, bucket: str, key: str) -> None:
+        os.remove(self._path(bucket, key))
+
+    def upload_csv(self, bucket: str, key: str, df: pd.DataFrame) -> str:
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_csv(path, index=False)
+        return path
+
+
+# ------------------------------------------------------------
+# Bundle
+# ------------------------------------------------------------
+
+
+@dataclass
+class DataSources:
+    """
+    - tables: get_data(params, custom_columns, custom_operators), and
+      aggregate(AggregateQuery) where can_aggregate() (Trino SQL endpoint or fixtures)
+    - store:  exists / delete / upload_csv (S3 or a local directory)
+    - engine + schema: SQLAlchemy engine for pg_loader and the API reads
+      (PostgreSQL, or SQLite with schema "main")
+    """
+
+    backend: str
+    tables: Any
+    store: Any
+    engine: Any
+    schema: str
+
+
+_SOURCES: Dict[str, DataSources] = {}
+
+
+def _offline_engine(root: str):
+    from sqlalchemy import create_engine
+
+    os.makedirs(root, exist_ok=True)
+    return create_engine(f"sqlite:///{os.path.join(root, OFFLINE_DB_FILE)}")
+
+
+def get_datasources(backend: Optional[str] = None, fixtures_dir: Optional[str] = None) -> DataSources:
+    """Process-wide sources for `backend` (default: SPOTFIRE_DATA_BACKEND)."""
+    backend = backend or DATA_BACKEND
+    if backend not in DATA_BACKENDS:
+        raise ValueError(f"Unknown data backend {backend!r}; expected one of {DATA_BACKENDS}")
+
+    root = fixtures_dir or FIXTURES_DIR
+    cache_key = f"{backend}:{root}"
+    if cache_key in _SOURCES:
+        return _SOURCES[cache_key]
+
+    if backend == "offline":
+        sources = DataSources(
+            backend, FixtureSource(root), LocalStore(os.path.join(root, "s3")), _offline_engine(root), OFFLINE_SCHEMA
+        )
+    else:
+        from databases.psql import engine, schema
+
+        tables = TrinoSource() if backend == "live" else RecordingSource(TrinoSource(), root)
+        sources = DataSources(backend, tables, S3Store(), engine, schema)
+
+    _SOURCES[cache_key] = sources
+    return sources
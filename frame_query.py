@@ -0,0 +1,151 @@
+# ------------------------------------------------------------
+# Server-side paging / sorting / filtering over cached frames
+# ------------------------------------------------------------
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .identity import normalize_str
+
+# Separator between columns in the precomputed search text (never typed by users)
+_SEARCH_SEP = "\x1f"
+
+
+@dataclass
+class SortedFrame:
+    """
+    A cached frame plus everything a page request needs, computed once per build:
+
+    - df: rows in their natural (unsorted) order
+    - orders: (sort key, descending) -> row positions, missing values last
+    - search_text: lowercased text of the searchable columns per row
+    - columns: public sort/filter key -> df column
+    """
+
+    df: pd.DataFrame
+    orders: Dict[Tuple[str, bool], np.ndarray] = field(default_factory=dict)
+    search_text: Optional[pd.Series] = None
+    columns: Dict[str, str] = field(default_factory=dict)
+
+
+def _sort_codes(s: pd.Series) -> np.ndarray:
+    """
+    Dense rank per row (-1 = missing): numbers/datetimes rank natively, text
+    case-insensitively. Ranking the uniques once keeps the row sorts integer-only.
+    """
+    if not (pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s)):
+        s = normalize_str(s, lower=True)
+    codes, _ = pd.factorize(s, sort=True, use_na_sentinel=True)
+    return codes
+
+
+def _stable_order(codes: np.ndarray, descending: bool) -> np.ndarray:
+    """Stable argsort of rank codes (ties keep row order), missing values last either way."""
+    key = -codes if descending else codes.copy()
+    key[codes < 0] = np.iinfo(key.dtype).max
+    return np.argsort(key, kind="stable")
+
+
+def presort(
+    df: pd.DataFrame,
+    columns: Dict[str, str],
+    search_columns: Sequence[str] = (),
+    default_order: Optional[np.ndarray] = None,
+) -> SortedFrame:
+    """
+    Pre-sort `df` on every public key in `columns` (both directions) and build
+    the search text. `default_order` (row positions) is what a request without
+    `sort` gets; natural row order if omitted.
+    """
+    df = df.reset_index(drop=True)
+    orders: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    for key, col in columns.items():
+        if col not in df.columns:
+            continue
+        codes = _sort_codes(df[col])
+        orders[(key, False)] = _stable_order(codes, descending=False)
+        orders[(key, True)] = _stable_order(codes, descending=True)
+
+    orders[("", False)] = np.arange(len(df)) if default_order is None else np.asarray(default_order)
+
+    search_text = None
+    cols = [c for c in search_columns if c in df.columns]
+    if cols:
+        parts = [normalize_str(df[c].astype("object"), lower=True).fillna("") for c in cols]
+        search_text = parts[0].str.cat(parts[1:], sep=_SEARCH_SEP) if len(parts) > 1 else parts[0]
+
+    return SortedFrame(df=df, orders=orders, search_text=search_text, columns=dict(columns))
+
+
+def parse_filters(filters: Sequence[str], sf: SortedFrame) -> List[Tuple[str, str]]:
+    """
+    Parse `key:value` filter params into (df column, lowercased value).
+    Raises ValueError for malformed params or unknown keys.
+    """
+    out: List[Tuple[str, str]] = []
+    for raw in filters:
+        key, sep, value = raw.partition(":")
+        key = key.strip()
+        if not sep or not key:
+            raise ValueError(f"Bad filter {raw!r}; expected key:value")
+        if key not in sf.columns:
+            raise ValueError(f"Unknown filter key {key!r}; expected one of {sorted(sf.columns)}")
+        out.append((sf.columns[key], value.strip().lower()))
+    return out
+
+
+def query_positions(
+    sf: SortedFrame,
+    rows: Optional[np.ndarray] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    filters: Sequence[str] = (),
+    search: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Tuple[np.ndarray, int]:
+    """
+    Row positions (into sf.df) of one page, and the total matching rows before paging.
+
+    - rows: optional boolean mask over sf.df restricting the candidate rows
+    - sort: a public key from sf.columns (None -> default order)
+    - filters: `key:value` exact matches (case-insensitive), ANDed
+    - search: case-insensitive substring over the search columns
+
+    Sorting never happens per request: the pre-sorted positions are masked,
+    then sliced.
+    """
+    key = sort or ""
+    if key and key not in sf.columns:
+        raise ValueError(f"Unknown sort key {sort!r}; expected one of {sorted(sf.columns)}")
+    if (key, descending) not in sf.orders:
+        key, descending = "", False  # known key, but the column isn't in this build (e.g. empty frame)
+
+    mask = np.ones(len(sf.df), dtype=bool) if rows is None else rows.copy()
+    # Filters/search only look at rows still in the running
+    for col, value in parse_filters(filters, sf):
+        if col not in sf.df.columns:
+            mask[:] = False
+            break
+        cand = np.flatnonzero(mask)
+        mask[cand] = normalize_str(sf.df[col].iloc[cand].astype("object"), lower=True).eq(value).to_numpy()
+    needle = (search or "").strip().lower()
+    if needle and sf.search_text is not None:
+        cand = np.flatnonzero(mask)
+        mask[cand] = sf.search_text.iloc[cand].str.contains(needle, regex=False).to_numpy()
+
+    order = sf.orders[(key, descending)]
+    positions = order[mask[order]]
+
+    end = None if limit is None else offset + limit
+    return positions[offset:end], len(positions)
+
+
+def query_frame(sf: SortedFrame, **query) -> Tuple[pd.DataFrame, int]:
+    """One page of `sf` as rows: (page rows, total matching rows before paging)."""
+    positions, total = query_positions(sf, **query)
+    return sf.df.iloc[positions], total
@@ -0,0 +1,125 @@
+# ------------------------------------------------------------
+# Streaming responses (NDJSON / CSV / Arrow IPC) for large row sets
+# ------------------------------------------------------------
+
+import importlib.util
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import StreamingResponse
+
+# format= values; "json" is the regular (non-streamed) list response
+RESPONSE_FORMATS = ("json", "ndjson", "csv", "arrow")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Rows converted + serialized per chunk (bounds per-request memory)
+STREAM_CHUNK_ROWS = 1000
+
+RecordsFn = Callable[[pd.DataFrame], List[Dict[str, Any]]]
+
+
+def arrow_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _json_default(v: Any) -> Any:
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    if isinstance(v, np.generic):
+        return v.item()
+    return str(v)
+
+
+def _chunks(df: pd.DataFrame, positions: np.ndarray, to_records: RecordsFn) -> Iterator[List[Dict[str, Any]]]:
+    """Records for `positions`, STREAM_CHUNK_ROWS at a time (rows are taken lazily per chunk)."""
+    for start in range(0, len(positions), STREAM_CHUNK_ROWS):
+        yield to_records(df.iloc[positions[start : start + STREAM_CHUNK_ROWS]])
+
+
+def _ndjson(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for records in chunks:
+        yield "".join(json.dumps(r, default=_json_default) + "\n" for r in records).encode()
+
+
+def _csv(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    header = True
+    for records in chunks:
+        if not records:
+            continue
+        yield pd.DataFrame.from_records(records).to_csv(index=False, header=header).encode()
+        header = False
+
+
+def _arrow_schema(df: pd.DataFrame, to_records: RecordsFn):
+    """
+    Arrow schema for the records of the whole frame, fixed before the first
+    byte is sent (a type change mid-stream cannot be reported any more):
+
+    - probe rows: the first row plus, per column, its first null and first
+      non-null row, so nullable ints widen and late-filled columns get a type
+    - columns that are null in every row become strings
+    """
+    import pyarrow as pa
+
+    if df.empty:
+        return pa.schema([])
+    notna = df.notna().to_numpy()
+    probe = np.unique(np.concatenate([[0], notna.argmax(axis=0), (~notna).argmax(axis=0)]))
+    inferred = pa.Schema.from_pandas(pd.DataFrame.from_records(to_records(df.iloc[probe])), preserve_index=False)
+    return pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in inferred])
+
+
+def _arrow(chunks: Iterator[List[Dict[str, Any]]], schema) -> Iterator[bytes]:
+    """Arrow IPC stream: `schema` first, then one record batch per chunk."""
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain() -> bytes:
+        out = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return out
+
+    for records in chunks:
+        frame = pd.DataFrame.from_records(records, columns=schema.names)
+        writer.write_batch(pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False))
+        yield drain()
+
+    writer.close()
+    yield drain()
+
+
+def stream_rows(
+    df: pd.DataFrame,
+    positions: np.ndarray,
+    fmt: str,
+    to_records: RecordsFn,
+    headers: Optional[Dict[str, str]] = None,
+    filename: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Stream df rows at `positions` as `fmt` ("ndjson", "csv" or "arrow"),
+    converting with `to_records` one chunk at a time. The first bytes go out
+    after one chunk regardless of the result size.
+    """
+    writers = {"ndjson": _ndjson, "csv": _csv}
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown stream format {fmt!r}; expected one of {sorted(MEDIA_TYPES)}")
+
+    headers = dict(headers or {})
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+
+    chunks = _chunks(df, positions, to_records)
+    body = _arrow(chunks, _arrow_schema(df, to_records)) if fmt == "arrow" else writers[fmt](chunks)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
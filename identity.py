@@ -0,0 +1,611 @@
+# ------------------------------------------------------------
+# Vectorized identity-key normalization (emails / usernames)
+# ------------------------------------------------------------
+
+import multiprocessing as mp
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SAMSUNG_DOMAIN = "samsung.com"
+PARTNER_MARKER = "@partner.samsung"
+
+# String forms that mean "missing" once a column has been through astype(str)
+_NULL_STRINGS = {"", "nan", "none", "null", "<na>"}
+
+
+def _take(uniques: pd.Series, codes: np.ndarray) -> np.ndarray:
+    """Broadcast per-unique results back to rows (code -1 -> None)."""
+    values = uniques.to_numpy(dtype=object)
+    values = np.where(pd.isna(values), None, values)
+    return np.append(values, None)[codes]
+
+
+def normalize_str(series: pd.Series, lower: bool = False) -> pd.Series:
+    """
+    Strip (and optionally lowercase) a string-ish column in one pass.
+
+    Missing values, blanks and stringified nulls ("nan", "None", ...) all come
+    back as None, so normalized keys never match each other by accident.
+    Work is done once per unique value and broadcast back with take().
+    """
+    if series is None:
+        return series
+
+    codes, u = _factorize_normalized(series, lower)
+    if len(u) == 0:
+        return pd.Series([None] * len(series), index=series.index, dtype="object")
+
+    return pd.Series(_take(u, codes), index=series.index, dtype="object")
+
+
+def _factorize_normalized(series: pd.Series, lower: bool = False) -> Tuple[np.ndarray, pd.Series]:
+    """normalize_str() before the broadcast: (row codes, normalized value per code)."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    u = pd.Series(uniques, dtype="object").astype(str).str.strip()
+    if lower:
+        u = u.str.lower()
+    return codes, u.where(~u.str.lower().isin(_NULL_STRINGS), None)
+
+
+def canonicalize_emails(series: pd.Series) -> pd.DataFrame:
+    """
+    Canonicalize an email column in a single pass over its unique values.
+
+    Returns a frame (same index) with:
+    - email: stripped + lowercased, None when missing/blank
+    - alt:   partner address rewritten to @samsung.com
+             (someone@partner.samsung.com -> someone@samsung.com), else email
+    - local: text before '@' (the whole value if there is no '@')
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+
+    u = normalize_str(pd.Series(uniques, dtype="object"), lower=True)
+    has_at = u.str.contains("@", regex=False, na=False)
+    local = u.where(~has_at, u.str.split("@", n=1).str[0])
+    is_partner = u.str.contains(PARTNER_MARKER, regex=False, na=False)
+    alt = u.where(~is_partner, local + "@" + SAMSUNG_DOMAIN)
+
+    return pd.DataFrame(
+        {"email": _take(u, codes), "alt": _take(alt, codes), "local": _take(local, codes)},
+        index=series.index,
+    )
+
+
+# ------------------------------------------------------------
+# Usernames (DOMAIN\\account)
+# ------------------------------------------------------------
+
+# Service accounts excluded from every usage pull: pushed to getData as
+# user_name "!" filters and matched locally with system_account_mask()
+SYSTEM_ACCOUNTS = (
+    r"SPOTFIRESYSTEM\automationservices",
+    r"SPOTFIRESYSTEM\monitoring",
+    r"SPOTFIRESYSTEM\scheduledupdates",
+    r"SPOTFIREOAUTH2\a72082b286310fe3c8d48129c26b295f.oauth-clients.spotfire.tibco.com",
+)
+_SYSTEM_KEYS = frozenset(a.lower() for a in SYSTEM_ACCOUNTS)
+
+
+def _categorical(values: pd.Series, codes: np.ndarray, index: pd.Index) -> pd.Series:
+    """Per-unique results broadcast to rows as a categorical (code -1 / None -> NaN)."""
+    cat_codes, categories = pd.factorize(values, use_na_sentinel=True)
+    return pd.Series(
+        pd.Categorical.from_codes(np.append(cat_codes, -1)[codes], categories=categories), index=index
+    )
+
+
+def split_usernames(series: pd.Series) -> pd.DataFrame:
+    """
+    Split Spotfire usernames into domain + account in one pass over unique values.
+
+    Returns a frame (same index) of categoricals:
+    - user_domain:  text before the last backslash, uppercased; NaN without one
+    - user_account: text after it (the whole name without one), stripped +
+                    lowercased; the HR nt_id / bname key
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+
+    u = normalize_str(pd.Series(uniques, dtype="object"))
+    parts = u.str.rpartition("\\")
+    has_domain = parts[1].eq("\\")
+    domain = normalize_str(parts[0].where(has_domain)).str.upper()
+    account = normalize_str(parts[2], lower=True)
+
+    return pd.DataFrame(
+        {
+            "user_domain": _categorical(domain, codes, series.index),
+            "user_account": _categorical(account, codes, series.index),
+        },
+        index=series.index,
+    )
+
+
+def add_username_keys(df: pd.DataFrame, col: str = "user_name") -> pd.DataFrame:
+    """df with user_domain / user_account parsed from df[col] (in place, returned)."""
+    keys = split_usernames(df[col])
+    df["user_domain"] = keys["user_domain"]
+    df["user_account"] = keys["user_account"]
+    return df
+
+
+def account_keys(keys: pd.Series) -> pd.Series:
+    """
+    user_account values as a plain object column (None when missing), for merges
+    and lookups against HR nt_id / bname. Accepts raw usernames too (parsed here).
+    """
+    if not isinstance(keys.dtype, pd.CategoricalDtype):
+        keys = split_usernames(keys)["user_account"]
+    return keys.astype("object").where(keys.notna(), None)
+
+
+def system_account_mask(series: pd.Series) -> np.ndarray:
+    """True where the username is one of SYSTEM_ACCOUNTS (case-insensitive)."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    hit = normalize_str(pd.Series(uniques, dtype="object"), lower=True).isin(_SYSTEM_KEYS).to_numpy()
+    return np.append(hit, False)[codes]
+
+
+# ------------------------------------------------------------
+# License-user dedupe engine
+# ------------------------------------------------------------
+
+# Identity strategies for dedupe_accounts():
+# - email:     exact normalized USER_EMAIL
+# - localpart: text before '@' (john.doe@samsung.com + john.doe@partner.samsung.com group together)
+# - samsung:   canonical samsung address (partner addresses rewritten to @samsung.com)
+DEDUPE_STRATEGIES = ("email", "localpart", "samsung")
+
+# Bit layout of the winner rank key (higher wins):
+#   [analyst flag:1][LAST_ACTIVITY epoch seconds:32][ANALYST_ACTIONS_PER_DAY * 1e4:27]
+_ACTIVITY_BITS = 32
+_ACTIONS_BITS = 27
+_ACTIONS_SCALE = 10_000  # ANALYST_ACTIONS_PER_DAY is rounded to 4 decimals upstream
+
+
+def winner_rank(df: pd.DataFrame) -> np.ndarray:
+    """
+    Pack the dedupe preference order into one int64 per row:
+    recommendedAction == "Analyst" -> most recent LAST_ACTIVITY -> highest
+    ANALYST_ACTIONS_PER_DAY. Missing activity/actions rank lowest.
+    """
+    n = len(df)
+
+    if "recommendedAction" in df.columns:
+        is_analyst = normalize_str(df["recommendedAction"], lower=True).eq("analyst").to_numpy()
+    else:
+        is_analyst = np.zeros(n, dtype=bool)
+
+    if "LAST_ACTIVITY" in df.columns:
+        ts = pd.to_datetime(df["LAST_ACTIVITY"], errors="coerce", utc=True)
+        ns = ts.dt.tz_convert(None).to_numpy(dtype="datetime64[ns]").astype(np.int64)  # NaT -> int64 min
+        secs = ns // 10**9
+    else:
+        secs = np.zeros(n, dtype=np.int64)
+    secs = np.clip(secs, 0, (1 << _ACTIVITY_BITS) - 1).astype(np.int64)
+
+    if "ANALYST_ACTIONS_PER_DAY" in df.columns:
+        apd = pd.to_numeric(df["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    else:
+        apd = np.zeros(n, dtype=float)
+    apd_q = np.clip(np.round(apd * _ACTIONS_SCALE), 0, (1 << _ACTIONS_BITS) - 1).astype(np.int64)
+
+    return (
+        (is_analyst.astype(np.int64) << (_ACTIVITY_BITS + _ACTIONS_BITS))
+        | (secs << _ACTIONS_BITS)
+        | apd_q
+    )
+
+
+def _strategy_key(emails: pd.Series, strategy: str) -> pd.Series:
+    """Identity key per normalized address (None stays missing); emails are unique values."""
+    if strategy == "email":
+        return emails
+    local = emails.str.split("@", n=1).str[0]  # no '@' -> the whole value
+    if strategy == "localpart":
+        return local
+    is_partner = emails.str.contains(PARTNER_MARKER, regex=False, na=False)
+    return emails.where(~is_partner, local + "@" + SAMSUNG_DOMAIN)
+
+
+def dedupe_key(emails: pd.Series, strategy: str = "email") -> pd.Series:
+    """Identity key dedupe_accounts() groups on for an email column (None = not deduped)."""
+    if strategy not in DEDUPE_STRATEGIES:
+        raise ValueError(f"Unknown dedupe strategy {strategy!r}; expected one of {DEDUPE_STRATEGIES}")
+    codes, u = _factorize_normalized(emails, lower=True)
+    return pd.Series(_take(_strategy_key(u, strategy), codes), index=emails.index, dtype="object")
+
+
+def dedupe_accounts(df_in: pd.DataFrame, strategy: str = "email") -> pd.DataFrame:
+    """
+    De-dupe Spotfire accounts that represent the same person.
+
+    Identity grouping is chosen by `strategy` (see DEDUPE_STRATEGIES). Rows
+    without an identity key (missing/blank USER_EMAIL) are kept as-is.
+
+    Winner per identity:
+    - an "Analyst" row if the group has one
+    - else the most recent LAST_ACTIVITY
+    - then highest ANALYST_ACTIONS_PER_DAY, then USER_NAME ascending
+
+    The email column is factorized once; normalization and the strategy key
+    are computed per unique address. The winner is one packed rank key
+    (winner_rank) and a hash groupby max over it. Only rows that tie on the
+    full rank key are sorted by USER_NAME - never the whole frame.
+
+    USER_EMAIL of the kept rows is the normalized email for "email", and the
+    canonical @samsung.com address for "localpart" / "samsung".
+    """
+    if df_in is None or df_in.empty or "USER_EMAIL" not in df_in.columns:
+        return df_in
+
+    df = df_in.reset_index(drop=True)
+
+    if strategy not in DEDUPE_STRATEGIES:
+        raise ValueError(f"Unknown dedupe strategy {strategy!r}; expected one of {DEDUPE_STRATEGIES}")
+    email_codes, emails = _factorize_normalized(df["USER_EMAIL"], lower=True)
+    df["USER_EMAIL"] = pd.Series(_take(emails, email_codes), index=df.index, dtype="object")
+
+    # identity code per row (-1 = no key), via the unique addresses
+    key_codes, key_values = pd.factorize(_strategy_key(emails, strategy), use_na_sentinel=True)
+    row_codes = np.append(key_codes, -1)[email_codes]
+
+    has_key = row_codes >= 0
+    if not has_key.any():
+        return df
+
+    if "ANALYST_ACTIONS_PER_DAY" in df.columns:
+        df["ANALYST_ACTIONS_PER_DAY"] = pd.to_numeric(df["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0)
+    if "USER_NAME" not in df.columns:
+        df["USER_NAME"] = None
+
+    keyed = np.flatnonzero(has_key)
+    codes = row_codes[keyed]
+    rank = pd.Series(winner_rank(df.iloc[keyed]))
+
+    # argmax per identity over the packed rank key
+    best = rank.eq(rank.groupby(codes).transform("max")).to_numpy().copy()
+
+    # exact rank ties (rare): USER_NAME ascending, missing names last - only the tied rows are sorted
+    tied = best & (pd.Series(best).groupby(codes).transform("sum").to_numpy() > 1)
+    if tied.any():
+        t = pd.DataFrame(
+            {
+                "code": codes[tied],
+                "name": df["USER_NAME"].iloc[keyed[tied]].to_numpy(),
+                "pos": np.flatnonzero(tied),
+            }
+        ).sort_values(["code", "name"], na_position="last", kind="stable")
+        best[t["pos"].to_numpy()[t["code"].duplicated().to_numpy()]] = False
+
+    out = pd.concat([df.iloc[keyed[best]], df.loc[~has_key]])
+
+    if strategy != "email":
+        kept_keys = np.asarray(key_values, dtype=object)[codes[best]]
+        if strategy == "localpart":
+            kept_keys = kept_keys + "@" + SAMSUNG_DOMAIN
+        out.loc[out.index[: best.sum()], "USER_EMAIL"] = kept_keys
+
+    return out.reset_index(drop=True)
+
+
+# ------------------------------------------------------------
+# Employee enrichment (HR lookups by email, then username keys)
+# ------------------------------------------------------------
+
+
+# Lookup value columns (HR table names) -> enrichment output columns
+_LOOKUP_OUTPUTS = {
+    "full_name": "FULL_NAME",
+    "status_name": "STATUS_NAME",
+    "cost_center_name": "cost_center_name",
+    "dept_name": "dept_name",
+    "title": "title",
+}
+
+
+def _key_lookup(table: pd.DataFrame, key: str) -> Optional[pd.DataFrame]:
+    """
+    `table` keyed by normalized `key` (first row per key) with the lookup value
+    columns; None if the table lacks any of them.
+    """
+    needed = [key, *_LOOKUP_OUTPUTS]
+    if not set(needed).issubset(table.columns):
+        return None
+    lk = table[needed].copy()
+    lk[key] = normalize_str(lk[key], lower=True)
+    return lk.dropna(subset=[key]).drop_duplicates(subset=[key], keep="first").set_index(key)
+
+
+@dataclass
+class EmployeeIndex:
+    """
+    HR tables prepared once for any number of enrich_with_employee_data calls:
+
+    - primary: pageradm_employee_ghr with normalized keys + values (email merge)
+    - lookups: fallback pass -> keyed table (fallback_smtp, smtp, bname, nt_id, gad_id)
+    """
+
+    primary: pd.DataFrame
+    lookups: Dict[str, Optional[pd.DataFrame]]
+
+
+def build_employee_index(primary_emp: pd.DataFrame, fallback_emp: pd.DataFrame) -> EmployeeIndex:
+    user_data = primary_emp.copy()
+
+    # Normalize lookup keys (safe even if already normalized)
+    for col in ["smtp", "bname", "nt_id", "gad_id"]:
+        if col in user_data.columns:
+            user_data[col] = normalize_str(user_data[col], lower=True)
+
+    # Normalize values
+    for col in _LOOKUP_OUTPUTS:
+        if col in user_data.columns:
+            user_data[col] = normalize_str(user_data[col])
+
+    lookups = {"fallback_smtp": _key_lookup(fallback_emp, "smtp") if "smtp" in fallback_emp.columns else None}
+    for key in ["smtp", "bname", "nt_id", "gad_id"]:
+        lookups[key] = _key_lookup(user_data, key) if key in user_data.columns else None
+    return EmployeeIndex(primary=user_data, lookups=lookups)
+
+
+def _fill_missing_from_key(
+    merged: pd.DataFrame,
+    missing_mask: pd.Series,
+    lookup: Optional[pd.DataFrame],
+    left_key_series: pd.Series,
+) -> pd.DataFrame:
+    """
+    Fill FULL_NAME + STATUS_NAME + org fields (cost_center_name, dept_name, title)
+    for rows where merged[FULL_NAME] is missing, from a keyed lookup
+    (_key_lookup) matching `left_key_series` (same index as merged[missing_mask]).
+    """
+    if lookup is None or not missing_mask.any():
+        return merged
+
+    left_keys_norm = normalize_str(left_key_series, lower=True)
+    found = lookup.reindex(left_keys_norm.to_numpy())
+    found.index = left_keys_norm.index
+
+    for col, out_col in _LOOKUP_OUTPUTS.items():
+        merged.loc[missing_mask, out_col] = merged.loc[missing_mask, out_col].fillna(found[col])
+
+    return merged
+
+
+def enrich_with_employee_data(
+    df_in: pd.DataFrame,
+    email_col: str,
+    username_col: str,
+    primary_emp: pd.DataFrame,
+    fallback_emp: pd.DataFrame,
+    workers: int = 1,
+    index: Optional[EmployeeIndex] = None,
+) -> pd.DataFrame:
+    """
+    Employee enrichment pipeline.
+
+    Produces/fills:
+    - FULL_NAME
+    - STATUS_NAME
+    - cost_center_name
+    - dept_name
+    - title
+
+    primary_emp / fallback_emp are the pageradm_employee_ghr / dss_employee_ghr
+    tables, loaded (and cached) by the caller; `index` (build_employee_index)
+    skips re-preparing them when the caller enriches repeatedly.
+
+    workers > 1: rows are sharded by identity key over forked processes
+    (PARALLEL_MIN_ROWS and up, Linux only); same rows, same order as serial.
+    """
+    if index is None:
+        index = build_employee_index(primary_emp, fallback_emp)
+    if workers > 1 and len(df_in) >= PARALLEL_MIN_ROWS and fork_available():
+        return _enrich_parallel(df_in, email_col, username_col, index, workers)
+
+    df = df_in.copy()
+
+    out_cols = ["FULL_NAME", "STATUS_NAME", "cost_center_name", "dept_name", "title"]
+
+    # --- Preserve any existing values, but DROP to avoid duplicate columns after merge ---
+    existing = pd.DataFrame(index=df.index)
+    for c in out_cols:
+        if c in df.columns:
+            existing[c] = df[c]
+        else:
+            existing[c] = None
+
+    df.drop(columns=[c for c in out_cols if c in df.columns], inplace=True, errors="ignore")
+
+    # Normalize email/username inputs (+ internal alt/localpart helper cols, one pass)
+    if email_col not in df.columns:
+        df[email_col] = None
+    emails = canonicalize_emails(df[email_col])
+    df[email_col] = emails["email"]
+    df["_EMAIL_ALT"] = emails["alt"]
+    df["_EMAIL_LOCAL"] = emails["local"]
+
+    if username_col not in df.columns:
+        df[username_col] = None
+    df[username_col] = normalize_str(df[username_col])
+    df["_USER_ACCOUNT"] = account_keys(df[username_col])
+
+    user_data = index.primary
+
+    # 1) Primary merge on email -> smtp (a duplicated smtp repeats the input row;
+    #    _SRC_ROW keeps each output row tied to its input row's existing values)
+    df["_SRC_ROW"] = np.arange(len(df))
+    merged = (
+        df.merge(
+            user_data,
+            how="left",
+            left_on=email_col,
+            right_on="smtp",
+            suffixes=("", "_emp"),
+        )
+        .drop(columns=["smtp"], errors="ignore")
+    )
+    existing = existing.iloc[merged.pop("_SRC_ROW").to_numpy()].set_axis(merged.index)
+
+    # --- Capture employee values BEFORE we overlay "existing" columns ---
+    emp_full = merged["full_name"] if "full_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
+    emp_status = merged["status_name"] if "status_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
+    emp_cc = merged["cost_center_name"] if "cost_center_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
+    emp_dept = merged["dept_name"] if "dept_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
+    emp_title = merged["title"] if "title" in merged.columns else pd.Series(index=merged.index, dtype="object")
+
+    # --- Now build the output columns: prefer existing values, else employee values ---
+    merged["FULL_NAME"] = existing["FULL_NAME"].copy().fillna(emp_full)
+    merged["STATUS_NAME"] = existing["STATUS_NAME"].copy().fillna(emp_status)
+    merged["cost_center_name"] = existing["cost_center_name"].copy().fillna(emp_cc)
+    merged["dept_name"] = existing["dept_name"].copy().fillna(emp_dept)
+    merged["title"] = existing["title"].copy().fillna(emp_title)
+
+    # 2) Fallback lookup ONLY where FULL_NAME is missing
+    #    (key -> value maps; merging here used to suffix the fallback columns and never fill)
+    missing_mask = merged["FULL_NAME"].isna()
+    merged = _fill_missing_from_key(
+        merged=merged,
+        missing_mask=missing_mask,
+        lookup=index.lookups["fallback_smtp"],
+        left_key_series=merged.loc[missing_mask, email_col],
+    )
+
+    # 3) Partner email repair (still missing + partner email)
+    still_missing = merged["FULL_NAME"].isna()
+    partner_missing = still_missing & merged["_EMAIL_ALT"].ne(merged[email_col]) & merged["_EMAIL_ALT"].notna()
+    merged = _fill_missing_from_key(
+        merged=merged,
+        missing_mask=partner_missing,
+        lookup=index.lookups["smtp"],
+        left_key_series=merged.loc[partner_missing, "_EMAIL_ALT"],
+    )
+
+    # 4) Additional resolution passes (bname / nt_id on the username's account, gad_id on the email local part)
+    for key, left_col in [("bname", "_USER_ACCOUNT"), ("nt_id", "_USER_ACCOUNT"), ("gad_id", "_EMAIL_LOCAL")]:
+        missing = merged["FULL_NAME"].isna()
+        merged = _fill_missing_from_key(
+            merged=merged,
+            missing_mask=missing,
+            lookup=index.lookups[key],
+            left_key_series=merged.loc[missing, left_col],
+        )
+
+    # 5) Final fallback
+    final_missing = merged["FULL_NAME"].isna()
+    if final_missing.any():
+        merged.loc[final_missing, "FULL_NAME"] = "Possibly Terminated"
+        merged.loc[final_missing, "STATUS_NAME"] = merged.loc[final_missing, "STATUS_NAME"].fillna("Unknown")
+        for col in ["cost_center_name", "dept_name", "title"]:
+            merged.loc[final_missing, col] = merged.loc[final_missing, col].fillna("Unknown")
+
+    # Cleanup helper cols and employee raw cols
+    merged.drop(columns=["_EMAIL_ALT", "_EMAIL_LOCAL", "_USER_ACCOUNT"], inplace=True, errors="ignore")
+    merged.drop(columns=["full_name", "status_name"], inplace=True, errors="ignore")
+
+    return merged
+
+
+# ------------------------------------------------------------
+# Identity-key sharding (process-parallel enrichment / HR merges)
+#
+# The big read-only inputs (HR tables, the full frame) are put in a module
+# global before the pool forks, so workers read them through copy-on-write
+# pages instead of unpickling copies: only row positions go out and only
+# each shard's result comes back. Rows of one identity land in one shard.
+# Needs the "fork" start method (Linux); elsewhere callers run serially.
+# ------------------------------------------------------------
+
+# Below this many rows the fork + result pickling costs more than it saves
+PARALLEL_MIN_ROWS = 50_000
+
+ORDER_COL = "_SHARD_ROW"
+
+# State inherited by forked workers (set only for the duration of one map_shards call)
+_FORK_STATE: Dict[str, Any] = {}
+
+
+def fork_available() -> bool:
+    return sys.platform.startswith("linux") and "fork" in mp.get_all_start_methods()
+
+
+def default_workers() -> int:
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+
+def shard_codes(keys: pd.Series, n_shards: int) -> np.ndarray:
+    """Shard per row from a hash of its (already normalized) key; same key -> same shard."""
+    keys = keys.astype("object").where(keys.notna(), "")
+    hashed = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (hashed % np.uint64(n_shards)).astype(np.int64)
+
+
+def _run_shard(shard: int) -> Any:
+    state = _FORK_STATE
+    rows = state["df"].iloc[state["positions"][shard]].reset_index(drop=True)
+    return state["fn"](rows, **state["shared"])
+
+
+def map_shards(fn: Callable[..., Any], df: pd.DataFrame, keys: pd.Series, workers: int, **shared: Any) -> List[Any]:
+    """
+    fn(shard_rows, **shared) over `workers` key-hash shards of `df` in forked
+    processes; results in shard order. Each row carries its position in `df`
+    as ORDER_COL so concat_ordered can restore the serial order.
+    """
+    df = df.assign(**{ORDER_COL: np.arange(len(df))})
+    codes = shard_codes(keys.reset_index(drop=True), workers)
+    positions = [np.flatnonzero(codes == shard) for shard in range(workers)]
+
+    _FORK_STATE.update(fn=fn, df=df, positions=positions, shared=shared)
+    try:
+        with mp.get_context("fork").Pool(workers) as pool:
+            return pool.map(_run_shard, range(workers), chunksize=1)
+    finally:
+        _FORK_STATE.clear()
+
+
+def concat_ordered(frames: Sequence[pd.DataFrame], by: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Concat shard results in serial order: stable sort on `by` (default
+    ORDER_COL); the sort columns and ORDER_COL are dropped.
+    """
+    by = list(by or [ORDER_COL])
+    out = pd.concat(frames, ignore_index=True).sort_values(by, kind="stable")
+    return out.drop(columns=list(dict.fromkeys(by + [ORDER_COL]))).reset_index(drop=True)
+
+
+def _enrich_shard(rows: pd.DataFrame, **kwargs: Any) -> pd.DataFrame:
+    return enrich_with_employee_data(rows, **kwargs)
+
+
+def _enrich_parallel(
+    df_in: pd.DataFrame,
+    email_col: str,
+    username_col: str,
+    index: EmployeeIndex,
+    workers: int,
+) -> pd.DataFrame:
+    df = df_in.reset_index(drop=True)
+    raw_emails = df[email_col] if email_col in df.columns else pd.Series(None, index=df.index, dtype="object")
+    emails = canonicalize_emails(raw_emails)
+    usernames = normalize_str(df[username_col], lower=True) if username_col in df.columns else None
+    keys = emails["email"] if usernames is None else emails["email"].fillna(usernames)
+
+    # The prepared index is inherited by the forked workers, never pickled
+    parts = map_shards(
+        _enrich_shard,
+        df,
+        keys,
+        workers,
+        email_col=email_col,
+        username_col=username_col,
+        primary_emp=index.primary,
+        fallback_emp=None,
+        index=index,
+    )
+    return concat_ordered(parts)
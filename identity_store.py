@@ -0,0 +1,359 @@
+# ------------------------------------------------------------
+# Persistent resolved-identity store (Spotfire user_name -> HR identity)
+# ------------------------------------------------------------
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from .identity import normalize_str
+
+# Output columns produced by employee enrichment (and therefore stored here)
+IDENTITY_COLS = ["FULL_NAME", "STATUS_NAME", "cost_center_name", "dept_name", "title"]
+
+# Normalized candidate keys a row can be resolved through:
+# - input_email     -> primary/fallback smtp
+# - email_alt       -> primary smtp (partner -> samsung repair)
+# - user_name_norm  -> bname / nt_id
+# - email_local     -> gad_id
+CANDIDATE_KEY_COLS = ["input_email", "email_alt", "user_name_norm", "email_local"]
+
+# HR lookup keys per snapshot (source -> key columns)
+HR_KEY_COLS = {
+    "primary": ["smtp", "bname", "nt_id", "gad_id"],
+    "fallback": ["smtp"],
+}
+HR_VALUE_COLS = ["smtp", "full_name", "status_name", "cost_center_name", "dept_name", "title"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS hr_keys (
+    source TEXT NOT NULL,
+    key_col TEXT NOT NULL,
+    key_value TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    PRIMARY KEY (source, key_col, key_value)
+);
+CREATE TABLE IF NOT EXISTS resolved_identity (
+    user_name TEXT NOT NULL,
+    input_email TEXT NOT NULL,
+    email_alt TEXT,
+    user_name_norm TEXT,
+    email_local TEXT,
+    FULL_NAME TEXT,
+    STATUS_NAME TEXT,
+    cost_center_name TEXT,
+    dept_name TEXT,
+    title TEXT,
+    hr_version TEXT,
+    resolved_at REAL,
+    PRIMARY KEY (user_name, input_email)
+);
+CREATE TABLE IF NOT EXISTS unresolved_identity (
+    user_name TEXT NOT NULL,
+    input_email TEXT NOT NULL,
+    email_alt TEXT,
+    user_name_norm TEXT,
+    email_local TEXT,
+    hr_version TEXT,
+    first_seen REAL,
+    last_seen REAL,
+    attempts INTEGER DEFAULT 0,
+    PRIMARY KEY (user_name, input_email)
+);
+CREATE INDEX IF NOT EXISTS ix_resolved_email ON resolved_identity (input_email);
+CREATE INDEX IF NOT EXISTS ix_resolved_alt ON resolved_identity (email_alt);
+CREATE INDEX IF NOT EXISTS ix_resolved_user ON resolved_identity (user_name_norm);
+CREATE INDEX IF NOT EXISTS ix_resolved_local ON resolved_identity (email_local);
+CREATE INDEX IF NOT EXISTS ix_unresolved_email ON unresolved_identity (input_email);
+CREATE INDEX IF NOT EXISTS ix_unresolved_alt ON unresolved_identity (email_alt);
+CREATE INDEX IF NOT EXISTS ix_unresolved_user ON unresolved_identity (user_name_norm);
+CREATE INDEX IF NOT EXISTS ix_unresolved_local ON unresolved_identity (email_local);
+"""
+
+# Identity tables that are invalidated by HR key changes
+_IDENTITY_TABLES = ["resolved_identity", "unresolved_identity"]
+
+# Stored key columns: the (user_name, input_email) identity + its candidate keys
+_KEY_COLS = ["user_name"] + CANDIDATE_KEY_COLS
+
+
+def _clean_key(series: pd.Series) -> pd.Series:
+    """normalize_str(lower=True) of a key column; missing values become '' (SQLite PK friendly)."""
+    return normalize_str(series, lower=True).fillna("")
+
+
+def hr_key_frame(primary_emp: pd.DataFrame, fallback_emp: pd.DataFrame) -> pd.DataFrame:
+    """
+    Flatten both HR snapshots into one (source, key_col, key_value, row_hash) frame.
+
+    row_hash covers every value enrichment can read through that key, so a
+    changed hash means "anything resolved through this key may be stale".
+    Only the first row per key is hashed, matching the keep="first" lookups
+    used by the enrichment passes.
+    """
+    parts: List[pd.DataFrame] = []
+    for source, emp in (("primary", primary_emp), ("fallback", fallback_emp)):
+        if emp is None or emp.empty:
+            continue
+        value_cols = [c for c in HR_VALUE_COLS if c in emp.columns]
+        for key_col in HR_KEY_COLS[source]:
+            if key_col not in emp.columns:
+                continue
+            k = emp[[key_col] + [c for c in value_cols if c != key_col]].copy()
+            k["key_value"] = _clean_key(k[key_col])
+            k = k.loc[k["key_value"] != ""].drop_duplicates(subset=["key_value"], keep="first")
+            if k.empty:
+                continue
+            hashed = pd.util.hash_pandas_object(
+                k.drop(columns=["key_value"]).astype(str), index=False
+            )
+            parts.append(
+                pd.DataFrame(
+                    {
+                        "source": source,
+                        "key_col": key_col,
+                        "key_value": k["key_value"].to_numpy(),
+                        "row_hash": hashed.astype(str).to_numpy(),
+                    }
+                )
+            )
+
+    if not parts:
+        return pd.DataFrame(columns=["source", "key_col", "key_value", "row_hash"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def hr_snapshot_version(keys: pd.DataFrame) -> str:
+    """Order-independent digest of an hr_key_frame()."""
+    if keys is None or keys.empty:
+        return "empty"
+    ordered = keys.sort_values(["source", "key_col", "key_value"])
+    digest = pd.util.hash_pandas_object(ordered, index=False).to_numpy().tobytes()
+    return hashlib.sha1(digest).hexdigest()[:16]
+
+
+class IdentityStore:
+    """
+    SQLite-backed tables of already-resolved (and known-unresolvable) identities.
+
+    Rows are keyed by (user_name, input_email) - the exact inputs enrichment saw -
+    and carry the normalized candidate keys they could be resolved through.
+    When the HR snapshots change, sync_hr() diffs the per-key row hashes against
+    the previous snapshot and deletes only the identities touching a changed key,
+    so refreshes stay incremental.
+
+    unresolved_identity is the negative cache: every key in it was already tried
+    against the recorded hr_version and matched nothing, so those rows can go
+    straight to the "Possibly Terminated" fallback until one of their keys shows
+    up in a changed HR snapshot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ready = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # -----------------------------
+    # HR snapshot tracking
+    # -----------------------------
+    def hr_version(self) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'hr_version'").fetchone()
+        return row[0] if row else None
+
+    def sync_hr(self, primary_emp: pd.DataFrame, fallback_emp: pd.DataFrame) -> str:
+        """
+        Bring the store in line with the current HR snapshots.
+
+        Returns the current HR version. If it differs from the stored one,
+        identities whose candidate keys hit an added/removed/changed HR key
+        are invalidated (first sync clears everything).
+        """
+        keys = hr_key_frame(primary_emp, fallback_emp)
+        version = hr_snapshot_version(keys)
+        if version == self.hr_version():
+            return version
+
+        with self._connect() as conn:
+            old = pd.read_sql_query("SELECT source, key_col, key_value, row_hash FROM hr_keys", conn)
+
+            if old.empty:
+                for table in _IDENTITY_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+            else:
+                diff = old.merge(
+                    keys,
+                    on=["source", "key_col", "key_value"],
+                    how="outer",
+                    suffixes=("_old", "_new"),
+                )
+                changed_mask = diff["row_hash_old"].ne(diff["row_hash_new"]) | diff["row_hash_old"].isna() | diff[
+                    "row_hash_new"
+                ].isna()
+                changed = diff.loc[changed_mask, "key_value"].drop_duplicates()
+
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS changed_keys (v TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM changed_keys")
+                conn.executemany("INSERT OR IGNORE INTO changed_keys (v) VALUES (?)", [(v,) for v in changed])
+                for table in _IDENTITY_TABLES:
+                    conn.execute(
+                        f"""
+                        DELETE FROM {table}
+                        WHERE input_email IN (SELECT v FROM changed_keys)
+                           OR email_alt IN (SELECT v FROM changed_keys)
+                           OR user_name_norm IN (SELECT v FROM changed_keys)
+                           OR email_local IN (SELECT v FROM changed_keys)
+                        """
+                    )
+
+                # Surviving negatives had none of their keys touched: still unresolvable
+                conn.execute("UPDATE unresolved_identity SET hr_version = ?", (version,))
+
+            conn.execute("DELETE FROM hr_keys")
+            conn.executemany(
+                "INSERT INTO hr_keys (source, key_col, key_value, row_hash) VALUES (?, ?, ?, ?)",
+                keys[["source", "key_col", "key_value", "row_hash"]].itertuples(index=False, name=None),
+            )
+            conn.execute(
+                "INSERT INTO meta (name, value) VALUES ('hr_version', ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (version,),
+            )
+
+        return version
+
+    # -----------------------------
+    # Resolved identities
+    # -----------------------------
+    def lookup(self, keys: pd.DataFrame) -> pd.DataFrame:
+        """
+        Look up resolved identities.
+
+        keys: frame with user_name + input_email (already normalized, '' for missing).
+        Returns the matching stored rows (user_name, input_email, IDENTITY_COLS).
+        """
+        cols = ["user_name", "input_email"] + IDENTITY_COLS
+        if keys is None or keys.empty:
+            return pd.DataFrame(columns=cols)
+
+        return self._join_keys("resolved_identity", keys, cols)
+
+    def lookup_unresolved(self, keys: pd.DataFrame, hr_version: str) -> pd.DataFrame:
+        """
+        Negative-cache lookup: (user_name, input_email) pairs already tried
+        against hr_version without a match.
+        """
+        found = self._join_keys("unresolved_identity", keys, ["user_name", "input_email", "hr_version"])
+        return found.loc[found["hr_version"] == hr_version, ["user_name", "input_email"]]
+
+    def _join_keys(self, table: str, keys: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+        if keys is None or keys.empty:
+            return pd.DataFrame(columns=cols)
+
+        pairs = keys[["user_name", "input_email"]].drop_duplicates()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS lookup_keys (user_name TEXT, input_email TEXT, "
+                "PRIMARY KEY (user_name, input_email))"
+            )
+            conn.execute("DELETE FROM lookup_keys")
+            conn.executemany(
+                "INSERT OR IGNORE INTO lookup_keys (user_name, input_email) VALUES (?, ?)",
+                pairs.itertuples(index=False, name=None),
+            )
+            found = pd.read_sql_query(
+                f"""
+                SELECT {", ".join("r." + c for c in cols)}
+                FROM {table} r
+                JOIN lookup_keys k ON k.user_name = r.user_name AND k.input_email = r.input_email
+                """,
+                conn,
+            )
+        return found
+
+    def upsert(self, rows: pd.DataFrame, hr_version: str) -> int:
+        """
+        Insert/replace resolved identities (and drop them from the negative cache).
+
+        rows: user_name, input_email, email_alt, user_name_norm, email_local + IDENTITY_COLS.
+        """
+        if rows is None or rows.empty:
+            return 0
+
+        cols = _KEY_COLS + IDENTITY_COLS
+        data = rows[cols].astype(object).where(rows[cols].notna(), None)
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO resolved_identity ({", ".join(cols)}, hr_version, resolved_at)
+                VALUES ({", ".join("?" for _ in cols)}, ?, ?)
+                """,
+                ((*r, hr_version, now) for r in data.itertuples(index=False, name=None)),
+            )
+            conn.executemany(
+                "DELETE FROM unresolved_identity WHERE user_name = ? AND input_email = ?",
+                data[["user_name", "input_email"]].itertuples(index=False, name=None),
+            )
+        return len(data)
+
+    def record_unresolved(self, rows: pd.DataFrame, hr_version: str) -> int:
+        """
+        Record identities that went through every enrichment pass without a match.
+
+        rows: user_name, input_email, email_alt, user_name_norm, email_local.
+        """
+        if rows is None or rows.empty:
+            return 0
+
+        data = rows[_KEY_COLS].drop_duplicates(subset=["user_name", "input_email"])
+        data = data.astype(object).where(data.notna(), None)
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.executemany(
+                f"""
+                INSERT INTO unresolved_identity ({", ".join(_KEY_COLS)}, hr_version, first_seen, last_seen, attempts)
+                VALUES ({", ".join("?" for _ in _KEY_COLS)}, ?, ?, ?, 1)
+                ON CONFLICT(user_name, input_email) DO UPDATE SET
+                    hr_version = excluded.hr_version,
+                    last_seen = excluded.last_seen,
+                    attempts = unresolved_identity.attempts + 1
+                """,
+                ((*r, hr_version, now, now) for r in data.itertuples(index=False, name=None)),
+            )
+        return len(data)
+
+    def size(self) -> int:
+        with self._connect() as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM resolved_identity").fetchone()[0])
+
+    def unresolved_size(self) -> int:
+        with self._connect() as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM unresolved_identity").fetchone()[0])
+
+
+def default_store_path() -> str:
+    return os.environ.get("SPOTFIRE_IDENTITY_DB", "spotfire_identity.sqlite3")
@@ -0,0 +1,147 @@
+# ------------------------------------------------------------
+# License summaries (computed once per license snapshot build)
+# ------------------------------------------------------------
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .identity import normalize_str
+
+# ANALYST_ACTIONS_PER_DAY distribution reported per group
+APD_QUANTILES = {"p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+
+# Histogram bin lower edges (last bin is open-ended): [0, 0.1), [0.1, 0.5), ... [10, inf)
+APD_HISTOGRAM_EDGES = [0.0, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0]
+
+
+def active_rows(final: pd.DataFrame) -> pd.DataFrame:
+    """Active users only (what /license-reduction serves)."""
+    if final.empty or "STATUS_NAME" not in final.columns:
+        return final.iloc[0:0]
+    return final.loc[normalize_str(final["STATUS_NAME"], lower=True).eq("active").to_numpy()]
+
+
+def _group_stats(active: pd.DataFrame, keys: pd.Series) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-key counts + ANALYST_ACTIONS_PER_DAY distribution in a handful of
+    vectorized groupbys (no per-row Python).
+
+    - analysts / consumers: recommendedAction split
+    """
+    apd = pd.to_numeric(active["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    is_analyst = normalize_str(active["recommendedAction"], lower=True).eq("analyst").to_numpy()
+    bins = np.searchsorted(APD_HISTOGRAM_EDGES, apd, side="right") - 1
+
+    frame = pd.DataFrame({"key": keys.to_numpy(), "apd": apd, "analyst": is_analyst, "bin": np.clip(bins, 0, None)})
+    frame = frame.loc[frame["key"].notna()]
+    if frame.empty:
+        return {}
+
+    g = frame.groupby("key", sort=True)
+    counts = g.agg(activeUsers=("apd", "size"), analysts=("analyst", "sum"), mean=("apd", "mean"), max=("apd", "max"))
+    quantiles = g["apd"].quantile(list(APD_QUANTILES.values())).unstack()
+    quantiles.columns = list(APD_QUANTILES)
+    hist = (
+        frame.groupby(["key", "bin"])
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=range(len(APD_HISTOGRAM_EDGES)), fill_value=0)
+    )
+
+    stats = counts.join(quantiles)
+    out: Dict[str, Dict[str, Any]] = {}
+    for key, row, h in zip(stats.index, stats.itertuples(index=False), hist.loc[stats.index].to_numpy()):
+        consumers = int(row.activeUsers - row.analysts)
+        out[str(key)] = {
+            "activeUsers": int(row.activeUsers),
+            "analysts": int(row.analysts),
+            "consumers": consumers,
+            "analystActionsPerDay": {
+                "mean": round(float(row.mean), 4),
+                **{name: round(float(getattr(row, name)), 4) for name in APD_QUANTILES},
+                "max": round(float(row.max), 4),
+                "histogram": [int(c) for c in h],
+            },
+        }
+    return out
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "activeUsers": 0,
+        "analysts": 0,
+        "consumers": 0,
+        "analystActionsPerDay": {
+            "mean": 0.0,
+            **{name: 0.0 for name in APD_QUANTILES},
+            "max": 0.0,
+            "histogram": [0] * len(APD_HISTOGRAM_EDGES),
+        },
+    }
+
+
+def build_summary(final: pd.DataFrame) -> Dict[str, Any]:
+    """
+    License summary of a deduped final frame (Active users only):
+    whole organization, per cost center and per department.
+    """
+    active = active_rows(final)
+    overall = _group_stats(active, pd.Series(["all"] * len(active), dtype="object"))
+    return {
+        "histogramEdges": list(APD_HISTOGRAM_EDGES),
+        "overall": overall.get("all", _empty_stats()),
+        "costCenters": _group_stats(active, normalize_str(active["cost_center_name"])) if len(active) else {},
+        "departments": _group_stats(active, normalize_str(active["dept_name"])) if len(active) else {},
+    }
+
+
+# ------------------------------------------------------------
+# Threshold what-if (sorted per-user ANALYST_ACTIONS_PER_DAY arrays)
+# ------------------------------------------------------------
+
+# Scope key of the whole-organization array
+ORG_SCOPE = "all"
+
+
+def build_threshold_index(final: pd.DataFrame, windows: Dict[int, str]) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    window -> scope -> ascending ANALYST_ACTIONS_PER_DAY of Active users, where
+    scope is ORG_SCOPE or a cost center. `windows` maps window days -> column.
+
+    One lexsort per window (cost center, value) and a split at the group
+    boundaries - no per-cost-center sorting.
+    """
+    active = active_rows(final)
+    cc = normalize_str(active["cost_center_name"]) if len(active) else pd.Series([], dtype="object")
+    codes, names = pd.factorize(cc, use_na_sentinel=True)
+
+    index: Dict[int, Dict[str, np.ndarray]] = {}
+    for days, col in windows.items():
+        if col not in active.columns:
+            continue
+        apd = pd.to_numeric(active[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+        scopes = {ORG_SCOPE: np.sort(apd)}
+
+        keep = codes >= 0
+        order = np.lexsort((apd[keep], codes[keep]))
+        sorted_codes = codes[keep][order]
+        sorted_apd = apd[keep][order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        for chunk_codes, chunk in zip(np.split(sorted_codes, bounds), np.split(sorted_apd, bounds)):
+            if len(chunk):
+                scopes[str(names[chunk_codes[0]])] = chunk
+
+        index[days] = scopes
+    return index
+
+
+def threshold_split(sorted_apd: np.ndarray, thresholds: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Analyst / Consumer split at every threshold (Analyst when value >= threshold)
+    with one vectorized binary search over the sorted values.
+    """
+    n = len(sorted_apd)
+    consumers = np.searchsorted(sorted_apd, thresholds, side="left")
+    return [{"threshold": float(t), "analysts": int(n - c), "consumers": int(c)} for t, c in zip(thresholds, consumers)]
@@ -0,0 +1,31 @@
+# ------------------------------------------------------------
+# Analyst metric windows (shared by spotfire.py and the API)
+# ------------------------------------------------------------
+
+from typing import List
+
+# Trailing windows (days) the batch job emits metrics for; the largest one also
+# bounds the action-log pull
+METRIC_WINDOWS = (7, 30, 60, 90)
+
+# Window behind the unsuffixed columns (ANALYST_PCT, ANALYST_ACTIONS_PER_DAY, ...)
+DEFAULT_WINDOW = 90
+
+# Per-user metrics that exist once per window
+WINDOWED_METRICS = [
+    "ANALYST_FUNCTIONS",
+    "NON_ANALYST_FUNCTIONS",
+    "ANALYST_PCT",
+    "ANALYST_ACTIONS_PER_DAY",
+    "ACTIVE_DAYS",
+]
+
+
+def window_col(metric: str, days: int) -> str:
+    """Column name of `metric` over a `days`-day window, e.g. ANALYST_PCT_30D."""
+    return f"{metric}_{days}D"
+
+
+def windowed_columns() -> List[str]:
+    """Every windowed metric column, window-major (7D block first)."""
+    return [window_col(m, w) for w in METRIC_WINDOWS for m in WINDOWED_METRICS]
@@ -0,0 +1,147 @@
+# ------------------------------------------------------------
+# Async PostgreSQL pool (SQLAlchemy async + asyncpg)
+# ------------------------------------------------------------
+
+import asyncio
+import importlib.util
+import io
+import os
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+# Pool sizing (env-tunable per deployment)
+POOL_SIZE = int(os.environ.get("SPOTFIRE_PG_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.environ.get("SPOTFIRE_PG_MAX_OVERFLOW", "5"))
+POOL_RECYCLE_SECONDS = 30 * 60
+POOL_TIMEOUT_SECONDS = 30
+
+# Prepared statements kept per pooled connection, by SQL text: SQLAlchemy's
+# asyncpg adapter cache (statements run through the engine) and fetch_prepared()'s
+PREPARED_STATEMENT_CACHE_SIZE = 256
+
+_ASYNC_STATE: Dict[str, Any] = {"engine": None}
+
+# asyncpg connection -> {sql: PreparedStatement}; entries go with the connection
+_PREPARED: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+
+def async_pg_available() -> bool:
+    """True when both SQLAlchemy's asyncio extension and asyncpg are installed."""
+    return (
+        importlib.util.find_spec("asyncpg") is not None
+        and importlib.util.find_spec("sqlalchemy.ext.asyncio") is not None
+    )
+
+
+def async_url(url):
+    """
+    Derive the asyncpg URL from the shared sync engine's URL
+    (same host/db/credentials, different driver).
+    """
+    return url.set(drivername="postgresql+asyncpg").update_query_dict(
+        {"prepared_statement_cache_size": str(PREPARED_STATEMENT_CACHE_SIZE)}
+    )
+
+
+def get_async_engine(sync_engine=None):
+    """
+    Process-wide async engine with a tuned pool, created on first use.
+
+    `sync_engine` (databases.psql.engine) is only needed on the first call.
+    Raises ImportError if asyncpg / SQLAlchemy asyncio aren't installed.
+    """
+    if _ASYNC_STATE["engine"] is None:
+        if sync_engine is None:
+            raise RuntimeError("get_async_engine() needs the sync engine on first use")
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _ASYNC_STATE["engine"] = create_async_engine(
+            async_url(sync_engine.url),
+            pool_size=POOL_SIZE,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_recycle=POOL_RECYCLE_SECONDS,
+            pool_timeout=POOL_TIMEOUT_SECONDS,
+            pool_pre_ping=True,
+        )
+    return _ASYNC_STATE["engine"]
+
+
+async def warm_pool(sync_engine, connections: Optional[int] = None) -> int:
+    """
+    Open `connections` pooled connections up front (default: POOL_SIZE) so the
+    first requests never pay for TCP/TLS/auth setup. Returns how many opened.
+    """
+    from sqlalchemy import text
+
+    eng = get_async_engine(sync_engine)
+    n = POOL_SIZE if connections is None else connections
+
+    async def ping() -> None:
+        async with eng.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(n)))
+    return n
+
+
+async def copy_query_to_buffer(sync_engine, sql: str, *args) -> io.BytesIO:
+    """
+    COPY (sql) TO STDOUT as CSV (with header) over a pooled asyncpg connection.
+
+    `sql` uses asyncpg placeholders ($1, $2, ...). COPY can't be prepared:
+    asyncpg has the server quote `args` (quote_literal, one extra round trip)
+    and inlines them into the COPY text. Best for bulk reads; selective
+    parameterized reads are cheaper through fetch_prepared().
+    """
+    eng = get_async_engine(sync_engine)
+    buf = io.BytesIO()
+
+    async def sink(chunk: bytes) -> None:
+        buf.write(chunk)
+
+    async with eng.connect() as conn:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_from_query(sql, *args, output=sink, format="csv", header=True)
+
+    buf.seek(0)
+    return buf
+
+
+async def _prepared(conn, sql: str):
+    stmts = _PREPARED.setdefault(conn, {})
+    stmt = stmts.get(sql)
+    if stmt is None:
+        if len(stmts) >= PREPARED_STATEMENT_CACHE_SIZE:
+            stmts.clear()
+        stmt = stmts[sql] = await conn.prepare(sql)
+    return stmt
+
+
+async def fetch_prepared(sync_engine, sql: str, *args) -> Tuple[List[str], List[tuple]]:
+    """
+    (column names, rows) of a SELECT run as a prepared statement over a pooled
+    asyncpg connection: `args` are bound to $1, $2, ... and rows come back in
+    the binary protocol. Each connection prepares a given SQL text once and
+    reuses it; a statement invalidated by a table swap (pg_loader) is
+    re-prepared once.
+    """
+    from asyncpg.exceptions import InvalidCachedStatementError, OutdatedSchemaCacheError
+
+    eng = get_async_engine(sync_engine)
+    async with eng.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        try:
+            stmt = await _prepared(raw, sql)
+            rows = await stmt.fetch(*args)
+        except (InvalidCachedStatementError, OutdatedSchemaCacheError):
+            _PREPARED.get(raw, {}).pop(sql, None)
+            stmt = await _prepared(raw, sql)
+            rows = await stmt.fetch(*args)
+        return [a.name for a in stmt.get_attributes()], [tuple(r) for r in rows]
+
+
+async def dispose_async_engine() -> None:
+    """Close every pooled connection (app shutdown)."""
+    if _ASYNC_STATE["engine"] is not None:
+        await _ASYNC_STATE["engine"].dispose()
+        _ASYNC_STATE["engine"] = None
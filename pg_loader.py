@@ -0,0 +1,259 @@
+# ------------------------------------------------------------
+# PostgreSQL bulk loader (COPY + staging table + atomic swap)
+#
+# Also runs against the offline SQLite stand-in (datasources, backend
+# "offline"): same tables and dataset_versions, INSERTs instead of COPY.
+# ------------------------------------------------------------
+
+import io
+import uuid
+from typing import Dict, Iterable, Mapping, Optional
+
+import pandas as pd
+
+# Per-dataset version counter, bumped on every successful load
+VERSIONS_TABLE = "dataset_versions"
+
+
+def _pg_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMPTZ"
+    return "TEXT"
+
+
+def _is_sqlite(engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def _ph(engine) -> str:
+    """Bind placeholder of the engine's DB-API driver."""
+    return "?" if _is_sqlite(engine) else "%s"
+
+
+def _qi(name: str) -> str:
+    """Quote an identifier (keeps the mixed-case column names the API selects)."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def copy_from_buffer(cur, copy_sql: str, buf: io.BytesIO) -> None:
+    """COPY ... FROM STDIN for psycopg2 (copy_expert) and psycopg 3 (cursor.copy)."""
+    buf.seek(0)
+    if hasattr(cur, "copy_expert"):
+        cur.copy_expert(copy_sql, buf)
+    else:
+        with cur.copy(copy_sql) as copy:
+            copy.write(buf.getvalue())
+
+
+def _columns_ddl(df: pd.DataFrame, column_types: Optional[Mapping[str, str]] = None) -> str:
+    types = dict(column_types or {})
+    return ", ".join(f"{_qi(c)} {types.get(c) or _pg_type(df[c].dtype)}" for c in df.columns)
+
+
+def to_copy_csv(df: pd.DataFrame) -> io.BytesIO:
+    """The CSV payload COPY ... FROM STDIN reads (header row, ISO timestamps with offset)."""
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, header=True, date_format="%Y-%m-%d %H:%M:%S%z")
+    return buf
+
+
+def _insert_rows(cur, schema: str, table: str, df: pd.DataFrame) -> None:
+    """SQLite stand-in for COPY: executemany with timestamps as text, NaN/NaT as NULL."""
+    rows = df.copy()
+    for col in rows.columns:
+        if pd.api.types.is_datetime64_any_dtype(rows[col]):
+            rows[col] = rows[col].dt.strftime("%Y-%m-%d %H:%M:%S%z")
+    rows = rows.astype(object).where(rows.notna(), None)
+    cols = ", ".join(_qi(c) for c in df.columns)
+    marks = ", ".join("?" for _ in df.columns)
+    cur.executemany(f"INSERT INTO {_qi(schema)}.{_qi(table)} ({cols}) VALUES ({marks})", rows.itertuples(index=False))
+
+
+def _copy_in(cur, schema: str, table: str, df: pd.DataFrame) -> None:
+    if not (hasattr(cur, "copy_expert") or hasattr(cur, "copy")):
+        _insert_rows(cur, schema, table, df)
+        return
+    copy_from_buffer(
+        cur,
+        f"COPY {_qi(schema)}.{_qi(table)} ({', '.join(_qi(c) for c in df.columns)}) "
+        "FROM STDIN WITH (FORMAT csv, HEADER true)",
+        to_copy_csv(df),
+    )
+
+
+def _ensure_versions_table(cur, schema: str) -> None:
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {_qi(schema)}.{VERSIONS_TABLE} (
+            dataset TEXT PRIMARY KEY,
+            version BIGINT NOT NULL,
+            row_count BIGINT,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def _bump_version(cur, schema: str, dataset: str, row_count: int, ph: str = "%s") -> int:
+    _ensure_versions_table(cur, schema)
+    cur.execute(
+        f"""
+        INSERT INTO {_qi(schema)}.{VERSIONS_TABLE} (dataset, version, row_count, loaded_at)
+        VALUES ({ph}, 1, {ph}, CURRENT_TIMESTAMP)
+        ON CONFLICT (dataset) DO UPDATE
+           SET version = {VERSIONS_TABLE}.version + 1,
+               row_count = EXCLUDED.row_count,
+               loaded_at = EXCLUDED.loaded_at
+        RETURNING version
+        """,
+        (dataset, row_count),
+    )
+    return int(cur.fetchone()[0])
+
+
+def _table_exists(engine, cur, schema: str, table: str) -> bool:
+    if _is_sqlite(engine):
+        cur.execute(f"SELECT 1 FROM {_qi(schema)}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    else:
+        cur.execute("SELECT to_regclass(%s)", (f"{_qi(schema)}.{_qi(table)}",))
+    row = cur.fetchone()
+    return row is not None and row[0] is not None
+
+
+def _create_index_sql(engine, schema: str, table: str, col: str, name: Optional[str] = None) -> str:
+    """
+    CREATE INDEX on schema.table (col). PostgreSQL indexes are unnamed unless
+    `name` is given (IF NOT EXISTS); SQLite needs a name, which lives in the
+    schema (a random suffix keeps staging indexes from colliding with the live table's).
+    """
+    if _is_sqlite(engine):
+        index = _qi(name or f"{table}_{col}_{uuid.uuid4().hex[:8]}".lower())
+        exists = "IF NOT EXISTS " if name else ""
+        return f"CREATE INDEX {exists}{_qi(schema)}.{index} ON {_qi(table)} ({_qi(col)})"
+    if name:
+        return f"CREATE INDEX IF NOT EXISTS {_qi(name)} ON {_qi(schema)}.{_qi(table)} ({_qi(col)})"
+    return f"CREATE INDEX ON {_qi(schema)}.{_qi(table)} ({_qi(col)})"
+
+
+def load_table(
+    engine,
+    schema: str,
+    table: str,
+    df: pd.DataFrame,
+    indexes: Iterable[str] = (),
+    column_types: Optional[Mapping[str, str]] = None,
+) -> int:
+    """
+    Replace schema.table with df, without readers ever seeing a partial table.
+
+    1) COPY df into a fresh {table}__staging table (own transaction)
+    2) In one transaction: rename live -> __old, staging -> live, drop __old,
+       and bump dataset_versions.version for `table`
+
+    Returns the new dataset version.
+    """
+    staging = f"{table}__staging"
+    old = f"{table}__old"
+    s = _qi(schema)
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+
+        # 1) staging load
+        cur.execute(f"DROP TABLE IF EXISTS {s}.{_qi(staging)}")
+        cur.execute(f"CREATE TABLE {s}.{_qi(staging)} ({_columns_ddl(df, column_types)})")
+        _copy_in(cur, schema, staging, df)
+        for col in indexes:
+            cur.execute(_create_index_sql(engine, schema, staging, col))
+        cur.execute(f"ANALYZE {s}.{_qi(staging)}")
+        raw.commit()
+
+        # 2) atomic swap + version bump
+        cur.execute(f"DROP TABLE IF EXISTS {s}.{_qi(old)}")
+        if _table_exists(engine, cur, schema, table):
+            cur.execute(f"ALTER TABLE {s}.{_qi(table)} RENAME TO {_qi(old)}")
+        cur.execute(f"ALTER TABLE {s}.{_qi(staging)} RENAME TO {_qi(table)}")
+        cur.execute(f"DROP TABLE IF EXISTS {s}.{_qi(old)}")
+        version = _bump_version(cur, schema, table, len(df), _ph(engine))
+        raw.commit()
+        cur.close()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    return version
+
+
+def replace_days(
+    engine,
+    schema: str,
+    table: str,
+    df: pd.DataFrame,
+    day_col: str,
+    start_day: str,
+    end_day: str,
+    indexes: Iterable[str] = (),
+    column_types: Optional[Mapping[str, str]] = None,
+) -> int:
+    """
+    Incrementally maintain a day-bucketed rollup table: in ONE transaction,
+    delete the rows of days [start_day, end_day) and COPY in df (which holds
+    exactly those days). Older days are kept, so history grows run over run;
+    readers see either the previous or the new days, never a mix.
+
+    Creates the table (and `indexes`) on first use. Returns the new dataset version.
+    """
+    s = _qi(schema)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {s}.{_qi(table)} ({_columns_ddl(df, column_types)})")
+        for col in [day_col, *indexes]:
+            cur.execute(_create_index_sql(engine, schema, table, col, name=f"{table}_{col}_idx".lower()))
+
+        ph = _ph(engine)
+        cur.execute(
+            f"DELETE FROM {s}.{_qi(table)} WHERE {_qi(day_col)} >= {ph} AND {_qi(day_col)} < {ph}",
+            (start_day, end_day),
+        )
+        _copy_in(cur, schema, table, df)
+        cur.execute(f"SELECT count(*) FROM {s}.{_qi(table)}")
+        version = _bump_version(cur, schema, table, int(cur.fetchone()[0]), ph)
+        raw.commit()
+        cur.close()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    return version
+
+
+def read_dataset_versions(engine, schema: str) -> Dict[str, int]:
+    """All dataset versions ({} if nothing has been loaded through load_table yet)."""
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        if not _table_exists(engine, cur, schema, VERSIONS_TABLE):
+            return {}
+        cur.execute(f"SELECT dataset, version FROM {_qi(schema)}.{VERSIONS_TABLE}")
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        raw.close()
+    return {dataset: int(version) for dataset, version in rows}
+
+
+def read_dataset_version(engine, schema: str, dataset: str) -> Optional[int]:
+    """Current version of one dataset, or None if it isn't tracked."""
+    return read_dataset_versions(engine, schema).get(dataset)
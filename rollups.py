@@ -0,0 +1,135 @@
+# ------------------------------------------------------------
+# Daily usage rollups (built by spotfire.py, served by the API)
+# ------------------------------------------------------------
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Rollup tables (schema-qualified by the caller); one row per key per UTC day
+REPORT_LOADS_TABLE = "report_loads_daily"
+PLATFORM_LOGINS_TABLE = "platform_logins_daily"
+ANALYST_ACTIONS_TABLE = "analyst_actions_daily"
+
+DAY_COL = "DAY"
+ROLLUP_COLUMN_TYPES = {DAY_COL: "DATE"}
+
+GRAINS = ("day", "week")
+
+# Events per row of a pushed-down pull (datasources.AggregateQuery groups);
+# frames of raw event rows have no such column and count 1 per row
+EVENTS_COL = "events"
+
+
+def event_weights(df: pd.DataFrame) -> pd.Series:
+    """df[EVENTS_COL] when the rows are pre-aggregated groups, else 1 per row."""
+    if EVENTS_COL in df.columns:
+        return df[EVENTS_COL].astype("int64")
+    return pd.Series(1, index=df.index, dtype="int64")
+
+
+def day_bucket(ts: pd.Series) -> pd.Series:
+    """UTC calendar day of each timestamp as 'YYYY-MM-DD' (NaT -> None)."""
+    ts = pd.to_datetime(ts, errors="coerce", utc=True)
+    out = ts.dt.strftime("%Y-%m-%d")
+    return out.where(ts.notna(), None)
+
+
+def _complete_days(df: pd.DataFrame, start_day: str, end_day: str) -> pd.DataFrame:
+    """Rows in [start_day, end_day): partial days never get written."""
+    return df.loc[df[DAY_COL].notna() & (df[DAY_COL] >= start_day) & (df[DAY_COL] < end_day)]
+
+
+def build_report_loads(df_reports: pd.DataFrame, start_day: str, end_day: str) -> pd.DataFrame:
+    """REPORT_PATH, DAY, LOADS from library load events or their pushed-down groups (id2 = report path)."""
+    d = pd.DataFrame(
+        {
+            "REPORT_PATH": df_reports["id2"],
+            DAY_COL: day_bucket(df_reports["logged_time"]),
+            "LOADS": event_weights(df_reports),
+        }
+    )
+    d = _complete_days(d, start_day, end_day)
+    return d.groupby(["REPORT_PATH", DAY_COL])["LOADS"].sum().reset_index()
+
+
+def build_platform_logins(df_logins: pd.DataFrame, start_day: str, end_day: str) -> pd.DataFrame:
+    """PLATFORM, DAY, LOGINS, UNIQUE_USERS from classified login events."""
+    d = pd.DataFrame(
+        {
+            "PLATFORM": df_logins["platform"],
+            DAY_COL: day_bucket(df_logins["logged_time"]),
+            "user_name": df_logins["user_name"],
+        }
+    )
+    d = _complete_days(d, start_day, end_day)
+    return (
+        d.groupby(["PLATFORM", DAY_COL])
+        .agg(LOGINS=("user_name", "size"), UNIQUE_USERS=("user_name", "nunique"))
+        .reset_index()
+    )
+
+
+def build_analyst_actions(daily: pd.DataFrame, users: pd.DataFrame, start_day: str, end_day: str) -> pd.DataFrame:
+    """
+    cost_center_name, DAY, ANALYST_ACTIONS, NON_ANALYST_ACTIONS, ACTIVE_USERS
+    from the per-(user, day) action rollup and the HR-matched users.
+    """
+    cc = users.drop_duplicates("user_name").set_index("user_name")["cost_center_name"]
+    d = pd.DataFrame(
+        {
+            "cost_center_name": daily["user_name"].map(cc),
+            DAY_COL: day_bucket(daily["action_day"]),
+            "analyst_cnt": daily["analyst_cnt"],
+            "non_analyst_cnt": daily["non_analyst_cnt"],
+        }
+    )
+    d = _complete_days(d.dropna(subset=["cost_center_name"]), start_day, end_day)
+    return (
+        d.groupby(["cost_center_name", DAY_COL])
+        .agg(
+            ANALYST_ACTIONS=("analyst_cnt", "sum"),
+            NON_ANALYST_ACTIONS=("non_analyst_cnt", "sum"),
+            ACTIVE_USERS=("analyst_cnt", "size"),  # one rollup row per user-day
+        )
+        .reset_index()
+    )
+
+
+def time_series(
+    df: pd.DataFrame,
+    value_cols: List[str],
+    grain: str,
+    start_day: str,
+    end_day: str,
+    by: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Chart-ready series from rollup rows: sums per day (or ISO week, Monday
+    start) over [start_day, end_day], zero-filled so every period is present
+    (per `by` series when given).
+    """
+    days = pd.date_range(start_day, end_day, freq="D")
+    periods = days if grain == "day" else pd.DatetimeIndex(days - pd.to_timedelta(days.dayofweek, unit="D")).unique()
+
+    d = df.copy()
+    d["period"] = pd.to_datetime(d[DAY_COL])
+    if grain == "week":
+        d["period"] = d["period"] - pd.to_timedelta(d["period"].dt.dayofweek, unit="D")
+
+    keys = ["period"] if by is None else [by, "period"]
+    sums = d.groupby(keys)[value_cols].sum()
+
+    if by is None:
+        full = sums.reindex(periods, fill_value=0)
+        full.index.name = "period"
+    else:
+        series = sorted(d[by].dropna().unique())
+        full = sums.reindex(pd.MultiIndex.from_product([series, periods], names=keys), fill_value=0)
+
+    out = full.reset_index()
+    out["period"] = out["period"].dt.strftime("%Y-%m-%d")
+    for col in value_cols:
+        out[col] = out[col].astype(np.int64)
+    return out.to_dict(orient="records")
@@ -0,0 +1,185 @@
+# ------------------------------------------------------------
+# Batch run report: per-stage wall time, rows in/out, RSS (spotfire.py)
+#
+#   run = RunReport("spotfire")
+#   with run.stage("users_pull") as st:
+#       users_df = getData(...)
+#       st.rows(out=len(users_df))
+#   run.write_json("run-report.json")
+#   run.write_openmetrics("spotfire.prom")   # node_exporter textfile format
+#
+# Peak RSS per stage: on Linux the process high-water mark (VmHWM) is reset
+# at stage start (/proc/self/clear_refs), so peak_rss_delta_mib is the stage's
+# own peak above the RSS it started with. Elsewhere it falls back to growth
+# of ru_maxrss (0 when an earlier stage peaked higher) - see "rss_method".
+#
+# No sibling imports (shared by the batch job and the benchmarks).
+# ------------------------------------------------------------
+
+import json
+import os
+import re
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+_MIB = 2**20
+
+
+def _read_status_kib(key: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            m = re.search(rf"^{key}:\s+(\d+) kB", f.read(), re.M)
+    except OSError:
+        return None
+    return int(m.group(1)) if m else None
+
+
+def _reset_hwm() -> bool:
+    """Reset VmHWM to the current RSS (Linux >= 4.0); False if not permitted."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    kib = _read_status_kib("VmRSS")
+    return kib * 1024 if kib is not None else None
+
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    rss_start_mib: Optional[float] = None
+    rss_end_mib: Optional[float] = None
+    peak_rss_delta_mib: Optional[float] = None
+    status: str = "ok"
+    counters: Dict[str, Any] = field(default_factory=dict)
+
+    def rows(self, in_: Optional[int] = None, out: Optional[int] = None, **counters: Any) -> None:
+        """Record row counts (and any extra counters, e.g. HR match counts)."""
+        if in_ is not None:
+            self.rows_in = int(in_)
+        if out is not None:
+            self.rows_out = int(out)
+        self.counters.update(counters)
+
+
+class RunReport:
+    """Ordered stage stats for one batch run (JSON + OpenMetrics output)."""
+
+    def __init__(self, job: str, echo: bool = True):
+        self.job = job
+        self.echo = echo
+        self.started = time.time()
+        self.stages: List[StageStats] = []
+        self.meta: Dict[str, Any] = {}
+        self.rss_method = "hwm_reset" if _reset_hwm() else ("maxrss_growth" if _maxrss_bytes() else "none")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """Time the block; a failing stage is recorded (status=error) and re-raised."""
+        st = StageStats(name)
+        rss0 = current_rss_bytes()
+        if self.rss_method == "hwm_reset":
+            _reset_hwm()
+        maxrss0 = _maxrss_bytes()
+        t0 = time.perf_counter()
+        try:
+            yield st
+        except BaseException:
+            st.status = "error"
+            raise
+        finally:
+            st.seconds = round(time.perf_counter() - t0, 4)
+            rss1 = current_rss_bytes()
+            if rss0 is not None:
+                st.rss_start_mib = round(rss0 / _MIB, 1)
+            if rss1 is not None:
+                st.rss_end_mib = round(rss1 / _MIB, 1)
+            if self.rss_method == "hwm_reset" and rss0 is not None:
+                hwm = _read_status_kib("VmHWM")
+                if hwm is not None:
+                    st.peak_rss_delta_mib = round(max(hwm * 1024 - rss0, 0) / _MIB, 1)
+            elif self.rss_method == "maxrss_growth" and maxrss0 is not None:
+                st.peak_rss_delta_mib = round(max(_maxrss_bytes() - maxrss0, 0) / _MIB, 1)
+            self.stages.append(st)
+            if self.echo:
+                print(self._line(st), flush=True)
+
+    @staticmethod
+    def _line(st: StageStats) -> str:
+        parts = [f"stage={st.name}", f"status={st.status}", f"seconds={st.seconds:.3f}"]
+        for key in ("rows_in", "rows_out", "peak_rss_delta_mib", "rss_end_mib"):
+            value = getattr(st, key)
+            if value is not None:
+                parts.append(f"{key}={value}")
+        parts += [f"{k}={v}" for k, v in st.counters.items()]
+        return " ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job": self.job,
+            "host": socket.gethostname(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "total_seconds": round(sum(st.seconds for st in self.stages), 4),
+            "status": "error" if any(st.status == "error" for st in self.stages) else "ok",
+            "rss_method": self.rss_method,
+            "meta": self.meta,
+            "stages": [asdict(st) for st in self.stages],
+        }
+
+    def write_json(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+    def openmetrics(self) -> str:
+        """Stage gauges in OpenMetrics text format (one series per stage)."""
+        prefix = re.sub(r"\W", "_", self.job)
+        gauges = [
+            ("stage_seconds", "Wall time of the stage", "seconds"),
+            ("stage_rows_in", "Rows entering the stage", "rows_in"),
+            ("stage_rows_out", "Rows produced by the stage", "rows_out"),
+            ("stage_peak_rss_delta_mib", "Peak RSS above the stage's starting RSS (MiB)", "peak_rss_delta_mib"),
+        ]
+        lines = []
+        for metric, help_text, attr in gauges:
+            lines += [f"# TYPE {prefix}_{metric} gauge", f"# HELP {prefix}_{metric} {help_text}."]
+            for st in self.stages:
+                value = getattr(st, attr)
+                if value is not None:
+                    lines.append(f'{prefix}_{metric}{{stage="{st.name}",status="{st.status}"}} {value}')
+        lines += [
+            f"# TYPE {prefix}_run_started_seconds gauge",
+            f"{prefix}_run_started_seconds {self.started:.0f}",
+            "# EOF",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str) -> str:
+        """Atomic write (temp + rename) so a textfile collector never reads half a file."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.openmetrics())
+        os.replace(tmp, path)
+        return path
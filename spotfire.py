@@ -1,29 +1,44 @@
 # ------------------------------------------------------------
-# Spotfire Analyst Utilization + Platform Usage (90-day window)
+# Spotfire Analyst Utilization + Platform Usage (7/30/60/90-day windows)
 # ------------------------------------------------------------
 
+import atexit
+import os
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
-import pytz
-from bigdataloader2 import getData
-import s2cloudapi.s3api as s3
+
+import analytics_cache
+import analyst_usage as au
+from datasources import Agg, AggregateQuery, get_datasources
+from identity import SYSTEM_ACCOUNTS
+from metric_windows import METRIC_WINDOWS
+from pg_loader import load_table, replace_days
+import rollups
+from run_report import RunReport
 
 # -----------------------------
 # CONFIG
 # -----------------------------
 ANALYST_THRESHOLD = 50  # percent threshold used in dashboard
 
-TZ_CDT = pytz.timezone("America/Chicago")
-TZ_UTC = pytz.UTC
+# Distinct counting: "exact" (nunique) or "hll" (mergeable per-day HyperLogLog sketches)
+DISTINCT_MODE = "exact"
+ACTION_SKETCH_PRECISION = 10  # 1 KiB per (action, day) sketch, ~3% error
+
+# HR merge worker processes (fork, sharded by email); 1 = serial. Only used
+# from identity.PARALLEL_MIN_ROWS users up (enterprise-wide runs)
+ENRICH_WORKERS = int(os.environ.get("SPOTFIRE_ENRICH_WORKERS", "1"))
 
-cutoff_dt = datetime.utcnow() - timedelta(days=90)
-cutoff_dt = cutoff_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-cutoff_str = cutoff_dt.strftime("%d-%b-%y %I.%M.%S.%f %p")
+# Aggregation pushdown: the action-log pulls come back as GROUP BY results
+# ((user, category, action, day) and (report, day) event counts) instead of
+# one row per event (datasources.AggregateQuery). Live runs need the Trino SQL
+# endpoint (SPOTFIRE_TRINO_HOST); without it the raw pulls are used
+AGG_PUSHDOWN = os.environ.get("SPOTFIRE_AGG_PUSHDOWN", "0") == "1"
 
-# Cloud vs Local Desktop IP mapping for auth_pro logins
-CLOUD_IPS = {"192.12.345.123", "192.12.345.456", "192.12.345.789"}
-LOCAL_IPS = {"105.987.65.432"}
+# Windows end at the start of today (UTC); the largest window bounds every pull
+run_day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+cutoff_dt = run_day - timedelta(days=max(METRIC_WINDOWS))
+cutoff_str = cutoff_dt.strftime(au.LAST_LOGIN_FORMAT)
 
 # Users to exclude from reporting
 USERNAME_EXCLUDES = [
@@ -31,114 +46,37 @@ USERNAME_EXCLUDES = [
     "user6", "user7", "user8", "user9", "user10",
 ]
 
-# Categories that you want to treat as "analyst-only" for this analysis
-ANALYST_CATEGORIES = {
-    "analysis_pro",
-    "data_connector_pro",
-    "info_link",
-}
+# Analyst categories, excluded categories/actions and platform IPs live in analyst_usage
+
+# Trino/S3/PostgreSQL, or fixtures + local dir + SQLite (SPOTFIRE_DATA_BACKEND=offline)
+sources = get_datasources()
+getData = sources.tables.get_data
+engine, schema = sources.engine, sources.schema
+if AGG_PUSHDOWN and not sources.tables.can_aggregate():
+    print("SPOTFIRE_AGG_PUSHDOWN=1 ignored: no Trino SQL endpoint (SPOTFIRE_TRINO_HOST), pulling raw rows")
+    AGG_PUSHDOWN = False
+
+# Per-stage time / rows / peak RSS; written at exit (also when a stage fails)
+RUN_REPORT_PATH = os.environ.get("SPOTFIRE_RUN_REPORT", "spotfire-run-report.json")
+RUN_METRICS_PATH = os.environ.get("SPOTFIRE_RUN_METRICS")  # optional OpenMetrics textfile
+run = RunReport("spotfire_batch")
+run.meta.update(
+    backend=sources.backend,
+    run_day=run_day.strftime("%Y-%m-%d"),
+    distinct_mode=DISTINCT_MODE,
+    enrich_workers=ENRICH_WORKERS,
+    agg_pushdown=AGG_PUSHDOWN,
+    analytics_dir=analytics_cache.ANALYTICS_DIR or None,
+)
 
-# Categories to exclude entirely (noise/system OR “available regardless of license” AND not useful for determining analyst need)
-EXCLUDE_CATEGORIES = [
-    # Generic/system noise
-    "admin",
-    "analysis_as",
-    "auth", "auth_as", "auth_pro", "auth_wp",
-    "automation_job_as", "automation_task_as",
-    "codetrust",
-    "dblogging",
-    "ems",
-    "monitoring", "monitoring_wp", "monitoring_as",
-    "routing_rules",
-    "scheduled_updates",
-
-    # Categories within license structure that you want to EXCLUDE from analysis
-    # (your stated intent: actions possible in both web + desktop regardless of license, or not meaningful for determining Analyst need)
-    "file_pro", "file_wp", "file_as",
-    "find_pro", "find_wp", "find_as",
-    "data_connector_as", "data_connector_wp",
-    "datasource_pro", "datasource_wp", "datasource_as",
-    "datafunction_pro", "datafunction_wp", "datafunction_as",
-    "library", "library_as", "library_wp", "library_pro",
-]
 
-# Actions to exclude entirely (common consumer interactions that muddy the “license-needed” signal)
-EXCLUDE_ACTIONS = [
-    "apply_bookmark",
-    "create_comment",
-    "export",
-    "modify_filter",
-    "reset_all_visible_filters",
-    "reset_filter",
-    "set_page",
-    "load_connection",
-    "load_source",
-]
+def _write_run_report() -> None:
+    print("Run report:", run.write_json(RUN_REPORT_PATH))
+    if RUN_METRICS_PATH:
+        run.write_openmetrics(RUN_METRICS_PATH)
 
-# Info_link exceptions: these do NOT require Analyst even though info_link is in ANALYST_CATEGORIES
-INFO_LINK_NON_ANALYST_ACTIONS = {"get_data", "load_il"}
 
-
-# -----------------------------
-# HELPERS
-# -----------------------------
-def utc_to_cdt(series: pd.Series) -> pd.Series:
-    """Convert UTC datetimes to America/Chicago and format as string."""
-    if series.dt.tz is None:
-        series = series.dt.tz_localize(TZ_UTC)
-    else:
-        series = series.dt.tz_convert(TZ_UTC)
-
-    return series.dt.tz_convert(TZ_CDT).dt.strftime("%Y-%m-%d %H:%M:%S")
-
-
-def categorize_title(title_val: str) -> str:
-    """
-    Map raw job titles into buckets:
-    - Leadership
-    - Engineer
-    - Tech
-    - Other
-    """
-    if not isinstance(title_val, str) or not title_val.strip():
-        return "Other"
-
-    t = title_val.lower()
-
-    leadership_keywords = ["manager", "vp", "director", "supervisor", "lead", "head"]
-    engineer_keywords = ["engineer", "eng", "developer", "devops", "architect", "scientist"]
-    tech_keywords = ["technician", "tech", "operator", "specialist", "associate", "maintenance"]
-
-    if any(k in t for k in leadership_keywords):
-        return "Leadership"
-    if any(k in t for k in engineer_keywords):
-        return "Engineer"
-    if any(k in t for k in tech_keywords):
-        return "Tech"
-    return "Other"
-
-
-def classify_pro_platform(ip: str) -> str:
-    """Classify auth_pro login machine IP as Cloud vs Local Desktop vs Other."""
-    if ip in CLOUD_IPS:
-        return "Cloud"
-    if ip in LOCAL_IPS:
-        return "Local Desktop"
-    return "Other"
-
-
-def normalize_username(u: str) -> str:
-    """
-    Normalize Spotfire username for nt_id matching.
-    Handles DOMAIN\\user formats too.
-    """
-    if not isinstance(u, str):
-        return ""
-    u = u.strip()
-    # take the tail if it's DOMAIN\user
-    if "\\" in u:
-        u = u.split("\\")[-1]
-    return u.strip().lower()
+atexit.register(_write_run_report)
 
 
 # ------------------------------------------------------------
@@ -153,348 +91,301 @@ params_login = {
     "user_name": USERNAME_EXCLUDES,
 }
 
-users_df = getData(
-    params=params_login,
-    custom_columns=user_columns,
-    custom_operators={"last_login": ">=", "user_name": "!"},
-)
-
-users_df["last_login"] = pd.to_datetime(
-    users_df["last_login"],
-    format="%d-%b-%y %I.%M.%S.%f %p",
-    utc=True,
-)
+with run.stage("users_pull") as st:
+    users_df = getData(
+        params=params_login,
+        custom_columns=user_columns,
+        custom_operators={"last_login": ">=", "user_name": "!"},
+    )
+    st.rows(out=len(users_df))
 
-users = users_df[["user_id", "user_name", "last_login", "email"]].copy()
+with run.stage("users_prepare") as st:
+    users = au.prepare_users(users_df)
+    st.rows(in_=len(users_df), out=len(users))
 
 
 # ------------------------------------------------------------
 # 3. LOAD ACTION LOG (ANALYST VS NON-ANALYST)
 # ------------------------------------------------------------
-# NOTE: We keep success=1 and remove excluded actions/categories to reduce noise.
-df_actions = getData(
-    params={
-        "data_type": "spotfire_if2sf_actionlog",
-        "MLR": "T",
-        "success": "1",
-        "log_category": EXCLUDE_CATEGORIES,
-        "log_action": EXCLUDE_ACTIONS,
-        "logged_time": cutoff_str,
-        "user_name": [
-            r"SPOTFIRESYSTEM\automationservices",
-            r"SPOTFIRESYSTEM\monitoring",
-            r"SPOTFIRESYSTEM\scheduledupdates",
-            r"SPOTFIREOAUTH2\a72082b286310fe3c8d48129c26b295f.oauth-clients.spotfire.tibco.com",
-        ],
-    },
-    custom_columns=["log_action", "log_category", "user_name", "logged_time"],
-    custom_operators={
-        "log_category": "!",
-        "log_action": "!",
-        "logged_time": ">=",
-        "user_name": "!",
-    },
-)
-
-# Ensure logged_time is datetime (UTC)
-# If your actionlog uses a different format, update the format string accordingly.
-df_actions["logged_time"] = pd.to_datetime(df_actions["logged_time"], utc=True, errors="coerce")
-
-# Flag analyst rows based on categories
-df_actions["is_analyst"] = df_actions["log_category"].isin(ANALYST_CATEGORIES)
-
-# Override: info_link actions that are NOT analyst-requiring
-mask_info_link_exceptions = (
-    (df_actions["log_category"] == "info_link") &
-    (df_actions["log_action"].isin(INFO_LINK_NON_ANALYST_ACTIONS))
-)
-df_actions.loc[mask_info_link_exceptions, "is_analyst"] = False
-
-# ---- Aggregate to per-user counts
-action_counts = (
-    df_actions.groupby("user_name")["is_analyst"]
-    .agg(
-        analyst_cnt=lambda s: int(s.sum()),
-        non_analyst_cnt=lambda s: int((~s).sum()),
-    )
-    .reset_index()
-)
-
-users = (
-    users.merge(action_counts, on="user_name", how="left")
-    .fillna({"analyst_cnt": 0, "non_analyst_cnt": 0})
-)
-
-# ---- Analyst actions per day (director request)
-# We compute: analyst_cnt / active_days_in_window
-# active_days_in_window = distinct days user had ANY included (post-exclusion) action rows
-df_actions["action_day"] = df_actions["logged_time"].dt.floor("D")
-
-user_active_days = (
-    df_actions.groupby("user_name")["action_day"]
-    .nunique()
-    .reset_index(name="ACTIVE_DAYS")
-)
-
-users = users.merge(user_active_days, on="user_name", how="left").fillna({"ACTIVE_DAYS": 0})
-users["ANALYST_ACTIONS_PER_DAY"] = np.where(
-    users["ACTIVE_DAYS"] == 0,
-    0,
-    np.round(users["analyst_cnt"] / users["ACTIVE_DAYS"], 4)
-)
+# NOTE: We keep success=1 and remove excluded actions/categories to reduce noise
+# (the category-/action-wide exclusions of au.ACTION_RULES, pushed down to getData).
+action_rule_params, action_rule_operators = au.ACTION_RULES.pushdown()
+actions_params = {
+    "data_type": "spotfire_if2sf_actionlog",
+    "MLR": "T",
+    "success": "1",
+    **action_rule_params,
+    "logged_time": cutoff_str,
+    "user_name": list(SYSTEM_ACCOUNTS),
+}
+actions_operators = {
+    **action_rule_operators,
+    "logged_time": ">=",
+    "user_name": "!",
+}
+with run.stage("actions_pull") as st:
+    if AGG_PUSHDOWN:
+        # One row per (user, category, action, day) with its event count
+        df_actions = sources.tables.aggregate(
+            AggregateQuery(
+                actions_params,
+                group_by=("user_name", "log_category", "log_action"),
+                aggs=(Agg(rollups.EVENTS_COL, "count"),),
+                operators=actions_operators,
+                days={"logged_time": "logged_time"},
+            )
+        )
+        st.rows(out=len(df_actions), events=int(df_actions[rollups.EVENTS_COL].sum()))
+    else:
+        df_actions = getData(
+            params=actions_params,
+            custom_columns=["log_action", "log_category", "user_name", "logged_time"],
+            custom_operators=actions_operators,
+        )
+        st.rows(out=len(df_actions))
+
+with run.stage("actions_classify") as st:
+    # Parse logged_time (UTC), flag analyst rows, bucket to action_day
+    df_actions = au.classify_actions(df_actions)
+
+    # Daily rollup: the ONLY pass over raw action rows -> one row per (user, day)
+    daily_rollup = au.daily_action_rollup(df_actions)
+    st.rows(in_=len(df_actions), out=len(daily_rollup))
+
+with run.stage("window_metrics") as st:
+    # Per-window counts, ANALYST_PCT and ANALYST_ACTIONS_PER_DAY (unsuffixed = DEFAULT_WINDOW)
+    users = au.add_window_metrics(users, daily_rollup, pd.Timestamp(run_day, tz="UTC"))
+    st.rows(in_=len(daily_rollup), out=len(users))
 
 # ------------------------------------------------------------
 # 4. MERGE HR DATA (EMAIL FIRST, THEN NT_ID FALLBACK, DROP NON-MATCHES)
 # ------------------------------------------------------------
 params_hr = {"data_type": "pageradm_employee_ghr", "MLR": "L"}
-user_data = getData(
-    params=params_hr,
-    custom_columns=["cost_center_name", "dept_name", "smtp", "title", "nt_id"],
-    custom_operators={"smtp": "notnull"},
-)
-
-# Normalize HR keys
-user_data["smtp"] = user_data["smtp"].astype(str).str.strip().str.lower()
-user_data["nt_id"] = user_data["nt_id"].astype(str).str.strip().str.lower()
-
-# Ensure unique nt_id to avoid multi-match explosions
-user_data = (
-    user_data.sort_values("nt_id")
-    .drop_duplicates(subset=["nt_id"], keep="last")
-)
-
-# Normalize users keys
-users["email_norm"] = users["email"].astype(str).str.strip().str.lower()
-users["user_name_norm"] = users["user_name"].apply(normalize_username)
-
-# 4a. Merge on email
-merge_email = users.merge(
-    user_data,
-    left_on="email_norm",
-    right_on="smtp",
-    how="left",
-    indicator=True,
-)
-
-matched_email = merge_email[merge_email["_merge"] == "both"].copy()
-unmatched_email = merge_email[merge_email["_merge"] == "left_only"].copy()
-
-# Clean unmatched to remove HR columns before second merge
-cols_to_remove = ["cost_center_name", "dept_name", "title", "smtp", "nt_id", "_merge"]
-unmatched_email.drop(columns=[c for c in cols_to_remove if c in unmatched_email.columns], inplace=True)
-
-# 4b. Merge remaining on nt_id
-merge_ntid = unmatched_email.merge(
-    user_data,
-    left_on="user_name_norm",
-    right_on="nt_id",
-    how="left",
-    indicator=True,
-)
-
-matched_ntid = merge_ntid[merge_ntid["_merge"] == "both"].copy()
-unmatched_final = merge_ntid[merge_ntid["_merge"] == "left_only"].copy()
-
-# Keep only matches; drop non-matches
-users = pd.concat(
-    [matched_email.drop(columns=["_merge"]), matched_ntid.drop(columns=["_merge"])],
-    ignore_index=True
-)
-
-# Cleanup helper columns
-users.drop(columns=["email_norm", "user_name_norm"], inplace=True, errors="ignore")
-
-print("Matched on email:", len(matched_email))
-print("Matched on nt_id:", len(matched_ntid))
-print("Dropped (no HR match):", len(unmatched_final))
+with run.stage("hr_pull") as st:
+    user_data = getData(
+        params=params_hr,
+        custom_columns=["cost_center_name", "dept_name", "smtp", "title", "nt_id"],
+        custom_operators={"smtp": "notnull"},
+    )
+    st.rows(out=len(user_data))
+
+with run.stage("hr_merge") as st:
+    users_in = len(users)
+    users, hr_matches = au.merge_hr(users, user_data, workers=ENRICH_WORKERS)
+    # matched_email / matched_nt_id / dropped replace the old progress prints
+    st.rows(
+        in_=users_in,
+        out=len(users),
+        matched_email=hr_matches["email"],
+        matched_nt_id=hr_matches["nt_id"],
+        dropped=hr_matches["dropped"],
+    )
 
 
 # ------------------------------------------------------------
 # 5. FINAL USER-LEVEL DATAFRAME
 # ------------------------------------------------------------
-users["LAST_ACTIVITY"] = utc_to_cdt(users["last_login"])
-
-total = users["analyst_cnt"] + users["non_analyst_cnt"]
-users["ANALYST_PCT"] = np.where(
-    total == 0, 0, np.round((users["analyst_cnt"] / total) * 100, 2)
-)
-
-users["ANALYST_USER_FLAG"] = users["ANALYST_PCT"] >= ANALYST_THRESHOLD
-users["ANALYST_THRESHOLD"] = ANALYST_THRESHOLD
-
-users["TITLE_CATEGORY"] = users["title"].apply(categorize_title)
-
-final_df = users.rename(
-    columns={
-        "user_name": "USER_NAME",
-        "email": "USER_EMAIL",
-        "analyst_cnt": "ANALYST_FUNCTIONS",
-        "non_analyst_cnt": "NON_ANALYST_FUNCTIONS",
-    }
-)[
-    [
-        "USER_NAME",
-        "USER_EMAIL",
-        "LAST_ACTIVITY",
-        "ANALYST_FUNCTIONS",
-        "NON_ANALYST_FUNCTIONS",
-        "ANALYST_PCT",
-        "ANALYST_USER_FLAG",
-        "ANALYST_THRESHOLD",
-        "ANALYST_ACTIONS_PER_DAY",
-        "ACTIVE_DAYS",
-        "cost_center_name",
-        "dept_name",
-        "title",
-        "TITLE_CATEGORY",
-    ]
-].sort_values("LAST_ACTIVITY", ascending=False)
+with run.stage("final_users") as st:
+    users = au.add_user_fields(users, ANALYST_THRESHOLD)
+    final_df = au.build_final_df(users)
+    st.rows(in_=len(users), out=len(final_df))
 
 
 # ------------------------------------------------------------
 # 6. TOP ANALYST FUNCTIONS (ACTION-LEVEL AGGREGATE)
 # ------------------------------------------------------------
-df_analyst_actions = df_actions[df_actions["is_analyst"]].copy()
-
-top_actions_df = (
-    df_analyst_actions.groupby(["log_action", "log_category"])
-    .agg(
-        TOTAL_USES=("log_action", "size"),
-        UNIQUE_USERS=("user_name", "nunique"),
-    )
-    .reset_index()
-    .sort_values("TOTAL_USES", ascending=False)
-    .rename(columns={"log_action": "LOG_ACTION", "log_category": "LOG_CATEGORY"})
-)
+with run.stage("top_actions") as st:
+    top_actions_df, action_day_sketches_df = au.top_analyst_actions(df_actions, DISTINCT_MODE, ACTION_SKETCH_PRECISION)
+    st.rows(in_=len(df_actions), out=len(top_actions_df))
 
 
 # ------------------------------------------------------------
 # 7. MOST VIEWED REPORTS
 # ------------------------------------------------------------
-df_reports = getData(
-    params={
-        "data_type": "spotfire_if2sf_actionlog",
-        "MLR": "T",
-        "log_category": "library%",
-        "log_action": ["load_content", "load"],
-        "logged_time": cutoff_str,
-        "user_name": [
-            r"SPOTFIRESYSTEM\automationservices",
-            r"SPOTFIRESYSTEM\monitoring",
-            r"SPOTFIRESYSTEM\scheduledupdates",
-            r"SPOTFIREOAUTH2\a72082b286310fe3c8d48129c26b295f.oauth-clients.spotfire.tibco.com",
-        ],
-    },
-    custom_columns=["id2", "log_action", "log_category", "logged_time"],
-    custom_operators={"log_category": "like", "user_name": "!", "logged_time": ">="},
-)
+reports_params = {
+    "data_type": "spotfire_if2sf_actionlog",
+    "MLR": "T",
+    "log_category": "library%",
+    "log_action": ["load_content", "load"],
+    "logged_time": cutoff_str,
+    "user_name": list(SYSTEM_ACCOUNTS),
+}
+reports_operators = {"log_category": "like", "user_name": "!", "logged_time": ">="}
+with run.stage("reports_pull") as st:
+    if AGG_PUSHDOWN:
+        # One row per (report, action, category, day) with its load count
+        df_reports = sources.tables.aggregate(
+            AggregateQuery(
+                reports_params,
+                group_by=("id2", "log_action", "log_category"),
+                aggs=(Agg(rollups.EVENTS_COL, "count"),),
+                operators=reports_operators,
+                days={"logged_time": "logged_time"},
+            )
+        )
+        st.rows(out=len(df_reports), events=int(df_reports[rollups.EVENTS_COL].sum()))
+    else:
+        df_reports = getData(
+            params=reports_params,
+            custom_columns=["id2", "log_action", "log_category", "logged_time"],
+            custom_operators=reports_operators,
+        )
+        st.rows(out=len(df_reports))
 
-df_report = (
-    df_reports.groupby("id2", as_index=False)
-    .agg(total_loads=("id2", "size"))
-    .sort_values("total_loads", ascending=False)
-    .rename(columns={"id2": "report_path"})
-    .reset_index(drop=True)
-)
+with run.stage("reports_aggregate") as st:
+    df_report = au.most_viewed_reports(df_reports)
+    st.rows(in_=len(df_reports), out=len(df_report))
 
 
 # ------------------------------------------------------------
 # 8. PLATFORM USAGE: WEB PLAYER vs CLOUD vs LOCAL DESKTOP
 # ------------------------------------------------------------
-ACTIVE_USERNAMES = set(users["user_name"].unique())
-
-# 8a. Web Player logins (auth_wp)
-df_wp_logins = getData(
-    params={
-        "data_type": "spotfire_if2sf_actionlog",
-        "MLR": "T",
-        "log_category": "auth_wp",
-        "log_action": "login",
-        "logged_time": cutoff_str,
-        "success": "1",
-        "user_name": [
-            r"SPOTFIRESYSTEM\automationservices",
-            r"SPOTFIRESYSTEM\monitoring",
-            r"SPOTFIRESYSTEM\scheduledupdates",
-            r"SPOTFIREOAUTH2\a72082b286310fe3c8d48129c26b295f.oauth-clients.spotfire.tibco.com",
-        ],
-    },
-    custom_columns=["user_name", "machine", "success"],
-    custom_operators={"logged_time": ">=", "user_name": "!"},
-)
-
-df_wp_logins = df_wp_logins[df_wp_logins["user_name"].isin(ACTIVE_USERNAMES)].copy()
-df_wp_logins["platform"] = "Web Player"
-
-# 8b. Desktop/Cloud logins (auth_pro)
-df_pro_logins = getData(
-    params={
-        "data_type": "spotfire_if2sf_actionlog",
-        "MLR": "T",
-        "log_category": "auth_pro",
-        "log_action": "login",
-        "logged_time": cutoff_str,
-        "success": "1",
-        "user_name": [
-            r"SPOTFIRESYSTEM\automationservices",
-            r"SPOTFIRESYSTEM\monitoring",
-            r"SPOTFIRESYSTEM\scheduledupdates",
-            r"SPOTFIREOAUTH2\a72082b286310fe3c8d48129c26b295f.oauth-clients.spotfire.tibco.com",
-        ],
-    },
-    custom_columns=["user_name", "machine", "success"],
-    custom_operators={"logged_time": ">=", "user_name": "!"},
-)
+with run.stage("logins_pull") as st:
+    # 8a. Web Player logins (auth_wp)
+    df_wp_logins = getData(
+        params={
+            "data_type": "spotfire_if2sf_actionlog",
+            "MLR": "T",
+            "log_category": "auth_wp",
+            "log_action": "login",
+            "logged_time": cutoff_str,
+            "success": "1",
+            "user_name": list(SYSTEM_ACCOUNTS),
+        },
+        custom_columns=["user_name", "machine", "success", "logged_time"],
+        custom_operators={"logged_time": ">=", "user_name": "!"},
+    )
 
-df_pro_logins = df_pro_logins[df_pro_logins["user_name"].isin(ACTIVE_USERNAMES)].copy()
-df_pro_logins["platform"] = df_pro_logins["machine"].astype(str).apply(classify_pro_platform)
+    # 8b. Desktop/Cloud logins (auth_pro)
+    df_pro_logins = getData(
+        params={
+            "data_type": "spotfire_if2sf_actionlog",
+            "MLR": "T",
+            "log_category": "auth_pro",
+            "log_action": "login",
+            "logged_time": cutoff_str,
+            "success": "1",
+            "user_name": list(SYSTEM_ACCOUNTS),
+        },
+        custom_columns=["user_name", "machine", "success", "logged_time"],
+        custom_operators={"logged_time": ">=", "user_name": "!"},
+    )
+    st.rows(out=len(df_wp_logins) + len(df_pro_logins))
 
-# 8c. Combine + count logins per platform (for chart: count of logins per platform)
-df_logins_all = pd.concat([df_wp_logins, df_pro_logins], ignore_index=True)
+# 8c. Keep HR-matched users, classify platform, count logins per platform (+ per user)
+with run.stage("platform_usage") as st:
+    df_logins_all, platform_summary_df, platform_usage_df = au.platform_usage(df_wp_logins, df_pro_logins, users)
+    st.rows(in_=len(df_wp_logins) + len(df_pro_logins), out=len(platform_usage_df))
 
-platform_summary_df = (
-    df_logins_all.groupby("platform")
-    .size()
-    .reset_index(name="LOGIN_COUNT")
-    .sort_values("LOGIN_COUNT", ascending=False)
-)
 
-# Optional detail: per user, per platform
-user_platform_logins = (
-    df_logins_all.groupby(["user_name", "platform"])
-    .size()
-    .reset_index(name="LOGIN_COUNT")
-)
+# ------------------------------------------------------------
+# 9. EXPORT ALL CSVs TO S3
+# ------------------------------------------------------------
+bucket = "spotfire-admin"
 
-# Join HR fields to per-user platform logins
-user_platform_logins = user_platform_logins.merge(
-    users[["user_name", "email", "cost_center_name", "dept_name", "title", "TITLE_CATEGORY"]],
-    on="user_name",
-    how="left",
-)
+def export_csv(df: pd.DataFrame, filename: str):
+    if sources.store.exists(bucket, filename):
+        sources.store.delete(bucket, filename)
+    path = sources.store.upload_csv(bucket, filename, df)
+    print("Uploaded:", path, "rows:", len(df))
+
+
+EXPORTS = [
+    (final_df, "analyst-functions-users.csv"),
+    (top_actions_df, "analyst-functions-top-actions.csv"),
+    (df_report, "top-viewed-reports.csv"),
+    (platform_usage_df, "spotfire-platform-logins-by-user.csv"),
+    (platform_summary_df, "spotfire-platform-logins-summary.csv"),
+]
 
-platform_usage_df = user_platform_logins.rename(
-    columns={"user_name": "USER_NAME", "email": "USER_EMAIL"}
-)
+with run.stage("s3_export") as st:
+    for df, filename in EXPORTS:
+        export_csv(df, filename)
+    st.rows(out=sum(len(df) for df, _ in EXPORTS), files=len(EXPORTS))
 
 
 # ------------------------------------------------------------
-# 9. EXPORT ALL CSVs TO S3
+# 10. LOAD OUTPUTS INTO POSTGRES (COPY -> staging -> atomic swap)
 # ------------------------------------------------------------
-bucket = "spotfire-admin"
+# Each load bumps dataset_versions.version; the API keys its caches on it.
+PG_TABLES = [
+    ("analyst_functions_users", final_df, ["cost_center_name"]),
+    ("analyst_functions_top_actions", top_actions_df, []),
+    ("top_viewed_reports", df_report, ["report_path"]),
+    ("spotfire_platform_logins_by_user", platform_usage_df, ["USER_NAME"]),
+    ("spotfire_platform_logins_summary", platform_summary_df, []),
+]
 
-def export_csv(df: pd.DataFrame, filename: str):
-    s3_path = f"s3://{bucket}/{filename}"
-    if s3.chk_file_exist(bucket, filename):
-        s3.delete_file(bucket=bucket, key=filename)
-    s3.upload_df_as_csv(bucket=bucket, dataframe=df, s3_path=s3_path)
-    print("Uploaded:", filename, "rows:", len(df))
+if DISTINCT_MODE == "hll":
+    PG_TABLES.append(("analyst_action_daily_user_sketches", action_day_sketches_df, ["ACTION_DAY"]))
 
+with run.stage("pg_load") as st:
+    for table, df, indexes in PG_TABLES:
+        version = load_table(engine, schema, table, df, indexes=indexes)
+        print("Loaded:", f"{schema}.{table}", "rows:", len(df), "version:", version)
+    st.rows(out=sum(len(df) for _, df, _ in PG_TABLES), tables=len(PG_TABLES))
 
-export_csv(final_df, "analyst-functions-users.csv")
-export_csv(top_actions_df, "analyst-functions-top-actions.csv")
-export_csv(df_report, "top-viewed-reports.csv")
-export_csv(platform_usage_df, "spotfire-platform-logins-by-user.csv")
-export_csv(platform_summary_df, "spotfire-platform-logins-summary.csv")
 
-print("Done.")
\ No newline at end of file
+# ------------------------------------------------------------
+# 11. DAILY USAGE ROLLUPS (incremental day replacement)
+# ------------------------------------------------------------
+# Only complete UTC days in [cutoff, run_day) are written; each run deletes and
+# re-inserts exactly that range, so history older than the pull is kept and
+# late-arriving events inside it are picked up on the next run.
+rollup_start = cutoff_dt.strftime("%Y-%m-%d")
+rollup_end = run_day.strftime("%Y-%m-%d")
+
+with run.stage("rollups") as st:
+    ROLLUP_TABLES = [
+        (rollups.REPORT_LOADS_TABLE, rollups.build_report_loads(df_reports, rollup_start, rollup_end), ["REPORT_PATH"]),
+        (rollups.PLATFORM_LOGINS_TABLE, rollups.build_platform_logins(df_logins_all, rollup_start, rollup_end), []),
+        (
+            rollups.ANALYST_ACTIONS_TABLE,
+            rollups.build_analyst_actions(daily_rollup, users, rollup_start, rollup_end),
+            ["cost_center_name"],
+        ),
+    ]
+
+    for table, df, indexes in ROLLUP_TABLES:
+        version = replace_days(
+            engine,
+            schema,
+            table,
+            df,
+            rollups.DAY_COL,
+            rollup_start,
+            rollup_end,
+            indexes=indexes,
+            column_types=rollups.ROLLUP_COLUMN_TYPES,
+        )
+        print("Rolled up:", f"{schema}.{table}", "days:", f"{rollup_start}..{rollup_end}", "rows:", len(df), "version:", version)
+    st.rows(out=sum(len(df) for _, df, _ in ROLLUP_TABLES), tables=len(ROLLUP_TABLES))
+
+
+# ------------------------------------------------------------
+# 12. ANALYTICS CACHE (Parquet for ad-hoc admin SQL: analytics_cache.py query "...")
+# ------------------------------------------------------------
+# Only with SPOTFIRE_ANALYTICS_DIR set; same complete-day range as the rollups.
+if analytics_cache.ANALYTICS_DIR:
+    with run.stage("analytics_cache") as st:
+        if not analytics_cache.parquet_available():
+            print("SPOTFIRE_ANALYTICS_DIR is set but pyarrow is not installed; analytics cache skipped")
+        else:
+            actions_out = df_actions[["user_name", "log_category", "log_action", "logged_time", "is_analyst"]].assign(
+                **{rollups.EVENTS_COL: rollups.event_weights(df_actions)}
+            )
+            logins_out = df_logins_all[["user_name", "platform", "machine", "logged_time"]]
+            action_days = analytics_cache.write_days(
+                actions_out, analytics_cache.ANALYTICS_DIR, "actions", "logged_time", rollup_start, rollup_end
+            )
+            login_days = analytics_cache.write_days(
+                logins_out, analytics_cache.ANALYTICS_DIR, "logins", "logged_time", rollup_start, rollup_end
+            )
+            analytics_cache.write_snapshot(users, analytics_cache.ANALYTICS_DIR, "users")
+            st.rows(
+                out=sum(action_days.values()) + sum(login_days.values()) + len(users),
+                days=len(action_days),
+            )
+            print("Analytics cache:", analytics_cache.ANALYTICS_DIR, "days:", f"{rollup_start}..{rollup_end}")
+
+print("Done.")
@@ -0,0 +1,61 @@
+# ------------------------------------------------------------
+# Test setup
+#
+# - Flat modules (identity, analyst_usage, rollups, ...) import like spotfire.py
+#   does: the repo root goes on sys.path.
+# - The API modules use relative imports, so the repo directory is also loaded
+#   as a package (PKG) under a parent package rooted at its parent directory.
+#   total_views additionally needs the app's `models` package next to this
+#   directory (..models.licenseReduction); its tests skip without it.
+# - Everything runs on the offline backend (fixtures + SQLite) in a temp dir.
+# ------------------------------------------------------------
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+PARENT = "spotfire_parent"
+PKG = f"{PARENT}.api"
+
+FIXTURES_DIR = tempfile.mkdtemp(prefix="spotfire-tests-")
+os.environ["SPOTFIRE_DATA_BACKEND"] = "offline"
+os.environ["SPOTFIRE_FIXTURES_DIR"] = FIXTURES_DIR
+os.environ["SPOTFIRE_IDENTITY_DB"] = os.path.join(FIXTURES_DIR, "identity.sqlite3")
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+def _package(name: str, location: Path) -> None:
+    spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+    spec.submodule_search_locations = [str(location)]
+    sys.modules[name] = importlib.util.module_from_spec(spec)
+
+
+_package(PARENT, ROOT.parent)
+_package(PKG, ROOT)
+
+
+def api_module(name: str):
+    """A repo module imported as part of the API package (relative imports resolved)."""
+    return importlib.import_module(f"{PKG}.{name}")
+
+
+@pytest.fixture(scope="session")
+def total_views():
+    try:
+        return api_module("total_views")
+    except ImportError as e:
+        pytest.skip(f"total_views needs the app package around it: {e}")
+
+
+@pytest.fixture(scope="session")
+def fixtures_dir() -> str:
+    return FIXTURES_DIR
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+import datasources
+from datasources import Agg, AggregateQuery, FixtureSource, RecordingSource, TrinoSource
+
+EVENTS = pd.DataFrame(
+    {
+        "user_name": ["ann", "ann", "bob", "svc", None],
+        "success": ["1", "1", "1", "0", "1"],
+        "logged_time": ["2026-10-01 08:00:00", "2026-10-01 09:00:00", "2026-10-02 10:00:00", None, "2026-10-02"],
+    }
+)
+
+
+def _query(**params) -> AggregateQuery:
+    return AggregateQuery(
+        {"data_type": "events", **params},
+        group_by=("user_name",),
+        aggs=(Agg("events", "count"),),
+        days={"logged_time": "logged_time"},
+    )
+
+
+def test_live_pushdown_needs_the_trino_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(datasources, "TRINO_HOST", "")
+    live = TrinoSource()
+    assert not live.can_aggregate()
+    assert not RecordingSource(live, str(tmp_path)).can_aggregate()
+    with pytest.raises(RuntimeError, match="SPOTFIRE_TRINO_HOST"):
+        live.aggregate(_query())
+
+
+def test_fixture_aggregate_groups_in_sqlite(tmp_path):
+    EVENTS.to_csv(tmp_path / "events.csv", index=False)
+    source = FixtureSource(str(tmp_path))
+    assert source.can_aggregate()
+
+    out = source.aggregate(_query(success="1"))
+    assert out["user_name"].isna().sum() == 1  # missing keys form a group, like SQL
+    out = out.dropna(subset=["user_name"])
+    got = {(u, str(d.date())): n for u, d, n in out[["user_name", "logged_time", "events"]].itertuples(index=False)}
+    assert got == {("ann", "2026-10-01"): 2, ("bob", "2026-10-02"): 1}
+
+
+def test_filter_values_keep_their_types():
+    query = AggregateQuery(
+        {"data_type": "events", "success": 1, "score": [0.5, 2], "user_name": ["svc", 7], "log_category": "info%"},
+        group_by=("user_name",),
+        aggs=(Agg("events", "count"),),
+        operators={"user_name": "!", "log_category": "like"},
+    )
+    _, args = datasources.aggregate_sql(query, "events", "trino")
+    assert args == [1, 0.5, 2, "svc", 7, "info%"]
+    assert [type(a) for a in args] == [int, float, int, str, int, str]
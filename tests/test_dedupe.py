@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from bench_dedupe import sort_dedupe, synthetic_accounts
+from identity import DEDUPE_STRATEGIES, dedupe_accounts, dedupe_key
+
+
+def _by_user(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values("USER_NAME").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("n", [2_000, 20_000])
+def test_email_dedupe_matches_sort_based_dedupe(n):
+    df = synthetic_accounts(n, seed=n)
+    pd.testing.assert_frame_equal(_by_user(dedupe_accounts(df, strategy="email")), _by_user(sort_dedupe(df)))
+
+
+def test_rank_ties_break_on_user_name():
+    df = pd.DataFrame(
+        {
+            "USER_NAME": ["b", "a", "c", None],
+            "USER_EMAIL": ["x@samsung.com", "X@samsung.com ", "x@samsung.com", "x@samsung.com"],
+            "LAST_ACTIVITY": ["2026-01-01"] * 4,
+            "ANALYST_ACTIONS_PER_DAY": [1.0] * 4,
+            "recommendedAction": ["Analyst"] * 4,
+        }
+    )
+    out = dedupe_accounts(df)
+    assert list(out["USER_NAME"]) == ["a"]
+    pd.testing.assert_frame_equal(_by_user(out), _by_user(sort_dedupe(df)))
+
+
+def test_rows_without_email_are_kept():
+    df = synthetic_accounts(500).assign(USER_EMAIL=None)
+    assert len(dedupe_accounts(df)) == 500
+
+
+def test_strategies_group_partner_addresses():
+    emails = pd.Series(["John.Doe@partner.samsung.com", "john.doe@samsung.com", "john.doe@gmail.com", None])
+    assert list(dedupe_key(emails, "email")) == [
+        "john.doe@partner.samsung.com",
+        "john.doe@samsung.com",
+        "john.doe@gmail.com",
+        None,
+    ]
+    assert list(dedupe_key(emails, "samsung")) == ["john.doe@samsung.com"] * 2 + ["john.doe@gmail.com", None]
+    assert list(dedupe_key(emails, "localpart")) == ["john.doe"] * 3 + [None]
+
+
+@pytest.mark.parametrize("strategy", DEDUPE_STRATEGIES)
+def test_one_row_per_identity(strategy):
+    df = synthetic_accounts(5_000)
+    out = dedupe_accounts(df, strategy=strategy)
+    keys = dedupe_key(out["USER_EMAIL"], strategy).dropna()
+    assert keys.is_unique
+    assert out["USER_NAME"].is_unique
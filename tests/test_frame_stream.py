@@ -0,0 +1,102 @@
+import asyncio
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import api_module
+
+frame_stream = api_module("frame_stream")
+
+
+def _records(df: pd.DataFrame):
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _body(df: pd.DataFrame, fmt: str, positions=None) -> bytes:
+    positions = np.arange(len(df)) if positions is None else positions
+    response = frame_stream.stream_rows(df, positions, fmt, _records, filename="rows")
+    assert response.headers["content-disposition"] == f'attachment; filename="rows.{fmt}"'
+
+    async def collect() -> bytes:
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def frame(monkeypatch):
+    monkeypatch.setattr(frame_stream, "STREAM_CHUNK_ROWS", 3)
+    return pd.DataFrame(
+        {
+            "user": [f"u{i}" for i in range(8)],
+            "views": np.arange(8, dtype="int64"),
+            "pct": np.linspace(0, 1, 8),
+            "analyst": [True, False] * 4,
+        }
+    )
+
+
+def test_ndjson(frame):
+    lines = _body(frame, "ndjson").decode().splitlines()
+    assert [json.loads(line) for line in lines] == _records(frame)
+
+
+def test_csv_has_one_header(frame):
+    text = _body(frame, "csv").decode()
+    assert text.count("user,views,pct,analyst") == 1
+    pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(text)), frame)
+
+
+def test_arrow(frame):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(_body(frame, "arrow")).read_all()
+    pd.testing.assert_frame_equal(table.to_pandas(), frame)
+
+
+def test_positions_select_and_order_rows(frame):
+    lines = _body(frame, "ndjson", positions=np.array([5, 0, 7])).decode().splitlines()
+    assert [json.loads(line)["user"] for line in lines] == ["u5", "u0", "u7"]
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv", "arrow"])
+def test_empty_result(frame, fmt):
+    if fmt == "arrow":
+        pytest.importorskip("pyarrow")
+    assert isinstance(_body(frame.iloc[:0], fmt), bytes)
+
+
+def test_unknown_format(frame):
+    with pytest.raises(ValueError):
+        frame_stream.stream_rows(frame, np.arange(2), "xml", _records)
+
+
+def test_arrow_schema_covers_the_whole_frame(frame):
+    pa = pytest.importorskip("pyarrow")
+    # Null through the first chunk, then floats; ints that later turn NaN / fractional
+    frame["late"] = [None] * 4 + [0.5, 1.5, None, 2.5]
+    frame["mixed"] = pd.Series([1, 2, 3, 4, None, 5.5, 6, 7], dtype=object)
+    table = pa.ipc.open_stream(_body(frame, "arrow")).read_all()
+    assert table.schema.field("late").type == pa.float64()
+    assert table.schema.field("mixed").type == pa.float64()
+    assert table.column("late").to_pylist() == [None] * 4 + [0.5, 1.5, None, 2.5]
+    assert table.column("mixed").to_pylist() == [1, 2, 3, 4, None, 5.5, 6, 7]
+
+
+def test_arrow_schema_follows_renamed_records(frame):
+    pa = pytest.importorskip("pyarrow")
+    frame["late"] = [None] * 6 + ["x", "y"]
+
+    def to_ui(df):
+        return [{"name": r["user"], "lateValue": r["late"]} for r in _records(df)]
+
+    response = frame_stream.stream_rows(frame, np.arange(len(frame)), "arrow", to_ui)
+
+    async def collect() -> bytes:
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    table = pa.ipc.open_stream(asyncio.run(collect())).read_all()
+    assert table.column_names == ["name", "lateValue"]
+    assert table.column("lateValue").to_pylist() == [None] * 6 + ["x", "y"]
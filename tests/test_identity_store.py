@@ -0,0 +1,93 @@
+import pandas as pd
+
+from conftest import api_module
+
+identity_store = api_module("identity_store")
+IDENTITY_COLS = identity_store.IDENTITY_COLS
+
+
+def _hr(rows):
+    cols = ["smtp", "bname", "nt_id", "gad_id", "full_name", "status_name", "cost_center_name", "dept_name", "title"]
+    return pd.DataFrame(rows, columns=cols)
+
+
+PRIMARY = _hr(
+    [
+        ["ann@samsung.com", "ann", "ann", "g1", "Ann A", "Active", "CC1", "D1", "Analyst"],
+        ["bob@samsung.com", "bob", "bob", "g2", "Bob B", "Active", "CC2", "D2", "Engineer"],
+    ]
+)
+FALLBACK = pd.DataFrame(columns=["smtp", "full_name", "status_name", "cost_center_name", "dept_name", "title"])
+
+
+def _identity(user, email, name, cc):
+    return {
+        "user_name": user,
+        "input_email": email,
+        "email_alt": email,
+        "user_name_norm": user,
+        "email_local": email.split("@")[0],
+        "FULL_NAME": name,
+        "STATUS_NAME": "Active",
+        "cost_center_name": cc,
+        "dept_name": None,
+        "title": None,
+    }
+
+
+def _resolved():
+    return pd.DataFrame(
+        [_identity("ann", "ann@samsung.com", "Ann A", "CC1"), _identity("bob", "bob@samsung.com", "Bob B", "CC2")]
+    )
+
+
+def _keys(*pairs):
+    return pd.DataFrame(pairs, columns=["user_name", "input_email"])
+
+
+def test_round_trip_and_negative_cache(tmp_path):
+    store = identity_store.IdentityStore(str(tmp_path / "ids.sqlite3"))
+    version = store.sync_hr(PRIMARY, FALLBACK)
+    assert store.hr_version() == version
+    assert store.sync_hr(PRIMARY, FALLBACK) == version  # unchanged snapshot: no-op
+
+    assert store.upsert(_resolved(), version) == 2
+    found = store.lookup(_keys(("ann", "ann@samsung.com"), ("bob", "bob@samsung.com"), ("zed", "")))
+    assert sorted(found["FULL_NAME"]) == ["Ann A", "Bob B"]
+    assert list(found.columns) == ["user_name", "input_email"] + IDENTITY_COLS
+
+    ghost = pd.DataFrame([_identity("ghost", "ghost@samsung.com", "Possibly Terminated", None)])
+    store.record_unresolved(ghost, version)
+    store.record_unresolved(ghost, version)
+    assert store.unresolved_size() == 1
+    assert len(store.lookup_unresolved(_keys(("ghost", "ghost@samsung.com")), version)) == 1
+    assert store.lookup_unresolved(_keys(("ghost", "ghost@samsung.com")), "other-version").empty
+
+    # Resolving a negative removes it from the negative cache
+    store.upsert(pd.DataFrame([_identity("ghost", "ghost@samsung.com", "Ghost G", "CC3")]), version)
+    assert store.unresolved_size() == 0
+    assert store.size() == 3
+
+
+def test_hr_change_invalidates_only_touched_identities(tmp_path):
+    store = identity_store.IdentityStore(str(tmp_path / "ids.sqlite3"))
+    version = store.sync_hr(PRIMARY, FALLBACK)
+    store.upsert(_resolved(), version)
+    ghost = pd.DataFrame([_identity("ghost", "ghost@samsung.com", "Possibly Terminated", None)])
+    store.record_unresolved(ghost, version)
+
+    moved = PRIMARY.copy()
+    moved.loc[moved["smtp"] == "bob@samsung.com", "cost_center_name"] = "CC9"
+    new_version = store.sync_hr(moved, FALLBACK)
+
+    assert new_version != version
+    found = store.lookup(_keys(("ann", "ann@samsung.com"), ("bob", "bob@samsung.com")))
+    assert list(found["user_name"]) == ["ann"]
+    # Untouched negatives carry over to the new HR version
+    assert len(store.lookup_unresolved(_keys(("ghost", "ghost@samsung.com")), new_version)) == 1
+
+
+def test_null_like_hr_keys_are_not_stored():
+    hr = _hr([["NULL", "<NA>", " ", None, "X", "Active", "CC1", "D1", "T"]])
+    keys = identity_store.hr_key_frame(hr, FALLBACK)
+    assert keys.empty
@@ -0,0 +1,105 @@
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import api_module
+
+pg_loader = api_module("pg_loader")
+
+def _hr(people: int) -> pd.DataFrame:
+    ids = np.arange(people)
+    return pd.DataFrame(
+        {
+            "full_name": [f"Person {i}" for i in ids],
+            "smtp": [f"p{i}@samsung.com" for i in ids],
+            "status_name": np.where(ids % 7 == 0, "Terminated", "Active"),
+            "bname": [f"p{i}" for i in ids],
+            "nt_id": [f"p{i}" for i in ids],
+            "gad_id": [f"g{i}" for i in ids],
+            "cost_center_name": [f"CC{i % 4}" for i in ids],
+            "dept_name": [f"D{i % 3}" for i in ids],
+            "title": np.where(ids % 2 == 0, "Data Analyst", "Engineer"),
+        }
+    )
+
+
+def _license_rows(total_views, accounts: np.ndarray, seed: int) -> pd.DataFrame:
+    """One row per account; accounts 0..n map onto fewer people (duplicate accounts per email)."""
+    rng = np.random.default_rng(seed)
+    n = len(accounts)
+    df = pd.DataFrame({c: rng.integers(0, 50, size=n).astype(float) for c in total_views.LICENSE_COLS})
+    df["USER_NAME"] = [f"DOMAIN\\acct{a}" for a in accounts]
+    df["USER_EMAIL"] = [f"P{a % 45}@samsung.com" if a % 11 else None for a in accounts]
+    df["LAST_ACTIVITY"] = pd.Timestamp("2026-09-01") + pd.to_timedelta(rng.integers(0, 40, size=n), unit="D")
+    df["LAST_ACTIVITY"] = df["LAST_ACTIVITY"].dt.strftime("%Y-%m-%d")
+    df["ANALYST_ACTIONS_PER_DAY"] = np.round(rng.exponential(1.0, size=n), 4)
+    df["ANALYST_USER_FLAG"] = df["ANALYST_ACTIONS_PER_DAY"] >= 1
+    return df
+
+
+def _load(total_views, df: pd.DataFrame) -> None:
+    pg_loader.load_table(total_views.engine, total_views.schema, total_views.LICENSE_DATASET, df)
+
+
+def _refresh(total_views):
+    return asyncio.run(total_views._refresh_license_snapshot())
+
+
+def _sorted(final: pd.DataFrame) -> pd.DataFrame:
+    """Row/column order and null spelling (NaN vs None) are not part of the snapshot contract."""
+    final = final.sort_index().reindex(columns=sorted(final.columns)).astype(object)
+    return final.where(final.notna(), None)
+
+
+@pytest.fixture
+def license_tables(total_views, fixtures_dir, monkeypatch):
+    hr = _hr(60)
+    hr.to_csv(os.path.join(fixtures_dir, "pageradm_employee_ghr.csv"), index=False)
+    hr.iloc[:0].drop(columns=["bname", "nt_id", "gad_id"]).to_csv(
+        os.path.join(fixtures_dir, "dss_employee_ghr.csv"), index=False
+    )
+    monkeypatch.setitem(total_views._LICENSE_STATE, "snapshot", None)
+    return hr
+
+
+def test_delta_refresh_matches_full_rebuild(total_views, license_tables, monkeypatch):
+    before = _license_rows(total_views, np.arange(80), seed=1)
+    _load(total_views, before)
+    first = _refresh(total_views)
+
+    # Next load: 10 accounts gone, 15 new (some join existing identity groups), 5 changed
+    after = pd.concat(
+        [before.iloc[10:], _license_rows(total_views, np.arange(80, 95), seed=2)], ignore_index=True
+    )
+    after.loc[after.index[:5], "ANALYST_ACTIONS_PER_DAY"] += 3.0
+    _load(total_views, after)
+
+    enriched_rows = []
+    resolve = total_views.resolve_identities
+
+    def counting_resolve(rows, **kwargs):
+        enriched_rows.append(len(rows))
+        return resolve(rows, **kwargs)
+
+    monkeypatch.setattr(total_views, "resolve_identities", counting_resolve)
+    delta = _refresh(total_views)
+    assert 0 < sum(enriched_rows) < len(after)  # patched, not rebuilt
+    assert delta.dataset_version != first.dataset_version
+
+    monkeypatch.setitem(total_views._LICENSE_STATE, "snapshot", None)
+    full = _refresh(total_views)
+
+    pd.testing.assert_frame_equal(_sorted(delta.final), _sorted(full.final))
+    assert {k: set(v) for k, v in delta.cc_index.items() if len(v)} == {
+        k: set(v) for k, v in full.cc_index.items() if len(v)
+    }
+    assert delta.summary == full.summary
+
+
+def test_unchanged_dataset_reuses_snapshot(total_views, license_tables):
+    _load(total_views, _license_rows(total_views, np.arange(30), seed=3))
+    first = _refresh(total_views)
+    assert _refresh(total_views) is first
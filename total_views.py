@@ -1,140 +1,16 @@
-def _dedupe_license_users_by_email_prefer_analyst(df_in: pd.DataFrame) -> pd.DataFrame:
-    """
-    De-dupe duplicate Spotfire accounts that represent the same person.
-
-    Identity grouping:
-    - If USER_EMAIL exists: group by email local-part (text before '@') LOWERCASED.
-      This makes these group together:
-        john.doe@samsung.com
-        john.doe@partner.samsung.com
-    - If USER_EMAIL missing/blank: do not de-dupe those rows.
-
-    Winner selection per identity:
-    - If ANY row in the group has recommendedAction == "Analyst", keep an Analyst row.
-    - Else keep the row with the most recent LAST_ACTIVITY.
-    - Tie-breakers: LAST_ACTIVITY desc -> ANALYST_ACTIONS_PER_DAY desc -> USER_NAME asc
-
-    Canonical email output:
-    - After selecting the winning row, force USER_EMAIL to be the @samsung.com email
-      for that identity if we can construct/detect it.
-      * If the group contains an @samsung.com email, use that exact value.
-      * Else, construct f"{localpart}@samsung.com".
-    """
-    if df_in is None or df_in.empty:
-        return df_in
-
-    df = df_in.copy()
-
-    if "USER_EMAIL" not in df.columns:
-        return df
-
-    # Normalize email
-    df["USER_EMAIL"] = (
-        df["USER_EMAIL"]
-        .where(df["USER_EMAIL"].notna(), None)
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace({"nan": None, "": None})
-    )
-
-    has_email = df["USER_EMAIL"].notna() & (df["USER_EMAIL"].astype(str).str.strip() != "")
-    if not has_email.any():
-        return df
-
-    # Ensure fields exist
-    if "recommendedAction" not in df.columns:
-        df["recommendedAction"] = None
-    if "ANALYST_ACTIONS_PER_DAY" in df.columns:
-        df["ANALYST_ACTIONS_PER_DAY"] = pd.to_numeric(df["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0)
-    else:
-        df["ANALYST_ACTIONS_PER_DAY"] = 0
-
-    # Parse LAST_ACTIVITY for ordering
-    if "LAST_ACTIVITY" in df.columns:
-        df["_LAST_ACTIVITY_DT"] = pd.to_datetime(df["LAST_ACTIVITY"], errors="coerce", utc=True)
-    else:
-        df["_LAST_ACTIVITY_DT"] = pd.NaT
-
-    # recommendedAction flag
-    ra = df["recommendedAction"].astype(str).str.strip().str.lower()
-    df["_IS_ANALYST"] = (ra == "analyst").astype(int)
-
-    # Build identity key from email local-part (before @)
-    # - This groups samsung + partner accounts together
-    df["_EMAIL_LOCALPART"] = df["USER_EMAIL"].apply(_email_localpart)
-    df["_EMAIL_LOCALPART"] = (
-        df["_EMAIL_LOCALPART"]
-        .where(df["_EMAIL_LOCALPART"].notna(), None)
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace({"nan": None, "": None})
-    )
-
-    # Safety: if localpart couldn't be derived, treat as no-email (don't dedupe)
-    has_localpart = has_email & df["_EMAIL_LOCALPART"].notna() & (df["_EMAIL_LOCALPART"].astype(str).str.strip() != "")
-
-    # Winner sort order
-    if "USER_NAME" not in df.columns:
-        df["USER_NAME"] = None
-
-    df_sorted = df.sort_values(
-        by=["_IS_ANALYST", "_LAST_ACTIVITY_DT", "ANALYST_ACTIONS_PER_DAY", "USER_NAME"],
-        ascending=[False, False, False, True],
-        na_position="last",
-    )
-
-    # Keep one per identity key
-    kept_ident = df_sorted.loc[has_localpart].drop_duplicates(subset=["_EMAIL_LOCALPART"], keep="first").copy()
-
-    # Force canonical email: prefer an actual @samsung.com seen in the group; else construct localpart@samsung.com
-    # Build a map from localpart -> samsung email (if present)
-    pool = df_sorted.loc[has_localpart, ["_EMAIL_LOCALPART", "USER_EMAIL"]].copy()
-    pool["IS_SAMSUNG"] = pool["USER_EMAIL"].astype(str).str.endswith("@samsung.com")
-    pool_samsung = pool.loc[pool["IS_SAMSUNG"]].dropna(subset=["_EMAIL_LOCALPART", "USER_EMAIL"]).copy()
-
-    local_to_samsung = {}
-    if not pool_samsung.empty:
-        # If multiple @samsung.com variants somehow exist, take the first one (they should be identical)
-        local_to_samsung = (
-            pool_samsung.drop_duplicates(subset=["_EMAIL_LOCALPART"])
-            .set_index("_EMAIL_LOCALPART")["USER_EMAIL"]
-            .to_dict()
-        )
-
-    def canonical_email(localpart: Optional[str]) -> Optional[str]:
-        if not localpart:
-            return None
-        lp = str(localpart).strip().lower()
-        if not lp:
-            return None
-        # Prefer known @samsung.com in the group
-        if lp in local_to_samsung:
-            return local_to_samsung[lp]
-        # Otherwise construct
-        return f"{lp}@samsung.com"
-
-    kept_ident["USER_EMAIL"] = kept_ident["_EMAIL_LOCALPART"].apply(canonical_email)
-
-    # Keep all rows that we did NOT dedupe:
-    # - missing/blank email
-    # - missing localpart (should be rare)
-    kept_other = df_sorted.loc[~has_localpart].copy()
-
-    out = pd.concat([kept_ident, kept_other], ignore_index=True)
-
-    # Cleanup helper cols
-    out.drop(columns=["_LAST_ACTIVITY_DT", "_IS_ANALYST", "_EMAIL_LOCALPART"], inplace=True, errors="ignore")
-
-    return out
-
-
-from fastapi import APIRouter, Query, HTTPException
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+import asyncio
+import io
+import logging
+import math
+import re
+import time
 import pandas as pd
 
-from bigdataloader2 import getData
 import numpy as np
 from datetime import datetime, timedelta
 import pytz
@@ -142,19 +18,100 @@ import pytz
 from aiocache import cached  # type: ignore
 from aiocache.serializers import PickleSerializer  # type: ignore
 
-from databases.psql import engine, schema
-
 from ..models.licenseReduction import ViewedReportsRequest
-
-router = APIRouter()
+from . import hll
+from .api_metrics import METRICS, PROFILES, MeteredRoute, approx_bytes, metered_cache
+from .byte_cache import ByteBudgetCache
+from .datasources import Agg, AggregateQuery, get_datasources
+from .frame_query import SortedFrame, presort, query_positions
+from .frame_stream import RESPONSE_FORMATS, arrow_available, stream_rows
+from .identity import (
+    SYSTEM_ACCOUNTS,
+    account_keys,
+    canonicalize_emails,
+    dedupe_accounts,
+    dedupe_key,
+    enrich_with_employee_data,
+    normalize_str,
+)
+from .identity_store import IDENTITY_COLS, IdentityStore, default_store_path
+from .license_metrics import ORG_SCOPE, build_summary, build_threshold_index, threshold_split
+from .metric_windows import DEFAULT_WINDOW, METRIC_WINDOWS, WINDOWED_METRICS, window_col, windowed_columns
+from .pg_async import async_pg_available, copy_query_to_buffer, dispose_async_engine, fetch_prepared, warm_pool
+from .pg_loader import read_dataset_version, read_dataset_versions
+from .rollups import (
+    ANALYST_ACTIONS_TABLE,
+    DAY_COL,
+    EVENTS_COL,
+    GRAINS,
+    PLATFORM_LOGINS_TABLE,
+    REPORT_LOADS_TABLE,
+    time_series,
+)
+
+router = APIRouter(route_class=MeteredRoute)  # request_seconds per route (see /metrics)
+logger = logging.getLogger(__name__)
+
+# getData / PostgreSQL, or fixtures + SQLite with SPOTFIRE_DATA_BACKEND=offline
+SOURCES = get_datasources()
+engine, schema = SOURCES.engine, SOURCES.schema
+
+
+def getData(params: Dict[str, Any], custom_columns=None, custom_operators=None) -> pd.DataFrame:
+    """SOURCES.tables.get_data, timed as stage_seconds{stage="getdata", table=data_type}."""
+    with METRICS.timer("stage_seconds", stage="getdata", table=params.get("data_type")):
+        return SOURCES.tables.get_data(params, custom_columns, custom_operators)
+
+
+def aggregateData(query: AggregateQuery) -> pd.DataFrame:
+    """SOURCES.tables.aggregate (GROUP BY pushed down), timed as stage_seconds{stage="getdata_aggregate"}."""
+    with METRICS.timer("stage_seconds", stage="getdata_aggregate", table=query.data_type):
+        return SOURCES.tables.aggregate(query)
 
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
 
 CACHE_TTL_SECONDS = 86400  # 24 hours
+LICENSE_VERSION_TTL_SECONDS = 5 * 60  # how often the license snapshot checks dataset_versions
 LOOKUP_TTL_SECONDS = 86400  # 24 hours (Spotfire users + employee tables)
 REPORT_VIEWS_TTL_SECONDS = 4 * 60 * 60  # 4 hours (per report_path)
+REPORT_VIEWS_CACHE_MAX_BYTES = 512 * 2**20  # all cached /report-views results together (byte_cache)
+
+# Processes for employee enrichment of identity-store misses (identity.enrich_with_employee_data);
+# 1 = in-process. >1 forks the server process, so keep it for dedicated workers running
+# whole-directory builds (only applies from identity.PARALLEL_MIN_ROWS rows)
+ENRICH_WORKERS = 1
+
+# How duplicate Spotfire accounts are grouped before counting licenses
+# (see identity.DEDUPE_STRATEGIES: "email", "localpart", "samsung")
+LICENSE_DEDUPE_STRATEGY = "email"
+
+# Persistent user_name -> identity table (survives restarts + TTL expiry)
+IDENTITY_STORE = IdentityStore(default_store_path())
+
+# In-process counters for identity resolution (see /license-reduction/unresolved-metrics)
+IDENTITY_METRICS: Dict[str, int] = {"negative_cache_hits": 0, "newly_unresolved": 0}
+
+# recommendedAction = "Analyst" when ANALYST_ACTIONS_PER_DAY >= this (default policy)
+ANALYST_ACTIONS_THRESHOLD = 1.0
+
+# Non-default (window, threshold) policies kept re-deduped in memory (LRU)
+POLICY_CACHE_SIZE = 8
+
+# Per-window ANALYST_ACTIONS_PER_DAY column behind /license-reduction/simulate
+LICENSE_APD_WINDOW_COLUMNS = {
+    w: "ANALYST_ACTIONS_PER_DAY" if w == DEFAULT_WINDOW else window_col("ANALYST_ACTIONS_PER_DAY", w)
+    for w in METRIC_WINDOWS
+}
+SIMULATION_MAX_POINTS = 1000
+
+# analyst_functions_users is loaded by spotfire.py via pg_loader.load_table
+LICENSE_DATASET = "analyst_functions_users"
+
+# Cold cache: answer /license-reduction from a server-side cost-center filter
+# (cost_center_name as loaded by spotfire.py) while the full snapshot builds
+LICENSE_COLD_PATH_FILTER = True
 
 LICENSE_COLS = [
     "USER_NAME",
@@ -168,8 +125,75 @@ LICENSE_COLS = [
     "ANALYST_ACTIONS_PER_DAY",
     "ANALYST_ACTIONS_PER_ACTIVE_DAYS",
     "ACTIVE_DAYS",
+    *windowed_columns(),  # per-window metrics (metric_windows.METRIC_WINDOWS)
 ]
 
+# Typed decode for the COPY read path (numeric columns never arrive as strings)
+LICENSE_DTYPES = {
+    "USER_NAME": "object",
+    "USER_EMAIL": "object",
+    "LAST_ACTIVITY": "object",
+    "ANALYST_FUNCTIONS": "float64",
+    "NON_ANALYST_FUNCTIONS": "float64",
+    "ANALYST_PCT": "float64",
+    "ANALYST_USER_FLAG": "boolean",
+    "ANALYST_THRESHOLD": "float64",
+    "ANALYST_ACTIONS_PER_DAY": "float64",
+    "ANALYST_ACTIONS_PER_ACTIVE_DAYS": "float64",
+    "ACTIVE_DAYS": "float64",
+    **{c: "float64" for c in windowed_columns()},
+}
+
+# Public sort/filter keys of /license-reduction (the UI's row keys) -> final-frame columns
+LICENSE_UI_COLUMNS = {
+    "name": "FULL_NAME",
+    "statusName": "STATUS_NAME",
+    "user": "USER_NAME",
+    "email": "USER_EMAIL",
+    "costCenterName": "cost_center_name",
+    "departmentName": "dept_name",
+    "title": "title",
+    "recommendedAction": "recommendedAction",
+    "lastActivity": "LAST_ACTIVITY",
+    "analystActionsPerDay": "ANALYST_ACTIONS_PER_DAY",
+    "analystFunctions": "ANALYST_FUNCTIONS",
+    "nonAnalystFunctions": "NON_ANALYST_FUNCTIONS",
+    "activeDays": "ACTIVE_DAYS",
+    "analystPct": "ANALYST_PCT",
+    "analystThreshold": "ANALYST_THRESHOLD",
+}
+LICENSE_SEARCH_COLUMNS = [
+    "FULL_NAME",
+    "USER_NAME",
+    "USER_EMAIL",
+    "cost_center_name",
+    "dept_name",
+    "title",
+    "STATUS_NAME",
+    "recommendedAction",
+]
+
+# /report-views rows keep their column names as sort/filter keys
+REPORT_VIEWS_SEARCH_COLUMNS = ["FULL_NAME", "user_name", "email", "cost_center_name", "dept_name", "title"]
+REPORT_VIEWS_COLUMNS = {c: c for c in REPORT_VIEWS_SEARCH_COLUMNS + ["view_count", "logged_time"]}
+
+MAX_PAGE_SIZE = 5000
+
+# unique_sessions in /report-views: "exact" (nunique per identity, summed per person)
+# or "hll" (per-identity session sketches, unioned per person - no double counting)
+REPORT_VIEWS_DISTINCT_MODE = "exact"
+SESSION_SKETCH_PRECISION = 10
+
+# /report-views pulls one row per (user, session, action) with its view count and
+# latest view time (GROUP BY pushed down, datasources.AggregateQuery) instead of
+# every load event. Same results; only used when the tables can aggregate (the
+# Trino SQL endpoint, datasources.TRINO_HOST), else the raw pull
+REPORT_VIEWS_PUSHDOWN = False
+
+# /usage/* trend endpoints (daily rollups maintained by spotfire.py)
+USAGE_DEFAULT_DAYS = 90
+USAGE_MAX_DAYS = 730
+
 TZ_CDT = pytz.timezone("America/Chicago")
 TZ_UTC = pytz.UTC
 
@@ -178,14 +202,134 @@ TZ_UTC = pytz.UTC
 # ---------------------------------------------------------------------------
 
 
-def get_license_df() -> pd.DataFrame:
+def _async_pg() -> bool:
+    """asyncpg pool reads (COPY) only apply to a PostgreSQL engine."""
+    return engine.dialect.name == "postgresql" and async_pg_available()
+
+
+def _read_copy_csv(buf: io.BytesIO, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Decode COPY CSV output straight into typed columns with the C CSV parser."""
+    return pd.read_csv(
+        buf,
+        dtype=dtypes,
+        true_values=["t", "true", "True"],
+        false_values=["f", "false", "False"],
+        keep_default_na=False,
+        na_values=[""],
+    )
+
+
+def _records_to_df(columns: List[str], rows: List[tuple], dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Prepared-statement rows (native Python values) cast to the same dtypes as a COPY read."""
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for col, dtype in dtypes.items():
+        if col not in df.columns:
+            continue
+        if dtype in ("float64", "int64"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _copy_query_to_df(sql: str, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    Bulk-read a query with COPY ... TO STDOUT (CSV) on the sync engine - no
+    per-cell Python objects from a row cursor. Works with psycopg2
+    (copy_expert) and psycopg 3 (cursor.copy).
+    """
+    copy_sql = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    buf = io.BytesIO()
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        if hasattr(cur, "copy_expert"):
+            cur.copy_expert(copy_sql, buf)
+        else:
+            with cur.copy(copy_sql) as copy:
+                for block in copy:
+                    buf.write(bytes(block))
+        cur.close()
+    finally:
+        raw.close()
+
+    buf.seek(0)
+    return _read_copy_csv(buf, dtypes)
+
+
+def _read_query_sync(sql: str, args: Tuple, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Sync fallback of _read_query: cursor read with $n placeholders bound as %s (? on SQLite)."""
+    if engine.dialect.paramstyle == "qmark":
+        sql = re.sub(r"\$\d+", "?", sql)
+        args = tuple(a.isoformat() if hasattr(a, "isoformat") else a for a in args)
+    else:
+        sql = re.sub(r"\$\d+", "%s", sql)
+    df = pd.read_sql_query(sql, con=engine, params=args)
+    for col, dtype in dtypes.items():
+        if col in df.columns and dtype in ("float64", "int64"):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+async def _read_query(sql: str, *args, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    Parameterized read ($1, $2, ... bound from args): COPY over the async pool
+    when available, else a cursor read in a worker thread.
+    """
+    if _async_pg():
+        buf = await copy_query_to_buffer(engine, sql, *args)
+        return _read_copy_csv(buf, dtypes)
+    return await asyncio.to_thread(_read_query_sync, sql, args, dtypes)
+
+
+# License queries are built once at import (schema/table/columns are config, never
+# request input); the cost-center value is always a bound parameter ($1)
+LICENSE_SQL = 'SELECT {cols} FROM "{schema}".{table}'.format(
+    cols=", ".join(f'"{c}"' for c in LICENSE_COLS), schema=schema, table=LICENSE_DATASET
+)
+LICENSE_BY_COST_CENTER_SQL = LICENSE_SQL + ' WHERE "cost_center_name" = $1'
+
+
+def _get_license_df_sync() -> pd.DataFrame:
+    """
+    Sync fallback (no asyncpg): COPY on the shared engine, or a cursor read
+    (cast to the same dtypes) if the driver doesn't support COPY or the
+    engine is the offline SQLite stand-in.
+    """
+    if engine.dialect.name == "postgresql":
+        try:
+            return _copy_query_to_df(LICENSE_SQL, LICENSE_DTYPES)
+        except (AttributeError, NotImplementedError) as e:
+            logger.warning("COPY read unavailable (%s); falling back to read_sql_query", e)
+    df = pd.read_sql_query(LICENSE_SQL, con=engine)
+    for col, dtype in LICENSE_DTYPES.items():
+        if col in df.columns and dtype == "float64":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+async def get_license_df(cost_center_name: Optional[str] = None) -> pd.DataFrame:
     """
     Pull the analyst functions users dataset from PostgreSQL
     (replaces the old S3 CSV load).
+
+    - Full table: COPY over a pre-warmed asyncpg pool (pg_async)
+    - cost_center_name: server-side filter run as a prepared statement
+      (prepared once per pooled connection, $1 bound; only with the async pool)
+    - Without asyncpg: sync COPY / cursor read in a worker thread (full table only)
     """
-    cols_sql = ", ".join([f'"{c}"' for c in LICENSE_COLS])
-    sql = f'SELECT {cols_sql} FROM "{schema}".analyst_functions_users'
-    df = pd.read_sql_query(sql, con=engine)
+    if _async_pg():
+        if cost_center_name is None:
+            df = _read_copy_csv(await copy_query_to_buffer(engine, LICENSE_SQL), LICENSE_DTYPES)
+        else:
+            columns, rows = await fetch_prepared(engine, LICENSE_BY_COST_CENTER_SQL, cost_center_name)
+            df = _records_to_df(columns, rows, LICENSE_DTYPES)
+    elif cost_center_name is not None:
+        raise RuntimeError("Server-side cost-center filtering needs asyncpg")
+    else:
+        df = await asyncio.to_thread(_get_license_df_sync)
+
     df.columns = [c.strip() for c in df.columns]
     return df
 
@@ -228,82 +372,6 @@ def _get_fallback_employee_data() -> pd.DataFrame:
     return getData(params=params, custom_columns=custom_columns)
 
 
-def _partner_to_samsung_email(email: Optional[str]) -> Optional[str]:
-    """
-    If a license row uses a contractor/partner email but the employee tables
-    now contain @samsung.com, we try an alternate email.
-
-    Example:
-    someone@partner.samsung.com -> someone@samsung.com
-    """
-    if not email:
-        return email
-    e = str(email).strip()
-    if "@partner.samsung" in e:
-        left = e.split("@", 1)[0]
-        return f"{left}@samsung.com"
-    return e
-
-
-def _email_localpart(email: Optional[str]) -> Optional[str]:
-    """
-    Return the part of an email before '@'. If '@' not present, returns the input.
-    """
-    if not email:
-        return None
-    e = str(email).strip()
-    if "@" not in e:
-        return e
-    return e.split("@", 1)[0]
-
-
-def _fill_missing_from_key(
-    merged: pd.DataFrame,
-    missing_mask: pd.Series,
-    lookup: pd.DataFrame,
-    lookup_key: str,
-    left_key_series: pd.Series,
-) -> pd.DataFrame:
-    """
-    Fill FULL_NAME + STATUS_NAME + org fields (cost_center_name, dept_name, title)
-    for rows where merged[FULL_NAME] is missing, using a lookup table keyed by
-    `lookup_key`, matching `left_key_series`.
-
-    - lookup must contain: lookup_key, full_name, status_name, cost_center_name, dept_name, title
-    - left_key_series is the values to look up (same index as merged[missing_mask])
-    """
-    if not missing_mask.any():
-        return merged
-
-    needed = {lookup_key, "full_name", "status_name", "cost_center_name", "dept_name", "title"}
-    if not needed.issubset(set(lookup.columns)):
-        return merged
-
-    lk = lookup[[lookup_key, "full_name", "status_name", "cost_center_name", "dept_name", "title"]].copy()
-    lk[lookup_key] = lk[lookup_key].astype(str).str.strip().str.lower()
-    lk = lk.dropna(subset=[lookup_key]).drop_duplicates(subset=[lookup_key], keep="first")
-
-    left_keys_norm = left_key_series.astype(str).str.strip().str.lower()
-
-    name_map = lk.set_index(lookup_key)["full_name"].to_dict()
-    status_map = lk.set_index(lookup_key)["status_name"].to_dict()
-    cc_map = lk.set_index(lookup_key)["cost_center_name"].to_dict()
-    dept_map = lk.set_index(lookup_key)["dept_name"].to_dict()
-    title_map = lk.set_index(lookup_key)["title"].to_dict()
-
-    merged.loc[missing_mask, "FULL_NAME"] = merged.loc[missing_mask, "FULL_NAME"].fillna(left_keys_norm.map(name_map))
-    merged.loc[missing_mask, "STATUS_NAME"] = merged.loc[missing_mask, "STATUS_NAME"].fillna(
-        left_keys_norm.map(status_map)
-    )
-    merged.loc[missing_mask, "cost_center_name"] = merged.loc[missing_mask, "cost_center_name"].fillna(
-        left_keys_norm.map(cc_map)
-    )
-    merged.loc[missing_mask, "dept_name"] = merged.loc[missing_mask, "dept_name"].fillna(left_keys_norm.map(dept_map))
-    merged.loc[missing_mask, "title"] = merged.loc[missing_mask, "title"].fillna(left_keys_norm.map(title_map))
-
-    return merged
-
-
 def _fill_missing_email_from_employee_ids(
     df_in: pd.DataFrame,
     employee_df: pd.DataFrame,
@@ -324,16 +392,17 @@ def _fill_missing_email_from_employee_ids(
     if email_col not in df.columns:
         df[email_col] = None
 
-    missing_email = df[email_col].isna() | (df[email_col].astype(str).str.strip() == "")
+    df[email_col] = normalize_str(df[email_col], lower=True)
+    missing_email = df[email_col].isna()
     if not missing_email.any():
         return df
 
-    left = df.loc[missing_email, user_name_col].astype(str).str.strip().str.lower()
+    left = account_keys(df.loc[missing_email, user_name_col])
 
     emp = employee_df.copy()
     for col in ["smtp", "bname", "nt_id", "gad_id"]:
         if col in emp.columns:
-            emp[col] = emp[col].astype(str).str.strip().str.lower()
+            emp[col] = normalize_str(emp[col], lower=True)
 
     if "smtp" not in emp.columns:
         return df
@@ -363,9 +432,7 @@ def _fill_missing_email_from_employee_ids(
     df.loc[missing_email, email_col] = df.loc[missing_email, email_col].fillna(found)
 
     # normalize final email
-    df[email_col] = df[email_col].where(df[email_col].notna(), None)
-    if df[email_col].notna().any():
-        df[email_col] = df[email_col].astype(str).str.strip().str.lower().replace({"nan": None, "": None})
+    df[email_col] = normalize_str(df[email_col], lower=True)
 
     return df
 
@@ -376,12 +443,15 @@ def _collapse_keep_latest_with_counts(
     time_col: str,
     count_col: str = "view_count",
     extra_count_cols: Optional[Dict[str, str]] = None,  # e.g. {"session_id": "unique_sessions"}
+    distinct_mode: str = "exact",
 ) -> pd.DataFrame:
     """
     Collapse rows by key_col:
     - keep the row with the max time_col as the representative
-    - add count_col = total rows in the group
+    - add count_col = total rows in the group (events, for pushed-down groups)
     - optionally add extra aggregate counts (e.g., nunique session_id)
+    - distinct_mode="hll": extra counts are HyperLogLog estimates, and each
+      sketch is kept in `_<out_name>_sketch` so callers can union groups later
 
     Returns: representative rows with aggregates attached.
     """
@@ -402,7 +472,7 @@ def _collapse_keep_latest_with_counts(
         return d
 
     grp = d.groupby(key_col, dropna=False)
-    counts = grp.size().rename(count_col)
+    counts = (grp[EVENTS_COL].sum() if EVENTS_COL in d.columns else grp.size()).rename(count_col)
 
     idx = grp[time_col].idxmax()
     rep = d.loc[idx].copy()
@@ -411,100 +481,28 @@ def _collapse_keep_latest_with_counts(
 
     if extra_count_cols:
         for col, out_name in extra_count_cols.items():
-            if col in d.columns:
+            if col not in d.columns:
+                continue
+            if distinct_mode == "hll":
+                sketches = hll.grouped_registers(grp.ngroup().to_numpy(), grp.ngroups, d[col], SESSION_SKETCH_PRECISION)
+                by_key = dict(zip(counts.index, sketches))
+                rep[f"_{out_name}_sketch"] = rep[key_col].map(by_key)
+                rep[out_name] = rep[key_col].map(dict(zip(counts.index, hll.estimate(sketches).astype(int))))
+            else:
                 rep[out_name] = rep[key_col].map(grp[col].nunique().rename(out_name))
 
     rep["last_logged"] = rep[time_col]
+    rep = rep.drop(columns=[EVENTS_COL], errors="ignore")
     rep = rep.sort_values(time_col, ascending=False).reset_index(drop=True)
     return rep
 
 
-def _dedupe_license_users_by_email_prefer_analyst(df_in: pd.DataFrame) -> pd.DataFrame:
-    """
-    Fix inflated counts caused by duplicate Spotfire user accounts that share the same email.
-
-    Rule:
-    - For duplicate USER_EMAIL:
-        * If ANY account in the group has recommendedAction == "Analyst", keep an "Analyst" row and drop others.
-        * Else (all Consumer), keep the row with the most recent LAST_ACTIVITY.
-    - If recommendedAction ties within the chosen tier, break ties by:
-        LAST_ACTIVITY (most recent) -> ANALYST_ACTIONS_PER_DAY (highest) -> USER_NAME (stable)
-
-    Only applies to rows with a non-empty USER_EMAIL.
-    """
-    if df_in is None or df_in.empty:
-        return df_in
-
-    df = df_in.copy()
-
-    if "USER_EMAIL" not in df.columns:
-        return df
-
-    # Normalize email to enable correct grouping
-    df["USER_EMAIL"] = (
-        df["USER_EMAIL"]
-        .where(df["USER_EMAIL"].notna(), None)
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace({"nan": None, "": None})
-    )
-
-    has_email = df["USER_EMAIL"].notna() & (df["USER_EMAIL"].astype(str).str.strip() != "")
-    if not has_email.any():
-        return df
-
-    # Ensure fields exist
-    if "recommendedAction" not in df.columns:
-        df["recommendedAction"] = None
-    if "ANALYST_ACTIONS_PER_DAY" in df.columns:
-        df["ANALYST_ACTIONS_PER_DAY"] = pd.to_numeric(df["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0)
-    else:
-        df["ANALYST_ACTIONS_PER_DAY"] = 0
-
-    # Parse LAST_ACTIVITY for ordering
-    if "LAST_ACTIVITY" in df.columns:
-        df["_LAST_ACTIVITY_DT"] = pd.to_datetime(df["LAST_ACTIVITY"], errors="coerce", utc=True)
-    else:
-        df["_LAST_ACTIVITY_DT"] = pd.NaT
-
-    ra = df["recommendedAction"].astype(str).str.strip().str.lower()
-    df["_IS_ANALYST"] = (ra == "analyst").astype(int)
-
-    # Sort so "best" row per email is first
-    # - analyst rows first (if any)
-    # - most recent activity
-    # - higher actions/day
-    # - stable tie breaker
-    if "USER_NAME" not in df.columns:
-        df["USER_NAME"] = None
-
-    df_sorted = df.sort_values(
-        by=["_IS_ANALYST", "_LAST_ACTIVITY_DT", "ANALYST_ACTIONS_PER_DAY", "USER_NAME"],
-        ascending=[False, False, False, True],
-        na_position="last",
-    )
-
-    # Keep one row per email (for rows that have an email)
-    kept_email = df_sorted.loc[has_email].drop_duplicates(subset=["USER_EMAIL"], keep="first")
-
-    # Keep all rows with missing/blank email as-is
-    kept_no_email = df_sorted.loc[~has_email].copy()
-
-    out = pd.concat([kept_email, kept_no_email], ignore_index=True)
-
-    # Cleanup helper cols
-    out.drop(columns=["_LAST_ACTIVITY_DT", "_IS_ANALYST"], inplace=True, errors="ignore")
-
-    return out
-
-
 # ---------------------------------------------------------------------------
 # Cached lookups (big wins: avoid re-pulling same Trino tables per request)
 # ---------------------------------------------------------------------------
 
 
-@cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer())
+@metered_cache("sf_users", cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer()))
 async def get_cached_sf_users() -> pd.DataFrame:
     """
     Spotfire user mapping table (display_name, email, user_name).
@@ -516,20 +514,13 @@ async def get_cached_sf_users() -> pd.DataFrame:
         return pd.DataFrame(columns=["user_name", "display_name", "email"])
 
     df = df.copy()
-    df["user_name"] = df["user_name"].astype(str).str.strip()
+    df["user_name"] = normalize_str(df["user_name"])
     if "email" in df.columns:
-        df["email"] = (
-            df["email"]
-            .where(df["email"].notna(), None)
-            .astype(str)
-            .str.strip()
-            .str.lower()
-            .replace({"nan": None, "": None})
-        )
+        df["email"] = normalize_str(df["email"], lower=True)
     return df
 
 
-@cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer())
+@metered_cache("primary_emp", cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer()))
 async def get_cached_primary_emp() -> pd.DataFrame:
     """
     Primary employee table cached + normalized once.
@@ -554,16 +545,16 @@ async def get_cached_primary_emp() -> pd.DataFrame:
 
     for col in ["smtp", "bname", "nt_id", "gad_id"]:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.lower()
+            df[col] = normalize_str(df[col], lower=True)
 
     for col in ["full_name", "status_name", "cost_center_name", "dept_name", "title"]:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().replace({"nan": None})
+            df[col] = normalize_str(df[col])
 
     return df
 
 
-@cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer())
+@metered_cache("fallback_emp", cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer()))
 async def get_cached_fallback_emp() -> pd.DataFrame:
     """
     Fallback employee table cached + normalized once.
@@ -575,286 +566,410 @@ async def get_cached_fallback_emp() -> pd.DataFrame:
     df = df.copy()
 
     if "smtp" in df.columns:
-        df["smtp"] = df["smtp"].astype(str).str.strip().str.lower()
+        df["smtp"] = normalize_str(df["smtp"], lower=True)
 
     for col in ["full_name", "status_name", "cost_center_name", "dept_name", "title"]:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().replace({"nan": None})
+            df[col] = normalize_str(df[col])
 
     return df
 
 
-def enrich_with_employee_data(
+@metered_cache("hr_version", cached(ttl=LOOKUP_TTL_SECONDS, serializer=PickleSerializer()))
+async def get_cached_hr_version() -> str:
+    """
+    Sync the identity store with the cached employee tables and return the
+    HR snapshot version. Cached on the same TTL as the employee tables, so the
+    snapshot diff runs once per refresh instead of once per request.
+    """
+    primary_emp = await get_cached_primary_emp()
+    fallback_emp = await get_cached_fallback_emp()
+    return IDENTITY_STORE.sync_hr(primary_emp, fallback_emp)
+
+
+def _identity_key_frame(df: pd.DataFrame, email_col: str, username_col: str) -> pd.DataFrame:
+    """
+    Build the identity-store key columns for already-normalized email/username
+    columns: (user_name, input_email) plus the candidate keys enrichment can
+    resolve through.
+    """
+    emails = canonicalize_emails(df[email_col])
+    user_vals = df[username_col]
+    return pd.DataFrame(
+        {
+            "user_name": user_vals.fillna(""),
+            "input_email": emails["email"].fillna(""),
+            "email_alt": emails["alt"],
+            "user_name_norm": account_keys(user_vals),
+            "email_local": emails["local"],
+        },
+        index=df.index,
+    )
+
+
+def _apply_unresolved_fallback(df: pd.DataFrame) -> pd.DataFrame:
+    """Same final fallback enrich_with_employee_data applies to unresolved rows."""
+    df["FULL_NAME"] = "Possibly Terminated"
+    df["STATUS_NAME"] = "Unknown"
+    for col in ["cost_center_name", "dept_name", "title"]:
+        df[col] = "Unknown"
+    return df
+
+
+def resolve_identities(
     df_in: pd.DataFrame,
     email_col: str,
     username_col: str,
-    primary_emp: Optional[pd.DataFrame] = None,
-    fallback_emp: Optional[pd.DataFrame] = None,
+    primary_emp: pd.DataFrame,
+    fallback_emp: pd.DataFrame,
+    hr_version: str,
 ) -> pd.DataFrame:
     """
-    Employee enrichment pipeline.
+    Identity-store backed version of enrich_with_employee_data.
 
-    Produces/fills:
-    - FULL_NAME
-    - STATUS_NAME
-    - cost_center_name
-    - dept_name
-    - title
+    - Rows already resolved for the same (user_name, email) are served from the store
+    - Rows already known to be unresolvable against this HR version skip
+      straight to the "Possibly Terminated" fallback (negative cache)
+    - Only the remaining rows go through the full enrichment pipeline; their
+      outcome (resolved or not) is written back
 
-    Perf change: can accept preloaded/cached employee tables to avoid re-pulling Trino.
+    Rows that already carry org values are always enriched (the store only
+    holds pure HR resolutions).
     """
-    df = df_in.copy()
+    df = df_in.reset_index(drop=True)
 
-    out_cols = ["FULL_NAME", "STATUS_NAME", "cost_center_name", "dept_name", "title"]
-
-    # --- Preserve any existing values, but DROP to avoid duplicate columns after merge ---
-    existing = pd.DataFrame(index=df.index)
-    for c in out_cols:
-        if c in df.columns:
-            existing[c] = df[c]
-        else:
-            existing[c] = None
-
-    df.drop(columns=[c for c in out_cols if c in df.columns], inplace=True, errors="ignore")
-
-    # Normalize email/username inputs
     if email_col not in df.columns:
         df[email_col] = None
-    df[email_col] = (
-        df[email_col]
-        .where(df[email_col].notna(), None)
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace({"nan": None, "": None})
-    )
-
     if username_col not in df.columns:
         df[username_col] = None
-    df[username_col] = (
-        df[username_col]
-        .where(df[username_col].notna(), None)
-        .astype(str)
-        .str.strip()
-        .replace({"nan": None})
-    )
 
-    # Internal helper cols
-    df["_EMAIL_ALT"] = (
-        df[email_col]
-        .apply(_partner_to_samsung_email)
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace({"nan": None, "": None})
-    )
-    df["_EMAIL_LOCAL"] = df[email_col].apply(_email_localpart)
-
-    # Load primary employee data (prefer injected cached)
-    user_data = (primary_emp if primary_emp is not None else _get_primary_employee_data()).copy()
+    # Same normalization enrich_with_employee_data applies to its inputs
+    df[email_col] = normalize_str(df[email_col], lower=True)
+    df[username_col] = normalize_str(df[username_col])
 
-    # Normalize lookup keys (safe even if already normalized)
-    for col in ["smtp", "bname", "nt_id", "gad_id"]:
-        if col in user_data.columns:
-            user_data[col] = user_data[col].astype(str).str.strip().str.lower()
+    has_existing = pd.Series(False, index=df.index)
+    for c in IDENTITY_COLS:
+        if c in df.columns:
+            has_existing |= df[c].notna()
 
-    # Normalize values
-    for col in ["full_name", "status_name", "cost_center_name", "dept_name", "title"]:
-        if col in user_data.columns:
-            user_data[col] = user_data[col].astype(str).str.strip().replace({"nan": None})
-
-    # 1) Primary merge on email -> smtp
-    merged = (
-        df.merge(
-            user_data,
-            how="left",
-            left_on=email_col,
-            right_on="smtp",
-            suffixes=("", "_emp"),
-        )
-        .drop(columns=["smtp"], errors="ignore")
-    )
+    keys = _identity_key_frame(df, email_col, username_col)
+    lookup_keys = keys.loc[~has_existing, ["user_name", "input_email"]].rename_axis("_row").reset_index()
 
-    # --- Capture employee values BEFORE we overlay "existing" columns ---
-    emp_full = merged["full_name"] if "full_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
-    emp_status = merged["status_name"] if "status_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
-    emp_cc = merged["cost_center_name"] if "cost_center_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
-    emp_dept = merged["dept_name"] if "dept_name" in merged.columns else pd.Series(index=merged.index, dtype="object")
-    emp_title = merged["title"] if "title" in merged.columns else pd.Series(index=merged.index, dtype="object")
-
-    # --- Now build the output columns: prefer existing values, else employee values ---
-    merged["FULL_NAME"] = existing["FULL_NAME"].copy().fillna(emp_full)
-    merged["STATUS_NAME"] = existing["STATUS_NAME"].copy().fillna(emp_status)
-    merged["cost_center_name"] = existing["cost_center_name"].copy().fillna(emp_cc)
-    merged["dept_name"] = existing["dept_name"].copy().fillna(emp_dept)
-    merged["title"] = existing["title"].copy().fillna(emp_title)
-
-    # 2) Fallback merge ONLY where FULL_NAME is missing
-    missing_mask = merged["FULL_NAME"].isna()
-    if missing_mask.any():
-        fb = (fallback_emp if fallback_emp is not None else _get_fallback_employee_data()).copy()
-        if "smtp" in fb.columns:
-            fb["smtp"] = fb["smtp"].astype(str).str.strip().str.lower()
-
-        to_fix = merged.loc[missing_mask].merge(
-            fb,
-            how="left",
-            left_on=email_col,
-            right_on="smtp",
-            suffixes=("", "_fb"),
-        )
+    # 1) Positive hits
+    hits = IDENTITY_STORE.lookup(lookup_keys)
+    hit_rows = lookup_keys.merge(hits, on=["user_name", "input_email"], how="inner").set_index("_row")
 
-        key_series = merged.loc[missing_mask, email_col]
+    resolved = df.loc[hit_rows.index].copy()
+    for c in IDENTITY_COLS:
+        resolved[c] = hit_rows[c]
 
-        if "full_name" in to_fix.columns:
-            name_map = to_fix.set_index(email_col)["full_name"].to_dict()
-            merged.loc[missing_mask, "FULL_NAME"] = merged.loc[missing_mask, "FULL_NAME"].fillna(key_series.map(name_map))
+    # 2) Negative hits
+    known_bad = IDENTITY_STORE.lookup_unresolved(lookup_keys, hr_version)
+    bad_idx = (
+        lookup_keys.merge(known_bad, on=["user_name", "input_email"], how="inner")
+        .set_index("_row")
+        .index.difference(hit_rows.index)
+    )
+    unresolved = _apply_unresolved_fallback(df.loc[bad_idx].copy())
+    IDENTITY_METRICS["negative_cache_hits"] += len(bad_idx)
+    METRICS.inc("identity_events_total", len(bad_idx), event="negative_cache_hit")
+
+    # 3) Everything else: full enrichment
+    miss_idx = df.index.difference(hit_rows.index).difference(bad_idx)
+    if len(miss_idx) == 0:
+        return pd.concat([resolved, unresolved], ignore_index=True)
+
+    to_enrich = df.loc[miss_idx].copy()
+    to_enrich = to_enrich.join(keys.loc[miss_idx].add_prefix("_ID_"))
+    to_enrich["_ID_STORABLE"] = ~has_existing.loc[miss_idx]
+    to_enrich = to_enrich.reset_index(drop=True)  # enrichment aligns on a RangeIndex
+
+    enriched = enrich_with_employee_data(
+        to_enrich,
+        email_col=email_col,
+        username_col=username_col,
+        primary_emp=primary_emp,
+        fallback_emp=fallback_emp,
+        workers=ENRICH_WORKERS,
+    )
+    enriched.drop(columns=["bname", "nt_id", "gad_id"], inplace=True, errors="ignore")
 
-        if "status_name" in to_fix.columns:
-            status_map = to_fix.set_index(email_col)["status_name"].to_dict()
-            merged.loc[missing_mask, "STATUS_NAME"] = merged.loc[missing_mask, "STATUS_NAME"].fillna(key_series.map(status_map))
+    id_cols = [c for c in enriched.columns if c.startswith("_ID_")]
+    storable = enriched.loc[enriched["_ID_STORABLE"].astype(bool)]
+    store_rows = storable[id_cols + IDENTITY_COLS].rename(columns=lambda c: c[len("_ID_"):] if c.startswith("_ID_") else c)
 
-        for col in ["cost_center_name", "dept_name", "title"]:
-            if col in to_fix.columns:
-                col_map = to_fix.set_index(email_col)[col].to_dict()
-                merged.loc[missing_mask, col] = merged.loc[missing_mask, col].fillna(key_series.map(col_map))
+    terminated = store_rows["FULL_NAME"].eq("Possibly Terminated")
+    IDENTITY_STORE.upsert(store_rows.loc[~terminated], hr_version)
+    IDENTITY_STORE.record_unresolved(store_rows.loc[terminated], hr_version)
+    IDENTITY_METRICS["newly_unresolved"] += int(terminated.sum())
+    METRICS.inc("identity_events_total", int(terminated.sum()), event="newly_unresolved")
 
-    # 3) Partner email repair (still missing + partner email)
-    still_missing = merged["FULL_NAME"].isna()
-    partner_missing = still_missing & merged[email_col].astype(str).str.contains("@partner.samsung", na=False)
+    enriched.drop(columns=id_cols, inplace=True)
+    return pd.concat([resolved, unresolved, enriched], ignore_index=True)
 
-    if partner_missing.any():
-        to_fix2 = merged.loc[partner_missing].merge(
-            user_data,
-            how="left",
-            left_on="_EMAIL_ALT",
-            right_on="smtp",
-            suffixes=("", "_alt"),
-        )
 
-        key_series = merged.loc[partner_missing, email_col]
-
-        if "full_name" in to_fix2.columns:
-            name_map2 = to_fix2.set_index(email_col)["full_name"].to_dict()
-            merged.loc[partner_missing, "FULL_NAME"] = merged.loc[partner_missing, "FULL_NAME"].fillna(key_series.map(name_map2))
-
-        if "status_name" in to_fix2.columns:
-            status_map2 = to_fix2.set_index(email_col)["status_name"].to_dict()
-            merged.loc[partner_missing, "STATUS_NAME"] = merged.loc[partner_missing, "STATUS_NAME"].fillna(key_series.map(status_map2))
-
-        for col in ["cost_center_name", "dept_name", "title"]:
-            if col in to_fix2.columns:
-                col_map2 = to_fix2.set_index(email_col)[col].to_dict()
-                merged.loc[partner_missing, col] = merged.loc[partner_missing, col].fillna(key_series.map(col_map2))
-
-    # 4) Additional resolution passes
-    missing = merged["FULL_NAME"].isna()
-    if missing.any() and "bname" in user_data.columns:
-        user_bname = user_data.dropna(subset=["bname"]).copy()
-        merged = _fill_missing_from_key(
-            merged=merged,
-            missing_mask=missing,
-            lookup=user_bname,
-            lookup_key="bname",
-            left_key_series=merged.loc[missing, username_col],
-        )
+# ---------------------------------------------------------------------------
+# Cached data builders
+# ---------------------------------------------------------------------------
 
-    missing = merged["FULL_NAME"].isna()
-    if missing.any() and "nt_id" in user_data.columns:
-        user_ntid = user_data.dropna(subset=["nt_id"]).copy()
-        merged = _fill_missing_from_key(
-            merged=merged,
-            missing_mask=missing,
-            lookup=user_ntid,
-            lookup_key="nt_id",
-            left_key_series=merged.loc[missing, username_col],
-        )
 
-    missing = merged["FULL_NAME"].isna()
-    if missing.any() and "gad_id" in user_data.columns:
-        user_gad = user_data.dropna(subset=["gad_id"]).copy()
-        merged = _fill_missing_from_key(
-            merged=merged,
-            missing_mask=missing,
-            lookup=user_gad,
-            lookup_key="gad_id",
-            left_key_series=merged.loc[missing, "_EMAIL_LOCAL"],
-        )
+@dataclass
+class LicenseSnapshot:
+    """
+    One build of the license dataset, kept between refreshes so the next
+    refresh can patch it instead of rebuilding.
+
+    - enriched: every prepared + enriched license row (pre-dedupe), keyed by _ROW_HASH
+    - final: deduped dataset served by the API, indexed by _ROW_HASH
+    - cc_index: cost_center_name -> _ROW_HASH labels of Active users in `final`
+    - dataset_version: dataset_versions.version of the table it was read from
+    - view: `final` pre-sorted on every LICENSE_UI_COLUMNS key (same row order)
+    - summary: license_metrics.build_summary(final) (Active-user counts per group)
+    - threshold_index: window -> scope -> sorted ANALYST_ACTIONS_PER_DAY (what-if sweeps)
+    """
 
-    # 5) Final fallback
-    final_missing = merged["FULL_NAME"].isna()
-    if final_missing.any():
-        merged.loc[final_missing, "FULL_NAME"] = "Possibly Terminated"
-        merged.loc[final_missing, "STATUS_NAME"] = merged.loc[final_missing, "STATUS_NAME"].fillna("Unknown")
-        for col in ["cost_center_name", "dept_name", "title"]:
-            merged.loc[final_missing, col] = merged.loc[final_missing, col].fillna("Unknown")
+    hr_version: str
+    enriched: pd.DataFrame
+    final: pd.DataFrame
+    cc_index: Dict[str, pd.Index] = field(default_factory=dict)
+    built_at: float = 0.0
+    dataset_version: Optional[int] = None
+    view: Optional[SortedFrame] = None
+    summary: Dict[str, Any] = field(default_factory=dict)
+    threshold_index: Dict[int, Dict[str, np.ndarray]] = field(default_factory=dict)
 
-    # Cleanup helper cols and employee raw cols
-    merged.drop(columns=["_EMAIL_ALT", "_EMAIL_LOCAL"], inplace=True, errors="ignore")
-    merged.drop(columns=["full_name", "status_name"], inplace=True, errors="ignore")
 
-    return merged
+# Last built snapshot, served in-process (shared, never copied: handlers must not mutate it)
+_LICENSE_STATE: Dict[str, Optional[LicenseSnapshot]] = {"snapshot": None}
 
+# When the snapshot's dataset/HR versions were last checked (time.monotonic()) + the running check
+_LICENSE_CHECK: Dict[str, Any] = {"at": float("-inf"), "task": None}
 
-# ---------------------------------------------------------------------------
-# Cached data builders
-# ---------------------------------------------------------------------------
+# Background full build started by the cold path (one at a time)
+_LICENSE_BUILD: Dict[str, Optional[asyncio.Task]] = {"task": None}
 
 
-@cached(ttl=CACHE_TTL_SECONDS, serializer=PickleSerializer())
-async def get_cached_final_df() -> pd.DataFrame:
+def _prepare_license_rows(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Build the fully-enriched dataset once (per TTL) and cache it:
-
-    1) Load base rows from PostgreSQL (analyst_functions_users)
-    2) Compute recommendedAction
-    3) Employee enrichment to get FULL_NAME + STATUS_NAME + org fields
-        (now uses cached employee tables)
-    4) Dedupe duplicate accounts by USER_EMAIL to avoid inflated license counts
+    Per-row preparation of analyst_functions_users rows before enrichment:
+    key normalization, numeric coercion, recommendedAction, and a _ROW_HASH
+    over the source columns (the row's version for delta refreshes).
     """
-    df = get_license_df()
     df.columns = [c.strip() for c in df.columns]
-    df = df.where(df.notna(), None)
+    obj_cols = df.select_dtypes(include="object").columns
+    df[obj_cols] = df[obj_cols].where(df[obj_cols].notna(), None)
+
+    source_cols = [c for c in LICENSE_COLS if c in df.columns]
+    df["_ROW_HASH"] = pd.util.hash_pandas_object(df[source_cols].astype(str), index=False).to_numpy()
+    df = df.drop_duplicates(subset=["_ROW_HASH"]).reset_index(drop=True)
 
     # Normalize email fields early (helps joins)
-    if "USER_EMAIL" in df.columns:
-        df["USER_EMAIL"] = df["USER_EMAIL"].astype(str).str.strip().str.lower().replace({"nan": None, "": None})
+    if "USER_EMAIL" not in df.columns:
+        df["USER_EMAIL"] = None
+    emails = canonicalize_emails(df["USER_EMAIL"])
+    df["USER_EMAIL"] = emails["email"]
     if "USER_NAME" in df.columns:
-        df["USER_NAME"] = df["USER_NAME"].astype(str).str.strip().replace({"nan": None})
+        df["USER_NAME"] = normalize_str(df["USER_NAME"])
 
-    # Numeric conversion (db can still give strings depending on driver/types)
+    # Numeric conversion (only needed if the column didn't arrive typed)
     if "ANALYST_ACTIONS_PER_DAY" in df.columns:
-        df["ANALYST_ACTIONS_PER_DAY"] = pd.to_numeric(df["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0)
+        apd = df["ANALYST_ACTIONS_PER_DAY"]
+        if not pd.api.types.is_float_dtype(apd):
+            apd = pd.to_numeric(apd, errors="coerce")
+        df["ANALYST_ACTIONS_PER_DAY"] = apd.fillna(0)
 
     # Compute recommendedAction once
-    df["recommendedAction"] = df["ANALYST_ACTIONS_PER_DAY"].apply(lambda x: "Analyst" if float(x) >= 1 else "Consumer")
+    df["recommendedAction"] = np.where(df["ANALYST_ACTIONS_PER_DAY"] >= ANALYST_ACTIONS_THRESHOLD, "Analyst", "Consumer")
 
     # Keep these for debug endpoint parity
-    df["USER_EMAIL_ALT"] = df["USER_EMAIL"].apply(_partner_to_samsung_email)
-    df["USER_EMAIL_LOCAL"] = df["USER_EMAIL"].apply(_email_localpart)
+    df["USER_EMAIL_ALT"] = emails["alt"]
+    df["USER_EMAIL_LOCAL"] = emails["local"]
 
     for col in ["cost_center_name", "dept_name", "title"]:
         if col not in df.columns:
             df[col] = None
 
+    return df
+
+
+def _active_cost_center_index(df: pd.DataFrame) -> Dict[str, pd.Index]:
+    """cost_center_name -> index labels of Active users."""
+    if df.empty or "cost_center_name" not in df.columns or "STATUS_NAME" not in df.columns:
+        return {}
+    active = df.loc[normalize_str(df["STATUS_NAME"], lower=True).eq("active")]
+    cc = normalize_str(active["cost_center_name"])
+    return {name: active.index[pos] for name, pos in cc.groupby(cc).indices.items()}
+
+
+def _license_view(final: pd.DataFrame) -> SortedFrame:
+    """
+    Pre-sort a final frame for paging. Default order matches the UI:
+    Analysts first, then username (case-insensitive).
+    """
+    is_analyst = normalize_str(final["recommendedAction"], lower=True).eq("analyst").to_numpy()
+    keys = pd.DataFrame({"consumer": ~is_analyst, "user": normalize_str(final["USER_NAME"], lower=True).to_numpy()})
+    default_order = keys.sort_values(["consumer", "user"], kind="stable", na_position="last").index.to_numpy()
+    return presort(final, LICENSE_UI_COLUMNS, LICENSE_SEARCH_COLUMNS, default_order=default_order)
+
+
+def _patch_dedupe(prev: LicenseSnapshot, enriched: pd.DataFrame, changed: pd.DataFrame) -> Tuple[pd.DataFrame, set]:
+    """
+    Re-dedupe only the identity groups touched by `changed` (added + removed rows)
+    and splice them into the previous final frame.
+
+    Returns the patched final frame and the cost centers whose Active index may
+    have changed (any row of a touched group, since the group winner can move).
+    """
+    affected = set(dedupe_key(changed["USER_EMAIL"], LICENSE_DEDUPE_STRATEGY).dropna())
+
+    enriched_keys = dedupe_key(enriched["USER_EMAIL"], LICENSE_DEDUPE_STRATEGY)
+    final_keys = dedupe_key(prev.final["USER_EMAIL"], LICENSE_DEDUPE_STRATEGY)
+
+    in_affected = enriched_keys.isin(affected).to_numpy()
+    kept = prev.final.loc[final_keys.notna().to_numpy() & ~final_keys.isin(affected).to_numpy()]
+    redone = dedupe_accounts(enriched.loc[in_affected], strategy=LICENSE_DEDUPE_STRATEGY)
+    no_key = enriched.loc[enriched_keys.isna().to_numpy()]
+
+    final = pd.concat([kept.reset_index(), redone, no_key], ignore_index=True).set_index("_ROW_HASH")
+
+    touched = pd.concat([changed["cost_center_name"], enriched.loc[in_affected, "cost_center_name"]])
+    return final, set(normalize_str(touched).dropna())
+
+
+async def _refresh_license_snapshot() -> LicenseSnapshot:
+    """
+    Build (or incrementally refresh) the license dataset:
+
+    0) If neither the dataset version nor the HR version moved, reuse the
+       previous snapshot without reading the table at all
+    1) Load base rows from PostgreSQL (analyst_functions_users) + _ROW_HASH per row
+    2) Rows whose hash was already enriched under the same HR version are reused;
+       only new/changed rows are enriched (identity store first, cached employee
+       tables for misses). An HR snapshot change re-resolves everything through the store.
+    3) Only identity groups touched by added/removed rows are re-deduped
+       (LICENSE_DEDUPE_STRATEGY) and patched into the previous dataset
+    4) The per-cost-center Active index is patched for the touched cost centers
+    5) Paging view + summary counts are computed once here, never per request
+    """
     primary_emp = await get_cached_primary_emp()
     fallback_emp = await get_cached_fallback_emp()
+    hr_version = await get_cached_hr_version()
+
+    prev = _LICENSE_STATE["snapshot"]
+
+    # Read the version BEFORE the rows: a load landing in between only causes one extra refresh
+    dataset_version = read_dataset_version(engine, schema, LICENSE_DATASET)
+    if (
+        prev is not None
+        and dataset_version is not None
+        and prev.dataset_version == dataset_version
+        and prev.hr_version == hr_version
+    ):
+        return prev
+
+    with METRICS.timer("stage_seconds", stage="license_read"):
+        raw = _prepare_license_rows(await get_license_df())
+
+    def enrich(rows: pd.DataFrame) -> pd.DataFrame:
+        with METRICS.timer("stage_seconds", stage="license_enrich"):
+            return resolve_identities(
+                rows,
+                email_col="USER_EMAIL",
+                username_col="USER_NAME",
+                primary_emp=primary_emp,
+                fallback_emp=fallback_emp,
+                hr_version=hr_version,
+            )
 
-    merged = enrich_with_employee_data(
-        df,
-        email_col="USER_EMAIL",
-        username_col="USER_NAME",
-        primary_emp=primary_emp,
-        fallback_emp=fallback_emp,
-    )
+    if prev is None or prev.hr_version != hr_version:
+        enriched = enrich(raw)
+        with METRICS.timer("stage_seconds", stage="license_dedupe"):
+            final = dedupe_accounts(enriched, strategy=LICENSE_DEDUPE_STRATEGY).set_index("_ROW_HASH")
+            cc_index = _active_cost_center_index(final)
+    else:
+        is_new = ~raw["_ROW_HASH"].isin(prev.enriched["_ROW_HASH"])
+        is_gone = ~prev.enriched["_ROW_HASH"].isin(raw["_ROW_HASH"])
+        if not is_new.any() and not is_gone.any():
+            prev.dataset_version = dataset_version
+            return prev
+
+        added = enrich(raw.loc[is_new]) if is_new.any() else raw.iloc[0:0]
+        removed = prev.enriched.loc[is_gone]
+        enriched = pd.concat([prev.enriched.loc[~is_gone], added], ignore_index=True)
+        changed = pd.concat([added, removed], ignore_index=True)
+
+        with METRICS.timer("stage_seconds", stage="license_dedupe"):
+            final, touched = _patch_dedupe(prev, enriched, changed)
+
+        cc_index = dict(prev.cc_index)
+        touched_rows = final.loc[normalize_str(final["cost_center_name"]).isin(touched).to_numpy()]
+        for name in touched:
+            cc_index.pop(name, None)
+        cc_index.update(_active_cost_center_index(touched_rows))
+
+        logger.info(
+            "license dataset patched: %d added, %d removed, %d cost centers touched",
+            len(added),
+            len(removed),
+            len(touched),
+        )
 
-    # NEW: De-dupe duplicate Spotfire accounts by email (prefer Analyst account; else most recent LAST_ACTIVITY)
-    merged = _dedupe_license_users_by_email_prefer_analyst(merged)
+    # Views + summary are rebuilt whole (one sort/groupby pass each over `final`)
+    with METRICS.timer("stage_seconds", stage="license_views"):
+        snap = LicenseSnapshot(
+            hr_version=hr_version,
+            enriched=enriched,
+            final=final,
+            cc_index=cc_index,
+            built_at=time.time(),
+            dataset_version=dataset_version,
+            view=_license_view(final),
+            summary=build_summary(final),
+            threshold_index=build_threshold_index(final, LICENSE_APD_WINDOW_COLUMNS),
+        )
+    _LICENSE_STATE["snapshot"] = snap
+    return snap
 
-    return merged
 
+async def _check_license_snapshot() -> LicenseSnapshot:
+    prev = _LICENSE_STATE["snapshot"]
+    METRICS.inc("cache_misses_total", cache="license_snapshot")
+    with METRICS.timer("cache_fill_seconds", cache="license_snapshot"):
+        snap = await _refresh_license_snapshot()
+    _LICENSE_CHECK["at"] = time.monotonic()
+    if snap is not prev:
+        METRICS.set("cache_entry_bytes", approx_bytes(snap), cache="license_snapshot")
+    return snap
+
+
+async def get_cached_license_snapshot() -> LicenseSnapshot:
+    """
+    Current license dataset snapshot, returned from the process as-is (no
+    pickle round trip). Only the version check has a TTL: at most every
+    LICENSE_VERSION_TTL_SECONDS one caller runs _refresh_license_snapshot
+    (a single dataset_versions lookup unless a new load landed) and
+    concurrent callers await that same check.
+    """
+    METRICS.inc("cache_requests_total", cache="license_snapshot")
+    snap = _LICENSE_STATE["snapshot"]
+    if snap is not None and time.monotonic() - _LICENSE_CHECK["at"] < LICENSE_VERSION_TTL_SECONDS:
+        METRICS.inc("cache_hits_total", cache="license_snapshot")
+        return snap
+
+    task = _LICENSE_CHECK["task"]
+    if task is None or task.done():
+        task = _LICENSE_CHECK["task"] = asyncio.create_task(_check_license_snapshot())
+    return await asyncio.shield(task)
 
-@cached(ttl=CACHE_TTL_SECONDS, serializer=PickleSerializer())
+
+async def get_cached_final_df() -> pd.DataFrame:
+    """
+    Fully-enriched, deduped license dataset (see _refresh_license_snapshot).
+    """
+    return (await get_cached_license_snapshot()).final
+
+
+@metered_cache("cost_centers", cached(ttl=LICENSE_VERSION_TTL_SECONDS, serializer=PickleSerializer()))
 async def get_cached_cost_centers_list() -> List[str]:
     """
     Cache the cost center list so the UI dropdown doesn't cause repeated work.
@@ -862,18 +977,256 @@ async def get_cached_cost_centers_list() -> List[str]:
     NOTE: We now only include cost centers that have at least one ACTIVE user,
     since /license-reduction only returns Active users.
     """
-    df = await get_cached_final_df()
+    snap = await get_cached_license_snapshot()
 
-    if "cost_center_name" not in df.columns:
+    if "cost_center_name" not in snap.final.columns:
         raise HTTPException(status_code=400, detail="Missing 'cost_center_name' after employee merge")
 
-    # Only Active users
-    if "STATUS_NAME" in df.columns:
-        status_norm = df["STATUS_NAME"].astype(str).str.strip().str.lower()
-        df = df.loc[status_norm.eq("active")].copy()
+    # Only Active users (index keys are cost centers with >= 1 Active user)
+    return sorted(name for name, labels in snap.cc_index.items() if len(labels))
+
+
+@dataclass(frozen=True)
+class LicensePolicy:
+    """Which metric window and ANALYST_ACTIONS_PER_DAY threshold drive recommendedAction."""
+
+    window: int = DEFAULT_WINDOW
+    threshold: float = ANALYST_ACTIONS_THRESHOLD
+
+    @property
+    def is_default(self) -> bool:
+        return self.window == DEFAULT_WINDOW and self.threshold == ANALYST_ACTIONS_THRESHOLD
+
+
+# (snapshot built_at, policy) -> snapshot re-deduped under that policy
+_POLICY_SNAPSHOTS: "OrderedDict[Tuple[float, LicensePolicy], LicenseSnapshot]" = OrderedDict()
+
+
+def _apply_license_policy(rows: pd.DataFrame, policy: LicensePolicy) -> pd.DataFrame:
+    """
+    Point the unsuffixed metric columns at `policy.window` (precomputed by
+    spotfire.py) and recompute recommendedAction with `policy.threshold`.
+    """
+    out = rows.copy()
+    if policy.window != DEFAULT_WINDOW:
+        for metric in WINDOWED_METRICS:
+            col = window_col(metric, policy.window)
+            if col not in out.columns:
+                raise HTTPException(status_code=400, detail=f"{col} is not in the loaded dataset")
+            out[metric] = out[col]
+        out["ANALYST_ACTIONS_PER_ACTIVE_DAYS"] = out["ANALYST_ACTIONS_PER_DAY"]
+
+    apd = pd.to_numeric(out["ANALYST_ACTIONS_PER_DAY"], errors="coerce").fillna(0)
+    out["ANALYST_ACTIONS_PER_DAY"] = apd
+    out["recommendedAction"] = np.where(apd >= policy.threshold, "Analyst", "Consumer")
+    return out
+
+
+def _policy_snapshot(snap: LicenseSnapshot, policy: LicensePolicy) -> LicenseSnapshot:
+    """
+    `snap` as seen under `policy`: the enriched rows are re-deduped (winners
+    depend on recommendedAction + ANALYST_ACTIONS_PER_DAY) and the view,
+    index and summary rebuilt. Memoized per snapshot build; no recompute of
+    the batch metrics, no re-enrichment.
+    """
+    if policy.is_default:
+        return snap
+
+    key = (snap.built_at, policy)
+    hit = _POLICY_SNAPSHOTS.get(key)
+    if hit is not None:
+        _POLICY_SNAPSHOTS.move_to_end(key)
+        return hit
+
+    enriched = _apply_license_policy(snap.enriched, policy)
+    final = dedupe_accounts(enriched, strategy=LICENSE_DEDUPE_STRATEGY).set_index("_ROW_HASH")
+    derived = replace(
+        snap,
+        enriched=enriched,
+        final=final,
+        cc_index=_active_cost_center_index(final),
+        view=_license_view(final),
+        summary=build_summary(final),
+    )
+
+    _POLICY_SNAPSHOTS[key] = derived
+    while len(_POLICY_SNAPSHOTS) > POLICY_CACHE_SIZE:
+        _POLICY_SNAPSHOTS.popitem(last=False)
+    return derived
+
+
+def _start_license_build() -> None:
+    """Kick off the full snapshot build in the background (no-op if one is running)."""
+    task = _LICENSE_BUILD["task"]
+    if task is None or task.done():
+        _LICENSE_BUILD["task"] = asyncio.create_task(get_cached_license_snapshot())
+
+
+async def _cold_cost_center_rows(cost_center_name: str, policy: LicensePolicy) -> pd.DataFrame:
+    """
+    Active users of one cost center while no snapshot exists yet.
+
+    Reads only that cost center's rows (server-side filter on the loaded
+    cost_center_name), then runs the same prepare -> enrich -> dedupe steps as
+    the full build on that slice. Duplicate accounts filed under another cost
+    center aren't seen here; the full snapshot takes over once it's built.
+    """
+    raw = _prepare_license_rows(await get_license_df(cost_center_name=cost_center_name))
+    if raw.empty:
+        return raw
+
+    enriched = resolve_identities(
+        raw,
+        email_col="USER_EMAIL",
+        username_col="USER_NAME",
+        primary_emp=await get_cached_primary_emp(),
+        fallback_emp=await get_cached_fallback_emp(),
+        hr_version=await get_cached_hr_version(),
+    )
+    if not policy.is_default:
+        enriched = _apply_license_policy(enriched, policy)
+    final = dedupe_accounts(enriched, strategy=LICENSE_DEDUPE_STRATEGY)
+
+    is_active = normalize_str(final["STATUS_NAME"], lower=True).eq("active")
+    in_cc = normalize_str(final["cost_center_name"]).eq(cost_center_name)
+    return final.loc[(is_active & in_cc).to_numpy()]
+
+
+def _license_row_to_ui(r: pd.Series) -> Dict[str, Any]:
+    """One license row in the exact shape expected by the Next frontend."""
+
+    def safe(v):
+        return None if pd.isna(v) else v
+
+    return {
+        # UI-visible columns
+        "name": safe(r.get("FULL_NAME")),
+        "statusName": safe(r.get("STATUS_NAME")),
+        "user": safe(r.get("USER_NAME")),
+        "email": safe(r.get("USER_EMAIL")),
+        "costCenterName": safe(r.get("cost_center_name")),
+        "departmentName": safe(r.get("dept_name")),
+        "title": safe(r.get("title")),
+        "recommendedAction": safe(r.get("recommendedAction")),
+        # Extra fields (optional; safe to keep for later UI expansion)
+        "lastActivity": safe(r.get("LAST_ACTIVITY")),
+        "analystActionsPerDay": float(safe(r.get("ANALYST_ACTIONS_PER_DAY")) or 0),
+        "analystFunctions": int(safe(r.get("ANALYST_FUNCTIONS")) or 0),
+        "nonAnalystFunctions": int(safe(r.get("NON_ANALYST_FUNCTIONS")) or 0),
+        "activeDays": int(safe(r.get("ACTIVE_DAYS")) or 0),
+        "titleCategory": safe(r.get("TITLE_CATEGORY")),
+        "analystPct": safe(r.get("ANALYST_PCT")),
+        "analystUserFlag": bool(safe(r.get("ANALYST_USER_FLAG")) or False),
+        "analystThreshold": safe(r.get("ANALYST_THRESHOLD")),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle
+# ---------------------------------------------------------------------------
+
 
-    centers = sorted({str(x).strip() for x in df["cost_center_name"].dropna().tolist() if str(x).strip()})
-    return centers
+@router.on_event("startup")
+async def _open_pg_pool() -> None:
+    """Pre-open the async pool so cold-path latency never includes connection setup."""
+    if _async_pg():
+        opened = await warm_pool(engine)
+        logger.info("async PostgreSQL pool warmed (%d connections)", opened)
+
+
+@router.on_event("shutdown")
+async def _close_pg_pool() -> None:
+    await dispose_async_engine()
+
+
+# ---------------------------------------------------------------------------
+# Paging
+# ---------------------------------------------------------------------------
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (omit for all rows)"),
+    offset: int = Query(0, ge=0, description="Rows to skip"),
+    sort: Optional[str] = Query(None, description="Sort key (a field of the returned rows)"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    filters: List[str] = Query([], alias="filter", description="key:value exact match (repeatable)"),
+    search: Optional[str] = Query(None, description="Case-insensitive substring over the text columns"),
+) -> Dict[str, Any]:
+    """Shared paging/sorting/filtering query params (see frame_query.query_frame)."""
+    return {
+        "limit": limit,
+        "offset": offset,
+        "sort": sort,
+        "descending": order == "desc",
+        "filters": filters,
+        "search": search,
+    }
+
+
+def policy_params(
+    window: int = Query(DEFAULT_WINDOW, description=f"Metric window in days, one of {list(METRIC_WINDOWS)}"),
+    threshold: float = Query(
+        ANALYST_ACTIONS_THRESHOLD, ge=0, description="Analyst when ANALYST_ACTIONS_PER_DAY >= threshold"
+    ),
+) -> LicensePolicy:
+    if window not in METRIC_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {list(METRIC_WINDOWS)}")
+    return LicensePolicy(window=window, threshold=threshold)
+
+
+def format_param(
+    fmt: str = Query(
+        "json",
+        alias="format",
+        pattern="^(" + "|".join(RESPONSE_FORMATS) + ")$",
+        description="json (list) or a streamed ndjson / csv / arrow body",
+    ),
+) -> str:
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(status_code=400, detail="format=arrow needs pyarrow installed on the server")
+    return fmt
+
+
+def _respond_page(
+    sf: SortedFrame,
+    page: Dict[str, Any],
+    response: Response,
+    fmt: str,
+    to_records: Callable[[pd.DataFrame], List[Dict[str, Any]]],
+    rows: Optional[np.ndarray] = None,
+    filename: Optional[str] = None,
+):
+    """
+    Run one page query against a pre-sorted frame and answer it as a list
+    (format=json) or a chunked stream (ndjson/csv/arrow).
+
+    Paging headers: X-Total-Count (matches before paging) and X-Next-Offset
+    (when more remain).
+    """
+    try:
+        positions, total = query_positions(sf, rows=rows, **page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Total-Count": str(total)}
+    next_offset = page["offset"] + len(positions)
+    if page["limit"] is not None and next_offset < total:
+        headers["X-Next-Offset"] = str(next_offset)
+
+    if fmt != "json":
+        return stream_rows(sf.df, positions, fmt, to_records, headers=headers, filename=filename)
+
+    response.headers.update(headers)
+    with METRICS.timer("stage_seconds", stage="serialize", format=fmt):
+        return to_records(sf.df.iloc[positions])
+
+
+def _license_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [_license_row_to_ui(row) for _, row in df.iterrows()]
+
+
+def _report_view_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return df.replace({np.nan: None}).to_dict(orient="records")
 
 
 # ---------------------------------------------------------------------------
@@ -888,58 +1241,143 @@ async def get_cost_centers() -> List[str]:
 
 @router.get("/license-reduction", response_model=List[Dict[str, Any]])
 async def get_license_reduction(
+    response: Response,
     cost_center_name: str = Query(..., description="Exact cost-center name"),
-) -> List[Dict[str, Any]]:
+    page: Dict[str, Any] = Depends(page_params),
+    fmt: str = Depends(format_param),
+    policy: LicensePolicy = Depends(policy_params),
+):
     """
     Return a list of records in the exact shape expected by the Next frontend.
 
     CHANGE:
     - Only return Active users (STATUS_NAME == "Active")
     - Under the hood, the dataset is also de-duped by email to prevent inflated counts
+    - Cold cache (LICENSE_COLD_PATH_FILTER): served from a server-side filtered
+      read while the full snapshot builds in the background
+    - Paging (page_params): limit/offset, sort/order on any row field, filter=key:value,
+      search; default order is Analysts first, then username. Total in X-Total-Count.
+    - format=ndjson|csv|arrow streams the same rows in chunks instead of one list
+    - window / threshold pick the metric window + Analyst cut-off (policy_params);
+      metrics/recommendedAction/dedupe all follow the chosen policy
     """
-    df = await get_cached_final_df()
+    cc = cost_center_name.strip()
 
-    if "cost_center_name" not in df.columns:
-        raise HTTPException(status_code=400, detail="Missing 'cost_center_name' after employee merge")
+    if _LICENSE_STATE["snapshot"] is None and LICENSE_COLD_PATH_FILTER and _async_pg():
+        _start_license_build()
+        cold = _license_view(await _cold_cost_center_rows(cc, policy))
+        return _respond_page(cold, page, response, fmt, _license_records, filename="license-reduction")
 
-    mask_cc = df["cost_center_name"].astype(str).str.strip().eq(cost_center_name.strip())
+    snap = _policy_snapshot(await get_cached_license_snapshot(), policy)
+    df = snap.final
 
-    # Only Active users
+    if "cost_center_name" not in df.columns:
+        raise HTTPException(status_code=400, detail="Missing 'cost_center_name' after employee merge")
     if "STATUS_NAME" not in df.columns:
         raise HTTPException(status_code=400, detail="Missing 'STATUS_NAME' after employee merge")
 
-    status_norm = df["STATUS_NAME"].astype(str).str.strip().str.lower()
-    mask_active = status_norm.eq("active")
+    # Active users of this cost center, straight from the per-cost-center index
+    labels = snap.cc_index.get(cc)
+    in_cc = np.zeros(len(df), dtype=bool)
+    if labels is not None:
+        in_cc[df.index.get_indexer(labels)] = True
 
-    filtered = df.loc[mask_cc & mask_active].copy()
+    return _respond_page(snap.view, page, response, fmt, _license_records, rows=in_cc, filename="license-reduction")
 
-    def safe(v):
-        return None if pd.isna(v) else v
 
-    def row_to_ui(r: pd.Series) -> Dict[str, Any]:
-        return {
-            # UI-visible columns
-            "name": safe(r.get("FULL_NAME")),
-            "statusName": safe(r.get("STATUS_NAME")),
-            "user": safe(r.get("USER_NAME")),
-            "email": safe(r.get("USER_EMAIL")),
-            "costCenterName": safe(r.get("cost_center_name")),
-            "departmentName": safe(r.get("dept_name")),
-            "title": safe(r.get("title")),
-            "recommendedAction": safe(r.get("recommendedAction")),
-            # Extra fields (optional; safe to keep for later UI expansion)
-            "lastActivity": safe(r.get("LAST_ACTIVITY")),
-            "analystActionsPerDay": float(r.get("ANALYST_ACTIONS_PER_DAY") or 0),
-            "analystFunctions": int(r.get("ANALYST_FUNCTIONS") or 0),
-            "nonAnalystFunctions": int(r.get("NON_ANALYST_FUNCTIONS") or 0),
-            "activeDays": int(r.get("ACTIVE_DAYS") or 0),
-            "titleCategory": safe(r.get("TITLE_CATEGORY")),
-            "analystPct": safe(r.get("ANALYST_PCT")),
-            "analystUserFlag": bool(r.get("ANALYST_USER_FLAG") or False),
-            "analystThreshold": safe(r.get("ANALYST_THRESHOLD")),
-        }
+@router.get("/license-reduction/summary", response_model=Dict[str, Any])
+async def get_license_summary(
+    cost_center_name: Optional[str] = Query(None, description="Only this cost center"),
+    dept_name: Optional[str] = Query(None, description="Only this department"),
+    policy: LicensePolicy = Depends(policy_params),
+) -> Dict[str, Any]:
+    """
+    Precomputed Active-user license counts (no row payloads):
+    Analyst / Consumer / active users and the ANALYST_ACTIONS_PER_DAY
+    distribution, for the whole organization and per cost center +
+    department. Built with the snapshot (see build_summary);
+    a non-default window/threshold policy is built once and memoized.
+    """
+    snap = _policy_snapshot(await get_cached_license_snapshot(), policy)
+    summary = snap.summary
+
+    out: Dict[str, Any] = {
+        "builtAt": datetime.fromtimestamp(snap.built_at, TZ_UTC).isoformat(),
+        "datasetVersion": snap.dataset_version,
+        "window": policy.window,
+        "threshold": policy.threshold,
+        "histogramEdges": summary["histogramEdges"],
+        "overall": summary["overall"],
+    }
+    if cost_center_name is None and dept_name is None:
+        out["costCenters"] = summary["costCenters"]
+        out["departments"] = summary["departments"]
+        return out
+
+    for level, name in [("costCenters", cost_center_name), ("departments", dept_name)]:
+        if name is None:
+            continue
+        stats = summary[level].get(name.strip())
+        if stats is None:
+            raise HTTPException(status_code=404, detail=f"No Active users for {name!r}")
+        out[level] = {name.strip(): stats}
+    return out
 
-    return [row_to_ui(row) for _, row in filtered.iterrows()]
+
+@router.get("/license-reduction/simulate", response_model=Dict[str, Any])
+async def simulate_thresholds(
+    window: int = Query(DEFAULT_WINDOW, description=f"Metric window in days, one of {list(METRIC_WINDOWS)}"),
+    cost_center_name: Optional[str] = Query(None, description="Only this cost center (default: whole org)"),
+    thresholds: List[float] = Query([], alias="threshold", description="Explicit thresholds (repeatable)"),
+    start: float = Query(0.0, ge=0, description="Sweep start (when no threshold is given)"),
+    stop: float = Query(5.0, ge=0, description="Sweep end, inclusive"),
+    step: float = Query(0.25, gt=0, description="Sweep step"),
+) -> Dict[str, Any]:
+    """
+    What-if: Analyst / Consumer split of Active users at each threshold
+    (Analyst when ANALYST_ACTIONS_PER_DAY >= threshold).
+
+    Answered from the snapshot's sorted per-window arrays with one binary
+    search per curve - no rows are touched. Dedupe winners are those of the
+    default policy.
+    """
+    if window not in METRIC_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {list(METRIC_WINDOWS)}")
+
+    too_many = HTTPException(status_code=400, detail=f"At most {SIMULATION_MAX_POINTS} thresholds per call")
+    if thresholds:
+        points = np.asarray(sorted(set(thresholds)), dtype=float)
+        if len(points) > SIMULATION_MAX_POINTS:
+            raise too_many
+    else:
+        if stop < start:
+            raise HTTPException(status_code=400, detail="stop must be >= start")
+        # Size the sweep before allocating it (stop inclusive; tolerance for float steps like 0.1)
+        span = (stop - start) / step
+        if not math.isfinite(span):
+            raise too_many
+        n = math.floor(span + 1e-9) + 1
+        if n > SIMULATION_MAX_POINTS:
+            raise too_many
+        points = np.round(start + step * np.arange(n), 6)
+
+    snap = await get_cached_license_snapshot()
+    scopes = snap.threshold_index.get(window)
+    if scopes is None:
+        raise HTTPException(status_code=400, detail=f"No {window}-day metrics in the loaded dataset")
+
+    scope = cost_center_name.strip() if cost_center_name else ORG_SCOPE
+    values = scopes.get(scope)
+    if values is None:
+        raise HTTPException(status_code=404, detail=f"No Active users for {scope!r}")
+
+    return {
+        "window": window,
+        "scope": scope,
+        "activeUsers": int(len(values)),
+        "datasetVersion": snap.dataset_version,
+        "points": threshold_split(values, points),
+    }
 
 
 @router.get("/license-reduction/missing-names", response_model=List[Dict[str, Any]])
@@ -968,6 +1406,161 @@ async def get_missing_full_names() -> List[Dict[str, Any]]:
     ]
 
 
+@router.get("/license-reduction/unresolved-metrics", response_model=Dict[str, Any])
+async def get_unresolved_metrics() -> Dict[str, Any]:
+    """
+    Identity resolution health: size of the negative cache plus in-process
+    counters (replaces printing unresolved users on every report-views build).
+    """
+    return {
+        "hrVersion": IDENTITY_STORE.hr_version(),
+        "resolvedIdentities": IDENTITY_STORE.size(),
+        "unresolvedIdentities": IDENTITY_STORE.unresolved_size(),
+        "negativeCacheHits": IDENTITY_METRICS["negative_cache_hits"],
+        "newlyUnresolved": IDENTITY_METRICS["newly_unresolved"],
+    }
+
+
+# ---------------------------------------------------------------------------
+# /metrics (Prometheus text) + sampled request profiles
+# ---------------------------------------------------------------------------
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    request_seconds per route, stage_seconds (getdata per table, license build
+    steps, serialization), cache hit/miss/eviction counters + fill times and
+    approximate entry sizes per cached function, identity events.
+    """
+    snap = _LICENSE_STATE["snapshot"]
+    if snap is not None:
+        METRICS.set("license_snapshot_rows", len(snap.final))
+        METRICS.set("license_snapshot_age_seconds", time.time() - snap.built_at)
+    METRICS.set("cache_bytes", REPORT_VIEWS_CACHE.nbytes, cache="report_views")
+    METRICS.set("cache_entries", len(REPORT_VIEWS_CACHE), cache="report_views")
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/metrics/profiles", response_model=List[Dict[str, Any]])
+async def get_profiles(
+    full: bool = Query(False, description="Include the profiler text output"),
+) -> List[Dict[str, Any]]:
+    """
+    Requests captured by the opt-in sampling profiler, newest first
+    (LICENSE_API_PROFILE_RATE > 0 and pyinstrument installed).
+    """
+    return [p if full else {k: v for k, v in p.items() if k != "text"} for p in reversed(PROFILES)]
+
+
+# ---------------------------------------------------------------------------
+# /usage/* trends (served from the day-bucket rollups; no Trino on this path)
+# ---------------------------------------------------------------------------
+
+# Rollup table -> (series key column, value columns)
+USAGE_ROLLUPS: Dict[str, Tuple[str, List[str]]] = {
+    REPORT_LOADS_TABLE: ("REPORT_PATH", ["LOADS"]),
+    PLATFORM_LOGINS_TABLE: ("PLATFORM", ["LOGINS", "UNIQUE_USERS"]),
+    ANALYST_ACTIONS_TABLE: ("cost_center_name", ["ANALYST_ACTIONS", "NON_ANALYST_ACTIONS", "ACTIVE_USERS"]),
+}
+
+
+def _usage_sql(table: str, keyed: bool) -> str:
+    key_col, value_cols = USAGE_ROLLUPS[table]
+    cols = ", ".join(f'"{c}"' for c in [key_col, DAY_COL, *value_cols])
+    sql = f'SELECT {cols} FROM "{schema}".{table} WHERE "{DAY_COL}" >= $1 AND "{DAY_COL}" < $2'
+    return sql + f' AND "{key_col}" = $3' if keyed else sql
+
+
+@metered_cache("dataset_versions", cached(ttl=LICENSE_VERSION_TTL_SECONDS, serializer=PickleSerializer()))
+async def get_cached_dataset_versions() -> Dict[str, int]:
+    return await asyncio.to_thread(read_dataset_versions, engine, schema)
+
+
+@metered_cache("usage_rows", cached(ttl=CACHE_TTL_SECONDS, serializer=PickleSerializer()))
+async def _get_usage_rows(table: str, version: int, start_day: str, end_day: str, key: Optional[str]) -> pd.DataFrame:
+    """
+    Rollup rows of [start_day, end_day) (optionally one key). `version` is part
+    of the cache key, so a new spotfire.py load is picked up within
+    LICENSE_VERSION_TTL_SECONDS.
+    """
+    key_col, value_cols = USAGE_ROLLUPS[table]
+    dtypes = {key_col: "object", DAY_COL: "object", **{c: "int64" for c in value_cols}}
+    start = datetime.strptime(start_day, "%Y-%m-%d").date()
+    end = datetime.strptime(end_day, "%Y-%m-%d").date()
+    if key is None:
+        return await _read_query(_usage_sql(table, False), start, end, dtypes=dtypes)
+    return await _read_query(_usage_sql(table, True), start, end, key, dtypes=dtypes)
+
+
+def usage_params(
+    grain: str = Query("day", pattern="^(" + "|".join(GRAINS) + ")$", description="day or week (Monday start)"),
+    days: int = Query(USAGE_DEFAULT_DAYS, ge=1, le=USAGE_MAX_DAYS, description="Trailing complete days"),
+) -> Dict[str, Any]:
+    """Range of complete UTC days ending yesterday (today is never rolled up)."""
+    today = datetime.utcnow().date()
+    return {
+        "grain": grain,
+        "start": (today - timedelta(days=days)).strftime("%Y-%m-%d"),
+        "end": today.strftime("%Y-%m-%d"),
+    }
+
+
+async def _usage_response(table: str, usage: Dict[str, Any], key: Optional[str]) -> Dict[str, Any]:
+    """
+    Zero-filled series for one rollup: a single series when `key` is given,
+    else one series per key (report loads: all reports summed).
+    """
+    version = (await get_cached_dataset_versions()).get(table)
+    if version is None:
+        raise HTTPException(status_code=503, detail=f"{table} has not been loaded yet")
+
+    key_col, value_cols = USAGE_ROLLUPS[table]
+    rows = await _get_usage_rows(table, version, usage["start"], usage["end"], key)
+    by = key_col if key is None and table != REPORT_LOADS_TABLE else None
+
+    last_day = (datetime.strptime(usage["end"], "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+    return {
+        "grain": usage["grain"],
+        "start": usage["start"],
+        "end": last_day,
+        "datasetVersion": version,
+        "series": time_series(rows, value_cols, usage["grain"], usage["start"], last_day, by=by),
+    }
+
+
+@router.get("/usage/report-loads", response_model=Dict[str, Any])
+async def get_report_load_trend(
+    report_path: Optional[str] = Query(None, description="One report (default: all reports summed)"),
+    usage: Dict[str, Any] = Depends(usage_params),
+) -> Dict[str, Any]:
+    """Report loads per day/week."""
+    key = report_path.strip() if report_path else None
+    return await _usage_response(REPORT_LOADS_TABLE, usage, key)
+
+
+@router.get("/usage/logins", response_model=Dict[str, Any])
+async def get_login_trend(
+    platform: Optional[str] = Query(None, description="Web Player, Cloud or Local Desktop (default: one series each)"),
+    usage: Dict[str, Any] = Depends(usage_params),
+) -> Dict[str, Any]:
+    """
+    Logins per platform per day/week. UNIQUE_USERS is distinct per day; weekly
+    values are sums of the daily counts.
+    """
+    return await _usage_response(PLATFORM_LOGINS_TABLE, usage, platform)
+
+
+@router.get("/usage/analyst-actions", response_model=Dict[str, Any])
+async def get_analyst_action_trend(
+    cost_center_name: Optional[str] = Query(None, description="One cost center (default: one series each)"),
+    usage: Dict[str, Any] = Depends(usage_params),
+) -> Dict[str, Any]:
+    """Analyst / non-analyst actions and active users (user-days) per cost center per day/week."""
+    key = cost_center_name.strip() if cost_center_name else None
+    return await _usage_response(ANALYST_ACTIONS_TABLE, usage, key)
+
+
 # ---------------------------------------------------------------------------
 # /report-views caching (per report_path)
 # ---------------------------------------------------------------------------
@@ -985,13 +1578,26 @@ def _report_views_cache_key(func, *args, **kwargs) -> str:
     return f"report_views:{report_path}:days={days_int}"
 
 
-@cached(ttl=REPORT_VIEWS_TTL_SECONDS, serializer=PickleSerializer(), key_builder=_report_views_cache_key)
-async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dict[str, Any]]:
+# Byte-budgeted LRU with admission control: a crawler walking the library can't
+# flush the hot reports, and memory stays bounded however many paths are asked for
+REPORT_VIEWS_CACHE = ByteBudgetCache(
+    REPORT_VIEWS_CACHE_MAX_BYTES,
+    REPORT_VIEWS_TTL_SECONDS,
+    sizeof=approx_bytes,
+    on_event=lambda event, n: METRICS.inc("cache_removals_total", n, cache="report_views", reason=event),
+)
+
+
+@metered_cache("report_views", REPORT_VIEWS_CACHE.cached(key_builder=_report_views_cache_key))
+async def _get_report_views_cached(report_path: str, days: int = 30) -> SortedFrame:
     """
     Cached worker: does the heavy lifting for /report-views.
+    Returns the rows pre-sorted for paging (REPORT_VIEWS_COLUMNS); natural
+    order is most recent view first.
     Major perf improvements:
     - caches SF users and employee tables (Trino pulls) for LOOKUP_TTL_SECONDS
-    - caches report views per report_path for REPORT_VIEWS_TTL_SECONDS
+    - caches report views per report_path for REPORT_VIEWS_TTL_SECONDS, within
+      REPORT_VIEWS_CACHE_MAX_BYTES (LRU; one-off paths don't displace hot ones)
     - avoids DataFrame merge for sf_users: uses dict mapping (fast for small result sets)
     - parses logged_time once
     - double dedupe strategy (email preferred, fallback to FULL_NAME)
@@ -1001,29 +1607,33 @@ async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dic
     cutoff_dt = cutoff_dt.replace(hour=0, minute=0, second=0, microsecond=0)
     cutoff_str = cutoff_dt.strftime("%d-%b-%y %I.%M.%S.%f %p")
 
-    df_reports = getData(
-        params={
-            "data_type": "spotfire_if2sf_actionlog",
-            "MLR": "T",
-            "log_category": "library%",
-            "log_action": ["load_content", "load"],
-            "logged_time": cutoff_str,
-            "success": "1",
-            "arg1": "dxp",
-            "id2": report_path,
-            "user_name": [
-                "SPOTFIRESYSTEM\\automationservices",
-                "SPOTFIRESYSTEM\\monitoring",
-                "SPOTFIRESYSTEM\\scheduledupdates",
-                "SPOTFIREOAUTH2\\a72082b286310fe3c8d48129c26b295f.oauth-clients.spotfire.tibco.com",
-            ],
-        },
-        custom_columns=["id2", "log_action", "log_category", "logged_time", "user_name", "session_id"],
-        custom_operators={"log_category": "like", "user_name": "!", "logged_time": ">="},
-    )
+    params = {
+        "data_type": "spotfire_if2sf_actionlog",
+        "MLR": "T",
+        "log_category": "library%",
+        "log_action": ["load_content", "load"],
+        "logged_time": cutoff_str,
+        "success": "1",
+        "arg1": "dxp",
+        "id2": report_path,
+        "user_name": list(SYSTEM_ACCOUNTS),
+    }
+    operators = {"log_category": "like", "user_name": "!", "logged_time": ">="}
+    columns = ["id2", "log_action", "log_category", "logged_time", "user_name", "session_id"]
+    if REPORT_VIEWS_PUSHDOWN and SOURCES.tables.can_aggregate():
+        df_reports = aggregateData(
+            AggregateQuery(
+                params,
+                group_by=("id2", "log_action", "log_category", "user_name", "session_id"),
+                aggs=(Agg(EVENTS_COL, "count"), Agg("logged_time", "max", "logged_time")),
+                operators=operators,
+            )
+        )[columns + [EVENTS_COL]]
+    else:
+        df_reports = getData(params=params, custom_columns=columns, custom_operators=operators)
 
     if df_reports is None or df_reports.empty:
-        return []
+        return presort(pd.DataFrame(), REPORT_VIEWS_COLUMNS)
 
     df_reports = df_reports.copy()
 
@@ -1035,6 +1645,7 @@ async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dic
     sf_users = await get_cached_sf_users()
     primary_emp = await get_cached_primary_emp()
     fallback_emp = await get_cached_fallback_emp()
+    hr_version = await get_cached_hr_version()
 
     # Map SF user email/display_name instead of merge (faster for small frames)
     if sf_users is not None and not sf_users.empty:
@@ -1057,14 +1668,7 @@ async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dic
     )
 
     # Normalize email once
-    df_reports["email"] = (
-        df_reports["email"]
-        .where(df_reports["email"].notna(), None)
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace({"nan": None, "": None})
-    )
+    df_reports["email"] = normalize_str(df_reports["email"], lower=True)
 
     # Identity key: prefer email, fallback user_name
     df_reports["_identity_key"] = df_reports["email"].fillna(df_reports["user_name"])
@@ -1077,18 +1681,21 @@ async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dic
         time_col="logged_time",
         count_col="view_count",
         extra_count_cols={"session_id": "unique_sessions"} if "session_id" in df_reports.columns else None,
+        distinct_mode=REPORT_VIEWS_DISTINCT_MODE,
     )
 
     df_reports.drop(columns=["_identity_key"], inplace=True, errors="ignore")
 
-    # Employee enrichment (cached tables injected)
-    df_reports = enrich_with_employee_data(
-        df_reports,
-        email_col="email",
-        username_col="user_name",
-        primary_emp=primary_emp,
-        fallback_emp=fallback_emp,
-    )
+    # Employee enrichment (identity store first, cached tables for misses)
+    with METRICS.timer("stage_seconds", stage="report_views_enrich"):
+        df_reports = resolve_identities(
+            df_reports,
+            email_col="email",
+            username_col="user_name",
+            primary_emp=primary_emp,
+            fallback_emp=fallback_emp,
+            hr_version=hr_version,
+        )
 
     # --- Dedupe by FULL_NAME (keep latest logged_time), but SUM view_count ---
     if "FULL_NAME" in df_reports.columns:
@@ -1110,7 +1717,11 @@ async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dic
 
             rep["view_count"] = rep[key].map(grp["view_count"].sum())
 
-            if "unique_sessions" in df_good.columns:
+            if "_unique_sessions_sketch" in df_good.columns:
+                # Union of the identities' session sketches: shared sessions count once
+                union = grp["_unique_sessions_sketch"].agg(lambda s: int(hll.estimate(hll.merge(list(s)))[0]))
+                rep["unique_sessions"] = rep[key].map(union)
+            elif "unique_sessions" in df_good.columns:
                 # Note: summing nunique-per-identity can overcount if sessions overlap across identities.
                 rep["unique_sessions"] = rep[key].map(grp["unique_sessions"].sum())
 
@@ -1125,15 +1736,23 @@ async def _get_report_views_cached(report_path: str, days: int = 30) -> List[Dic
 
         unresolved = df_reports[df_reports["FULL_NAME"] == "Possibly Terminated"]
         if not unresolved.empty:
-            print("Users unresolved after employee enrichment:")
-            print(unresolved["user_name"].unique())
+            logger.debug("report-views %s: %d unresolved users", report_path, unresolved["user_name"].nunique())
 
-        return df_reports.replace({np.nan: None}).to_dict(orient="records")
+    df_reports = df_reports.drop(columns=["_unique_sessions_sketch"], errors="ignore")
+    return presort(df_reports, REPORT_VIEWS_COLUMNS, REPORT_VIEWS_SEARCH_COLUMNS)
 
 
 @router.post("/report-views")
-async def get_report_views(req: ViewedReportsRequest):
+async def get_report_views(
+    req: ViewedReportsRequest,
+    response: Response,
+    page: Dict[str, Any] = Depends(page_params),
+    fmt: str = Depends(format_param),
+):
     """
     Returns views for a passed report (cached per report_path).
+    Paging/sorting/filtering via query params (see page_params); logged_time
+    sorts chronologically. format=ndjson|csv|arrow streams the rows in chunks.
     """
-    return await _get_report_views_cached(req.report_path, req.days)
+    sf = await _get_report_views_cached(req.report_path, req.days)
+    return _respond_page(sf, page, response, fmt, _report_view_records, filename="report-views")